@@ -1,12 +1,14 @@
-import yfinance as yf
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices
+from indicatorModels.IndicatorEngine import calculate_indicators
 
 def fetch_stock_data(ticker, start_date, end_date):
-    stock = yf.Ticker(ticker)
-    data = stock.history(start=start_date, end=end_date)
-    return data
+    return fetch_prices(ticker, start_date, end_date, adjusted=True)
 
 def plot_stock_data(data, ticker):
     plt.figure(figsize=(10, 8))
@@ -21,64 +23,6 @@ def plot_stock_data(data, ticker):
     plt.grid(True)
     plt.show()
 
-def calculate_indicators(data):
-    # Exponential Moving Average (EMA)
-    data['EMA_20'] = data['Close'].ewm(span=20, adjust=False).mean()
-
-    # Bollinger Bands
-    data['MA_20'] = data['Close'].rolling(window=20).mean()
-    data['std_20'] = data['Close'].rolling(window=20).std()
-    data['Upper_BB'] = data['MA_20'] + (data['std_20'] * 2)
-    data['Lower_BB'] = data['MA_20'] - (data['std_20'] * 2)
-
-    # Relative Strength Index (RSI)
-    delta = data['Close'].diff(1)
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    RS = gain / loss
-    data['RSI'] = 100 - (100 / (1 + RS))
-
-    # Moving Average Convergence Divergence (MACD)
-    data['EMA_12'] = data['Close'].ewm(span=12, adjust=False).mean()
-    data['EMA_26'] = data['Close'].ewm(span=26, adjust=False).mean()
-    data['MACD'] = data['EMA_12'] - data['EMA_26']
-    data['Signal_Line'] = data['MACD'].ewm(span=9, adjust=False).mean()
-
-    # Average True Range (ATR)
-    data['TR'] = pd.DataFrame(data = (data['High'] - data['Low']).abs(), index = data.index)
-    data['ATR'] = data['TR'].rolling(window=14).mean()
-
-    # On-Balance Volume (OBV)
-    data['OBV'] = (data['Volume'] * ((data['Close'] - data['Open']) / (data['High'] - data['Low']))).cumsum()
-
-    # Money Flow Index (MFI)
-    typical_price = (data['High'] + data['Low'] + data['Close']) / 3
-    raw_money_flow = typical_price * data['Volume']
-    positive_flow = (raw_money_flow.where(typical_price > typical_price.shift(1), 0)).rolling(window=14).sum()
-    negative_flow = (-raw_money_flow.where(typical_price < typical_price.shift(1), 0)).rolling(window=14).sum()
-    money_ratio = positive_flow / negative_flow
-    data['MFI'] = 100 - (100 / (1 + money_ratio))
-
-    # Moving Average Envelopes
-    data['MA_20'] = data['Close'].rolling(window=20).mean()
-    data['Upper_Envelope'] = data['MA_20'] * 1.025
-    data['Lower_Envelope'] = data['MA_20'] * 0.975
-
-    # Chaikin Oscillator
-    adl = ((2 * data['Close'] - data['High'] - data['Low']) / (data['High'] - data['Low'])) * data['Volume']
-    data['ADL'] = adl.cumsum()
-    data['EMA_3_ADL'] = data['ADL'].ewm(span=3, adjust=False).mean()
-    data['EMA_10_ADL'] = data['ADL'].ewm(span=10, adjust=False).mean()
-    data['Chaikin_Oscillator'] = data['EMA_3_ADL'] - data['EMA_10_ADL']
-
-    # Stochastic Oscillator
-    data['Lowest_Low'] = data['Low'].rolling(window=14).min()
-    data['Highest_High'] = data['High'].rolling(window=14).max()
-    data['%K'] = ((data['Close'] - data['Lowest_Low']) / (data['Highest_High'] - data['Lowest_Low'])) * 100
-    data['%D'] = data['%K'].rolling(window=3).mean()
-
-    return data
-
 def main():
     ticker = input("Enter the stock ticker: ")
     start_date = input("Enter the start date (yyyy-mm-dd): ")
@@ -1,34 +1,17 @@
-import yfinance as yf
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices_many
+from indicatorModels.IndicatorEngine import calculate_indicators_many
 
-def fetch_stock_data(tickers, start_date, end_date):
-    data = {}
-    for ticker in tickers:
-        stock = yf.Ticker(ticker)
-        data[ticker] = stock.history(start=start_date, end=end_date)
-    return data
+INDICATORS = ['EMA_20', 'Upper_BB', 'Lower_BB', 'RSI', 'MACD', 'Signal_Line', 'ATR']
 
-def calculate_indicators(data):
-    data['EMA_20'] = data['Close'].ewm(span=20, adjust=False).mean()
-    data['MA_20'] = data['Close'].rolling(window=20).mean()
-    data['std_20'] = data['Close'].rolling(window=20).std()
-    data['Upper_BB'] = data['MA_20'] + (data['std_20'] * 2)
-    data['Lower_BB'] = data['MA_20'] - (data['std_20'] * 2)
-    delta = data['Close'].diff(1)
-    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
-    loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
-    RS = gain / loss
-    data['RSI'] = 100 - (100 / (1 + RS))
-    data['EMA_12'] = data['Close'].ewm(span=12, adjust=False).mean()
-    data['EMA_26'] = data['Close'].ewm(span=26, adjust=False).mean()
-    data['MACD'] = data['EMA_12'] - data['EMA_26']
-    data['Signal_Line'] = data['MACD'].ewm(span=9, adjust=False).mean()
-    data['TR'] = pd.DataFrame(data=(data['High'] - data['Low']).abs(), index=data.index)
-    data['ATR'] = data['TR'].rolling(window=14).mean()
-    return data
+def fetch_stock_data(tickers, start_date, end_date):
+    return fetch_prices_many(tickers, start_date, end_date, adjusted=True)
 
 def plot_all_stocks_on_single_graph(data):
     plt.figure(figsize=(10, 6))
@@ -91,8 +74,7 @@ def main():
             st.error("No data found for the given tickers and date range.")
             return
 
-        for ticker, stock_data in data.items():
-            data[ticker] = calculate_indicators(stock_data)
+        data = calculate_indicators_many(data, INDICATORS)
 
         plot_all_stocks_on_single_graph(data)
 
@@ -0,0 +1,132 @@
+import os
+import time
+import random
+import pandas as pd
+import yfinance as yf
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+
+def normalize_frame(frame):
+    """
+    Bring a downloaded frame to the layout kept by the price store.
+
+    Args:
+    frame (pandas.DataFrame): Raw OHLCV bars.
+
+    Returns:
+    pandas.DataFrame: OHLCV columns indexed by a tz-naive DatetimeIndex.
+    """
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame.columns = frame.columns.get_level_values(0)
+    frame.index = pd.DatetimeIndex(frame.index)
+    if frame.index.tz is not None:
+        frame.index = frame.index.tz_localize(None)
+    frame.index.name = 'Date'
+    return frame[[column for column in OHLCV_COLUMNS if column in frame.columns]]
+
+
+class PriceProvider:
+    """
+    Source of daily OHLCV bars used by the price store on a cache miss.
+
+    Subclasses implement download(ticker, start, end), returning bars for the
+    [start, end) day range indexed by a tz-naive DatetimeIndex. A failed download must
+    raise: an empty frame means the range has no bars and is cached as such.
+    Implementations must be safe to call from several threads at once.
+    """
+
+    def download(self, ticker, start, end):
+        raise NotImplementedError
+
+
+class YahooProvider(PriceProvider):
+    """
+    Downloads bars from Yahoo Finance, retrying failed requests with exponential backoff
+    and raising RuntimeError once every attempt failed.
+
+    Args:
+    session (optional): HTTP session handed to yfinance, by default yfinance shares one
+        pooled session across all threads so connections are reused either way.
+    retries (int): Number of attempts per request.
+    backoff (float): Base delay in seconds, doubled after every failed attempt.
+    """
+
+    def __init__(self, session=None, retries=3, backoff=1.0):
+        self.session = session
+        self.retries = retries
+        self.backoff = backoff
+
+    def download(self, ticker, start, end):
+        for attempt in range(self.retries):
+            try:
+                # Ticker.history is safe to run concurrently, yf.download shares global state
+                frame = yf.Ticker(ticker, session=self.session).history(
+                    start=start, end=end, auto_adjust=False, actions=False, raise_errors=True)
+                return normalize_frame(frame)
+            except Exception as e:
+                if attempt == self.retries - 1:
+                    # Failing rather than returning no bars keeps the store from recording the range as held
+                    raise RuntimeError(f"Error downloading {ticker} after {self.retries} attempts: {e}") from e
+                time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+
+
+class ReplayProvider(PriceProvider):
+    """
+    Replays recorded fixtures instead of going to the network.
+
+    Fixtures are one file per ticker in a directory, either <TICKER>.parquet or
+    <TICKER>.csv with a Date column, as written by record_fixture.
+
+    Args:
+    directory (str): Directory holding the fixture files.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._frames = {}
+
+    def _fixture(self, ticker):
+        if ticker not in self._frames:
+            stem = os.path.join(self.directory, ticker.upper().replace('/', '_'))
+            if os.path.exists(stem + '.parquet'):
+                frame = pd.read_parquet(stem + '.parquet')
+            elif os.path.exists(stem + '.csv'):
+                frame = pd.read_csv(stem + '.csv', index_col='Date', parse_dates=True)
+            else:
+                frame = pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+            self._frames[ticker] = normalize_frame(frame).sort_index()
+        return self._frames[ticker]
+
+    def download(self, ticker, start, end):
+        frame = self._fixture(ticker)
+        return frame[(frame.index >= start) & (frame.index < end)]
+
+
+def record_fixture(frame, ticker, directory, fmt='csv'):
+    """
+    Save bars as a fixture that ReplayProvider can serve.
+
+    Args:
+    frame (pandas.DataFrame): OHLCV bars to record.
+    ticker (str): Ticker symbol.
+    directory (str): Fixture directory.
+    fmt (str): 'csv' or 'parquet'.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, ticker.upper().replace('/', '_') + '.' + fmt)
+    frame = normalize_frame(frame.copy())
+    if fmt == 'parquet':
+        frame.to_parquet(path)
+    else:
+        frame.to_csv(path)
+
+
+def default_provider():
+    """
+    Return the provider named by the environment, replaying PRICE_FIXTURES_DIR when it is set.
+    """
+    fixtures = os.environ.get("PRICE_FIXTURES_DIR")
+    if fixtures:
+        return ReplayProvider(fixtures)
+    return YahooProvider()
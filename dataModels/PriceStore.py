@@ -0,0 +1,375 @@
+import os
+import json
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+import pandas as pd
+from dataModels.PriceProviders import default_provider
+
+# Default on-disk location of the shared price cache, override with PRICE_STORE_DIR
+DEFAULT_STORE_DIR = os.environ.get(
+    "PRICE_STORE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "TradingAlgorithms", "prices")
+)
+
+def to_day(value):
+    """
+    Normalize a date-like value to a tz-naive midnight pandas.Timestamp.
+
+    Args:
+    value (str, datetime.date, datetime.datetime or pandas.Timestamp): Date to normalize.
+
+    Returns:
+    pandas.Timestamp: The normalized day.
+    """
+    day = pd.Timestamp(value)
+    if day.tzinfo is not None:
+        day = day.tz_localize(None)
+    return day.normalize()
+
+
+def period_to_range(period, today=None):
+    """
+    Translate a yfinance style period ('5d', '6mo', '1y', ...) into a [start, end) day range.
+
+    Args:
+    period (str): Lookback period as accepted by yf.download.
+    today (str, optional): Reference day, defaults to the current date.
+
+    Returns:
+    tuple: (start, end) pandas.Timestamps, end is exclusive.
+    """
+    end = to_day(today if today is not None else pd.Timestamp.today())
+    units = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+    for suffix, unit in units.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return end - pd.DateOffset(**{unit: int(period[:-len(suffix)])}), end
+    if period == 'ytd':
+        return pd.Timestamp(year=end.year, month=1, day=1), end
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def merge_ranges(ranges):
+    """
+    Merge overlapping or touching [start, end) ranges.
+
+    Args:
+    ranges (list): (start, end) pairs in any order.
+
+    Returns:
+    list: Sorted, non-overlapping (start, end) pairs.
+    """
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def missing_ranges(held, start, end):
+    """
+    Return the parts of [start, end) not covered by the merged held ranges.
+
+    Args:
+    held (list): Sorted, non-overlapping (start, end) pairs already stored.
+    start (pandas.Timestamp): First day requested.
+    end (pandas.Timestamp): Day after the last day requested.
+
+    Returns:
+    list: (start, end) pairs still to be downloaded.
+    """
+    gaps = []
+    cursor = start
+    for lo, hi in held:
+        if hi <= cursor:
+            continue
+        if lo >= end:
+            break
+        if lo > cursor:
+            gaps.append((cursor, lo))
+        cursor = max(cursor, hi)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def coalesce_ranges(ranges, tolerance):
+    """
+    Fold sorted ranges separated by at most `tolerance` into one wider range.
+
+    Args:
+    ranges (list): Sorted, non-overlapping (start, end) pairs.
+    tolerance (pandas.Timedelta): Largest gap bridged by a single range.
+
+    Returns:
+    list: Sorted (start, end) pairs.
+    """
+    folded = []
+    for lo, hi in ranges:
+        if folded and lo - folded[-1][1] <= tolerance:
+            folded[-1] = (folded[-1][0], hi)
+        else:
+            folded.append((lo, hi))
+    return folded
+
+
+class PriceStore:
+    """
+    Shared on-disk OHLCV cache.
+
+    Every ticker lives in its own directory holding one raw binary file per column
+    (dates as int64 nanoseconds, prices as float64) plus a meta.json describing the
+    row count, the stored columns and the merged date ranges already downloaded. Column
+    files are opened with np.memmap, so a read only touches the pages of the requested
+    rows. A request only downloads the days missing from the held ranges, and bars that
+    extend the series are appended to the column files instead of rewriting them.
+
+    Missing ranges of many tickers are downloaded concurrently through a bounded
+    thread pool, while writes to disk stay serialized behind a lock. Downloads are
+    single-flight: a caller asking for days another caller is already fetching waits
+    on that download instead of starting its own, and gaps of one ticker separated by
+    only a few held days are folded into one wider request.
+
+    Args:
+    root (str, optional): Cache directory, defaults to DEFAULT_STORE_DIR.
+    provider (PriceProvider, optional): Source of bars on a cache miss, defaults to
+        default_provider().
+    max_workers (int): Maximum number of downloads running at once.
+    coalesce_days (int): Largest run of held days re-downloaded to join two gaps.
+    """
+
+    def __init__(self, root=None, provider=None, max_workers=16, coalesce_days=7):
+        self.root = root or DEFAULT_STORE_DIR
+        self.provider = provider or default_provider()
+        self.max_workers = max_workers
+        self.coalesce = pd.Timedelta(days=coalesce_days)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        # ticker -> [(start, end, future)] downloads currently running
+        self._inflight = {}
+        self._inflight_lock = threading.RLock()
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.root, ticker.strip().upper().replace('/', '_'))
+
+    def _read_meta(self, ticker):
+        path = os.path.join(self._ticker_dir(ticker), 'meta.json')
+        if not os.path.exists(path):
+            return {'rows': 0, 'columns': [], 'ranges': []}
+        with open(path) as handle:
+            return json.load(handle)
+
+    def _write_meta(self, ticker, meta):
+        path = os.path.join(self._ticker_dir(ticker), 'meta.json')
+        with open(path + '.tmp', 'w') as handle:
+            json.dump(meta, handle)
+        os.replace(path + '.tmp', path)
+
+    def _column(self, ticker, name, rows):
+        dtype = np.int64 if name == 'Date' else np.float64
+        path = os.path.join(self._ticker_dir(ticker), name + '.bin')
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+
+    def _read_frame(self, ticker, meta, start=None, end=None):
+        dates = self._column(ticker, 'Date', meta['rows'])
+        lo = 0 if start is None else np.searchsorted(dates, start.value, side='left')
+        hi = len(dates) if end is None else np.searchsorted(dates, end.value, side='left')
+        index = pd.DatetimeIndex(np.array(dates[lo:hi]).view('datetime64[ns]'), name='Date')
+        columns = {name: np.array(self._column(ticker, name, meta['rows'])[lo:hi])
+                   for name in meta['columns']}
+        return pd.DataFrame(columns, index=index)
+
+    def _write_frame(self, ticker, frame):
+        directory = self._ticker_dir(ticker)
+        os.makedirs(directory, exist_ok=True)
+        dates = frame.index.values.astype('datetime64[ns]').astype(np.int64)
+        dates.tofile(os.path.join(directory, 'Date.bin.tmp'))
+        os.replace(os.path.join(directory, 'Date.bin.tmp'), os.path.join(directory, 'Date.bin'))
+        for name in frame.columns:
+            path = os.path.join(directory, name + '.bin')
+            frame[name].to_numpy(dtype=np.float64).tofile(path + '.tmp')
+            os.replace(path + '.tmp', path)
+
+    def _append_frame(self, ticker, frame, rows):
+        # Truncate first so bytes left behind by an interrupted append are overwritten
+        directory = self._ticker_dir(ticker)
+        arrays = {'Date': frame.index.values.astype('datetime64[ns]').astype(np.int64)}
+        arrays.update({name: frame[name].to_numpy(dtype=np.float64) for name in frame.columns})
+        for name, values in arrays.items():
+            with open(os.path.join(directory, name + '.bin'), 'r+b') as handle:
+                handle.truncate(rows * values.itemsize)
+                handle.seek(0, os.SEEK_END)
+                values.tofile(handle)
+
+    def held_ranges(self, ticker):
+        """
+        Return the merged [start, end) day ranges already stored for a ticker.
+        """
+        return [(pd.Timestamp(lo), pd.Timestamp(hi)) for lo, hi in self._read_meta(ticker)['ranges']]
+
+    def missing_ranges(self, ticker, start, end):
+        """
+        Return the [start, end) day ranges of a request that are not held yet.
+        """
+        return missing_ranges(self.held_ranges(ticker), to_day(start), to_day(end))
+
+    def is_cached(self, ticker, start, end):
+        return not self.missing_ranges(ticker, start, end)
+
+    def get(self, ticker, start, end):
+        """
+        Return daily OHLCV bars for a ticker, downloading only the days not held yet.
+
+        Args:
+        ticker (str): Ticker symbol.
+        start (str or date): First day of the range.
+        end (str or date): Day after the last day of the range (exclusive, as in yf.download).
+
+        Returns:
+        pandas.DataFrame: OHLCV bars for the requested range.
+        """
+        return self.get_many([ticker], start, end)[ticker]
+
+    def _store(self, ticker, fetched, start, end):
+        meta = self._read_meta(ticker)
+        if fetched.empty and meta['rows'] == 0:
+            return
+        if not fetched.empty:
+            fetched = fetched.astype(np.float64).sort_index()
+            fetched = fetched[~fetched.index.duplicated(keep='last')]
+            last = self._column(ticker, 'Date', meta['rows'])[-1] if meta['rows'] else None
+            if last is not None and fetched.index[0].value > last \
+                    and list(fetched.columns) == meta['columns']:
+                # New bars extend the series, so only their bytes are written
+                self._append_frame(ticker, fetched, meta['rows'])
+                meta['rows'] += len(fetched)
+            else:
+                # Backfill before the stored history or a column change, rewrite the series
+                frame = pd.concat([self._read_frame(ticker, meta), fetched])
+                frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+                self._write_frame(ticker, frame)
+                meta['rows'] = len(frame)
+                meta['columns'] = list(frame.columns)
+        # Today's bar may still be forming, so only past days are recorded as held
+        held_end = min(end, to_day(pd.Timestamp.today()))
+        if start < held_end:
+            ranges = [(pd.Timestamp(lo), pd.Timestamp(hi)) for lo, hi in meta['ranges']]
+            ranges = merge_ranges(ranges + [(start, held_end)])
+            meta['ranges'] = [[str(lo.date()), str(hi.date())] for lo, hi in ranges]
+        self._write_meta(ticker, meta)
+
+    def get_many(self, tickers, start, end):
+        """
+        Return a dict of ticker -> OHLCV DataFrame, downloading the missing ranges concurrently.
+
+        Args:
+        tickers (list): Ticker symbols.
+        start (str or date): First day of the range.
+        end (str or date): Day after the last day of the range.
+
+        Returns:
+        dict: Ticker -> OHLCV bars for the requested range.
+        """
+        start, end = to_day(start), to_day(end)
+        futures = []
+        for ticker in dict.fromkeys(ticker.strip() for ticker in tickers):
+            futures.extend(self._claim(ticker, start, end))
+        # Surface the first download error to every caller waiting on it
+        for future in wait(futures).done:
+            future.result()
+        return {ticker: self._read_frame(ticker.strip(), self._read_meta(ticker.strip()), start, end)
+                for ticker in tickers}
+
+    def _claim(self, ticker, start, end):
+        # Return the futures covering the missing days of [start, end), joining downloads
+        # already in flight and starting new ones only for days nobody is fetching
+        key = ticker.upper()
+        futures = []
+        with self._inflight_lock:
+            flights = self._inflight.setdefault(key, [])
+            needed = coalesce_ranges(self.missing_ranges(ticker, start, end), self.coalesce)
+            running = merge_ranges([(lo, hi) for lo, hi, _ in flights])
+            for lo, hi in needed:
+                futures.extend(future for f_lo, f_hi, future in flights if f_lo < hi and lo < f_hi)
+                for gap_start, gap_end in missing_ranges(running, lo, hi):
+                    future = self._pool.submit(self._download, ticker, gap_start, gap_end)
+                    flight = (gap_start, gap_end, future)
+                    flights.append(flight)
+                    future.add_done_callback(partial(self._land, key, flight))
+                    futures.append(future)
+        return futures
+
+    def _download(self, ticker, start, end):
+        fetched = self.provider.download(ticker, start, end)
+        with self._lock:
+            self._store(ticker, fetched, start, end)
+
+    def _land(self, key, flight, future):
+        # Runs once the bars are on disk, so later callers find them in the held ranges
+        with self._inflight_lock:
+            self._inflight[key].remove(flight)
+
+    def get_panel(self, tickers, start, end, field='Adj Close'):
+        """
+        Return one field for many tickers as a dates x tickers DataFrame, aligned like yf.download.
+        """
+        frames = self.get_many(tickers, start, end)
+        return pd.DataFrame({ticker: frame[field] for ticker, frame in frames.items()})
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def default_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = PriceStore()
+    return _default_store
+
+
+def adjust_prices(frame):
+    """
+    Scale Open, High, Low and Close by Adj Close / Close, as yf.Ticker(ticker).history() does.
+
+    The store holds the raw prices with a separate Adj Close; the adjusted bars keep
+    split and dividend gaps out of returns and indicators computed from Close.
+    """
+    adjusted = frame.copy()
+    ratio = frame['Adj Close'] / frame['Close']
+    for column in ['Open', 'High', 'Low', 'Close']:
+        adjusted[column] = frame[column] * ratio
+    return adjusted
+
+
+def fetch_prices(ticker, start_date, end_date, adjusted=False):
+    """
+    Cached replacement for yf.download(ticker, start, end), or for
+    yf.Ticker(ticker).history(start, end) with adjusted=True.
+    """
+    frame = default_store().get(ticker, start_date, end_date)
+    return adjust_prices(frame) if adjusted else frame
+
+
+def fetch_prices_many(tickers, start_date, end_date, adjusted=False):
+    """
+    Cached replacement for looping yf.download over many tickers, or
+    yf.Ticker(ticker).history with adjusted=True.
+    """
+    frames = default_store().get_many(tickers, start_date, end_date)
+    if adjusted:
+        return {ticker: adjust_prices(frame) for ticker, frame in frames.items()}
+    return frames
+
+
+def fetch_panel(tickers, start_date, end_date, field='Adj Close'):
+    """
+    Cached replacement for yf.download(tickers, start, end)[field].
+    """
+    return default_store().get_panel(tickers, start_date, end_date, field)
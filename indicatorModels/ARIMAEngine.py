@@ -0,0 +1,222 @@
+import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pmdarima as pm
+from dataModels.PriceStore import DEFAULT_STORE_DIR, fetch_prices_many
+
+# Selected ARIMA orders live next to the price cache, override with ARIMA_STORE_DIR
+DEFAULT_ARIMA_DIR = os.environ.get(
+    "ARIMA_STORE_DIR",
+    os.path.join(os.path.dirname(DEFAULT_STORE_DIR), "arima")
+)
+
+# auto_arima settings of ARIMA.py
+SEARCH_SETTINGS = {
+    'start_p': 1, 'start_q': 1, 'test': 'adf', 'max_p': 3, 'max_q': 3, 'm': 1, 'd': None,
+    'seasonal': False, 'start_P': 0, 'D': 0, 'stepwise': True
+}
+
+
+def fingerprint(values):
+    """
+    Short hash of a series' values, identifying the exact data an order was selected on.
+    """
+    return hashlib.sha1(np.ascontiguousarray(values, dtype=np.float64).tobytes()).hexdigest()[:16]
+
+
+def fingerprint_settings(settings):
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def select_order(values, settings=SEARCH_SETTINGS):
+    """
+    Run the stepwise auto_arima search and return the chosen specification.
+
+    Returns:
+    dict: 'order' (p, d, q) and 'with_intercept'.
+    """
+    model = pm.auto_arima(values, error_action='ignore', suppress_warnings=True, **settings)
+    return {'order': list(model.order), 'with_intercept': bool(model.with_intercept)}
+
+
+def fit_order(values, specification):
+    """
+    Estimate the coefficients of a known ARIMA specification, without any order search.
+
+    Returns:
+    pmdarima.arima.ARIMA: The fitted model.
+    """
+    return pm.ARIMA(order=tuple(specification['order']), with_intercept=specification['with_intercept'],
+                    suppress_warnings=True).fit(values)
+
+
+def rolling_forecast(series, specification, initial, horizon=1, step=1):
+    """
+    Rolling-origin forecasts with a fixed ARIMA specification.
+
+    The model is fitted once on the first `initial` observations; at each later origin
+    the coefficients are updated with the observations since the previous origin,
+    starting from the current estimates, rather than refitted or re-searched.
+
+    Args:
+    series (pandas.Series): Observations, oldest first.
+    specification (dict): 'order' and 'with_intercept', as from select_order.
+    initial (int): Observations before the first origin.
+    horizon (int): Steps ahead forecast from every origin.
+    step (int): Observations between consecutive origins.
+
+    Returns:
+    pandas.DataFrame: 'Forecast' and 'Actual' of the last step of every horizon, indexed
+    by the forecast date.
+    """
+    values = series.to_numpy(dtype=np.float64)
+    model = fit_order(values[:initial], specification)
+    rows = []
+    for origin in range(initial, len(values) - horizon + 1, step):
+        if origin > initial:
+            model.update(values[origin - step:origin])
+        forecast = np.asarray(model.predict(n_periods=horizon))[-1]
+        rows.append((series.index[origin + horizon - 1], forecast, values[origin + horizon - 1]))
+    return pd.DataFrame(rows, columns=['Date', 'Forecast', 'Actual']).set_index('Date')
+
+
+def _select_job(job):
+    name, values, settings = job
+    try:
+        return name, select_order(values, settings), None
+    except Exception as e:
+        return name, None, f"{type(e).__name__}: {e}"
+
+
+def _forecast_job(job):
+    name, values, specification, n_periods = job
+    model = fit_order(values, specification)
+    forecast, confint = model.predict(n_periods=n_periods, return_conf_int=True)
+    return name, np.column_stack([np.asarray(forecast), confint])
+
+
+class ForecastService:
+    """
+    ARIMA forecasts for many series with the order search cached per series.
+
+    The stepwise order search is the expensive part of auto_arima, so its result is
+    saved per series along with a fingerprint of the data it ran on. A later run reuses
+    the order while the series still starts with that same data (no revised history)
+    and no more than `reselect_every` observations were added since; only the
+    coefficients are estimated again. Searches and fits run across a process pool.
+
+    Args:
+    root (str, optional): Directory of the cached orders, defaults to DEFAULT_ARIMA_DIR.
+    workers (int, optional): Worker processes, None for one per CPU.
+    reselect_every (int): New observations after which the order is searched again.
+    settings (dict): auto_arima search settings.
+    """
+
+    def __init__(self, root=None, workers=None, reselect_every=63, settings=SEARCH_SETTINGS):
+        self.root = root or DEFAULT_ARIMA_DIR
+        self.workers = workers
+        self.reselect_every = reselect_every
+        self.settings = settings
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.root, name.upper().replace('/', '_') + ".json")
+
+    def load(self, name):
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def save(self, name, entry):
+        path = self._path(name)
+        with open(path + ".tmp", "w") as f:
+            json.dump(entry, f)
+        os.replace(path + ".tmp", path)
+
+    def _cached(self, name, values):
+        entry = self.load(name)
+        if entry is None or entry['settings'] != fingerprint_settings(self.settings):
+            return None
+        held = entry['observations']
+        if held > len(values) or len(values) - held > self.reselect_every:
+            return None
+        if fingerprint(values[:held]) != entry['fingerprint']:
+            return None
+        return entry
+
+    def _map(self, function, jobs):
+        if self.workers == 1 or len(jobs) < 2:
+            return list(map(function, jobs))
+        workers = self.workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(function, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+
+    def orders(self, series, errors='raise'):
+        """
+        Return the ARIMA specification of every series, searching only where the cache misses.
+
+        Args:
+        series (dict): {name: pandas.Series} observations, oldest first.
+        errors (str): 'raise' to fail when the search fails for any series, 'skip' to
+            leave those series out of the result. The successful searches are cached
+            either way.
+
+        Returns:
+        dict: {name: {'order', 'with_intercept'}}.
+
+        Raises:
+        ValueError: If errors is 'raise' and the search failed for a series, naming it.
+        """
+        if errors not in ('raise', 'skip'):
+            raise ValueError(f"Unknown errors {errors!r}, expected 'raise' or 'skip'")
+        values = {name: s.dropna().to_numpy(dtype=np.float64) for name, s in series.items()}
+        failed = {}
+        with self._lock:
+            cached = {name: self._cached(name, v) for name, v in values.items()}
+            jobs = [(name, v, self.settings) for name, v in values.items() if cached[name] is None]
+            for name, specification, error in self._map(_select_job, jobs):
+                if specification is None:
+                    failed[name] = error
+                    continue
+                entry = dict(specification, fingerprint=fingerprint(values[name]), observations=len(values[name]),
+                             settings=fingerprint_settings(self.settings))
+                self.save(name, entry)
+                cached[name] = entry
+        if failed and errors == 'raise':
+            raise ValueError("ARIMA order search failed for " +
+                             "; ".join(f"{name} ({error})" for name, error in failed.items()))
+        return {name: {'order': entry['order'], 'with_intercept': entry['with_intercept']}
+                for name, entry in cached.items() if entry is not None}
+
+    def forecast(self, series, n_periods=30, errors='raise'):
+        """
+        Fit the cached specification of every series and forecast it.
+
+        Args:
+        series (dict): {name: pandas.Series} observations, oldest first.
+        n_periods (int): Steps to forecast.
+        errors (str): As for orders(); skipped series are left out of the forecasts.
+
+        Returns:
+        dict: {name: pandas.DataFrame} with 'Forecast', 'Lower' and 'Upper' (95% interval).
+        """
+        specifications = self.orders(series, errors)
+        jobs = [(name, series[name].dropna().to_numpy(dtype=np.float64), specification, n_periods)
+                for name, specification in specifications.items()]
+        return {name: pd.DataFrame(result, columns=['Forecast', 'Lower', 'Upper'])
+                for name, result in self._map(_forecast_job, jobs)}
+
+    def forecast_tickers(self, tickers, start_date, end_date, n_periods=30, field='Adj Close', errors='raise'):
+        """
+        forecast() on the daily returns of tickers from the price cache.
+        """
+        frames = fetch_prices_many(tickers, start_date, end_date)
+        return self.forecast({ticker: frame[field].pct_change() for ticker, frame in frames.items()},
+                             n_periods, errors)
@@ -1,10 +1,13 @@
-import yfinance as yf
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import numpy as np
 from scipy.stats import skew, kurtosis
 from statsmodels.graphics.tsaplots import plot_acf
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices
 
 # Define the stock ticker and the period for which we want to download data
 ticker = 'AAPL'  # Apple Inc.
@@ -12,7 +15,7 @@ start_date = '2020-01-01'
 end_date = '2023-01-01'
 
 # Download stock data
-data = yf.download(ticker, start=start_date, end=end_date)
+data = fetch_prices(ticker, start_date, end_date)
 
 # Display the first few rows of the dataset
 print(data.head())
@@ -0,0 +1,188 @@
+import numpy as np
+
+
+class RollingCovariance:
+    """
+    Mean and covariance of the last `window` return vectors, updated in O(assets^2) per day.
+
+    Each update adds the new vector's outer product to the running sums and removes the
+    one leaving the window (a rank-1 add and a rank-1 remove) instead of recomputing the
+    window. The sums are rebuilt from the window once per cycle so add/remove rounding
+    cannot drift. The covariance uses ddof=0, like np.var.
+
+    Args:
+    window (int): Number of observations in the window.
+    assets (int): Length of the return vectors.
+    """
+
+    def __init__(self, window, assets):
+        self.window = window
+        self.values = np.zeros((window, assets))
+        self.count = 0
+        self.total = np.zeros(assets)
+        self.cross = np.zeros((assets, assets))
+
+    def update(self, x):
+        slot = self.count % self.window
+        if self.count >= self.window:
+            dropped = self.values[slot]
+            self.total -= dropped
+            self.cross -= np.outer(dropped, dropped)
+        self.values[slot] = x
+        self.total += x
+        self.cross += np.outer(x, x)
+        self.count += 1
+        if self.count % self.window == 0:
+            self.total = self.values.sum(axis=0)
+            self.cross = self.values.T @ self.values
+
+    def observations(self):
+        return min(self.count, self.window)
+
+    def mean(self):
+        return self.total / self.observations()
+
+    def covariance(self):
+        mean = self.mean()
+        return self.cross / self.observations() - np.outer(mean, mean)
+
+    def portfolio_variance(self, weights):
+        """
+        Variance of w.x for a weight vector, without forming the covariance matrix.
+        """
+        n = self.observations()
+        return weights @ self.cross @ weights / n - (weights @ self.total / n) ** 2
+
+
+class ExpandingMoments:
+    """
+    Running sums from which the mean, sample covariance and Ledoit-Wolf shrinkage of all
+    returns seen so far can be read at any time.
+
+    Besides the sums of x and x x', it keeps the sums of (x'x)^2 and (x'x) x, which is
+    what the Ledoit-Wolf shrinkage intensity needs once expanded around the mean, so
+    new observations are folded in without revisiting old ones.
+
+    Args:
+    assets (int): Length of the return vectors.
+    """
+
+    def __init__(self, assets):
+        self.count = 0
+        self.total = np.zeros(assets)
+        self.cross = np.zeros((assets, assets))
+        self.norm_sq = 0.0
+        self.norm_total = np.zeros(assets)
+
+    def update(self, x):
+        self.update_many(np.asarray(x, dtype=np.float64)[None, :])
+
+    def update_many(self, block):
+        """
+        Fold a (observations, assets) block of returns into the sums.
+        """
+        norms = np.einsum('ta,ta->t', block, block)
+        self.count += len(block)
+        self.total += block.sum(axis=0)
+        self.cross += block.T @ block
+        self.norm_sq += norms @ norms
+        self.norm_total += norms @ block
+
+    def mean(self):
+        return self.total / self.count
+
+    def covariance(self, ddof=0):
+        mean = self.mean()
+        return (self.cross - self.count * np.outer(mean, mean)) / (self.count - ddof)
+
+    def ledoit_wolf(self):
+        """
+        Ledoit-Wolf covariance shrunk towards a scaled identity, as sklearn's LedoitWolf.
+
+        Returns:
+        tuple: Shrunk covariance and the shrinkage intensity.
+        """
+        n, assets = self.count, len(self.total)
+        mean = self.mean()
+        sample = self.covariance()
+        target = np.trace(sample) / assets
+        # sum_t ||x_t x_t' - S||^2 over centered x_t is sum_t (x_t'x_t)^2 - n ||S||^2, and
+        # sum_t (x_t'x_t)^2 expands into the running sums around the current mean
+        mm = mean @ mean
+        mean_total = mean @ self.total
+        centered_sq = (self.norm_sq - 4 * mean @ self.norm_total + 4 * mean @ self.cross @ mean
+                       + 2 * mm * np.trace(self.cross) - 4 * mm * mean_total + n * mm * mm)
+        spread = np.sum((sample - target * np.eye(assets)) ** 2)
+        noise = max(centered_sq / n - np.sum(sample ** 2), 0.0) / n
+        shrinkage = min(noise, spread) / spread if spread > 0 else 0.0
+        return (1 - shrinkage) * sample + shrinkage * target * np.eye(assets), shrinkage
+
+    def state(self):
+        return {'count': np.array(self.count), 'total': self.total, 'cross': self.cross,
+                'norm_sq': np.array(self.norm_sq), 'norm_total': self.norm_total}
+
+    @classmethod
+    def from_state(cls, state):
+        moments = cls(len(state['total']))
+        moments.count = int(state['count'])
+        moments.total = np.array(state['total'], dtype=np.float64)
+        moments.cross = np.array(state['cross'], dtype=np.float64)
+        moments.norm_sq = float(state['norm_sq'])
+        moments.norm_total = np.array(state['norm_total'], dtype=np.float64)
+        return moments
+
+
+class EWMACovariance:
+    """
+    Exponentially weighted covariance, RiskMetrics style: zero mean, one decay factor.
+
+    The weights are normalized by their running total, so the estimate is usable from
+    the first observation instead of being biased towards zero while it warms up.
+
+    Args:
+    decay (float): Weight kept by the previous estimate each day, e.g. 0.94.
+    assets (int): Length of the return vectors.
+    """
+
+    def __init__(self, decay, assets):
+        self.decay = decay
+        self.count = 0
+        self.weight = 0.0
+        self.cross = np.zeros((assets, assets))
+
+    def update(self, x):
+        self.cross *= self.decay
+        self.cross += (1 - self.decay) * np.outer(x, x)
+        self.weight = self.decay * self.weight + (1 - self.decay)
+        self.count += 1
+
+    def update_many(self, block):
+        """
+        Fold a (observations, assets) block of returns in order, as one weighted product.
+        """
+        n = len(block)
+        factors = (1 - self.decay) * self.decay ** np.arange(n - 1, -1, -1)
+        self.cross = self.decay ** n * self.cross + (block * factors[:, None]).T @ block
+        self.weight = self.decay ** n * self.weight + factors.sum()
+        self.count += n
+
+    def mean(self):
+        return np.zeros(len(self.cross))
+
+    def covariance(self):
+        return self.cross / self.weight
+
+    def portfolio_variance(self, weights):
+        return weights @ self.cross @ weights / self.weight
+
+    def state(self):
+        return {'decay': np.array(self.decay), 'count': np.array(self.count),
+                'weight': np.array(self.weight), 'cross': self.cross}
+
+    @classmethod
+    def from_state(cls, state):
+        estimator = cls(float(state['decay']), len(state['cross']))
+        estimator.count = int(state['count'])
+        estimator.weight = float(state['weight'])
+        estimator.cross = np.array(state['cross'], dtype=np.float64)
+        return estimator
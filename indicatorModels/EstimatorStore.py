@@ -0,0 +1,246 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from dataModels.PriceStore import DEFAULT_STORE_DIR, fetch_panel, to_day
+from indicatorModels.CovarianceEstimators import ExpandingMoments, EWMACovariance
+
+# Estimator state lives next to the price cache, override with ESTIMATOR_STORE_DIR
+DEFAULT_ESTIMATOR_DIR = os.environ.get(
+    "ESTIMATOR_STORE_DIR",
+    os.path.join(os.path.dirname(DEFAULT_STORE_DIR), "estimators")
+)
+
+COVARIANCE_METHODS = ['sample', 'ewma', 'ledoit_wolf']
+
+# Held price rows kept with the state to detect revisions of the history, e.g. Adj Close after a dividend
+RECENT_DAYS = 5
+
+
+class UniverseEstimates:
+    """
+    Return statistics of one universe of tickers, as of its last folded-in day.
+
+    Returns are daily simple returns between consecutive days on which every ticker has
+    a price. The sample statistics cover every such day from the universe's start date.
+    The prices of the last RECENT_DAYS days folded in are kept as a fingerprint of the
+    history the statistics were computed from.
+
+    Args:
+    tickers (list): Ticker symbols, in column order.
+    moments (ExpandingMoments): Sample moments of the returns.
+    ewma (EWMACovariance): Exponentially weighted covariance of the returns.
+    recent_dates (pandas.DatetimeIndex, optional): Last days folded in, empty while empty.
+    recent_prices (numpy.ndarray, optional): days x tickers prices on recent_dates, the
+        last row being the base of the next return.
+    """
+
+    def __init__(self, tickers, moments, ewma, recent_dates=None, recent_prices=None):
+        self.tickers = list(tickers)
+        self.moments = moments
+        self.ewma = ewma
+        self.recent_dates = pd.DatetimeIndex([] if recent_dates is None else recent_dates)
+        self.recent_prices = np.empty((0, len(self.tickers))) if recent_prices is None else recent_prices
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def last_date(self):
+        return self.recent_dates[-1] if len(self.recent_dates) else None
+
+    @property
+    def last_prices(self):
+        return self.recent_prices[-1] if len(self.recent_prices) else None
+
+    def matches(self, prices):
+        """
+        Whether prices agree with the held recent rows, False when the history was revised.
+
+        Args:
+        prices (pandas.DataFrame): dates x tickers prices from recent_dates[0] on.
+        """
+        prices = prices[self.tickers].dropna()
+        held = prices[(prices.index >= self.recent_dates[0]) & (prices.index <= self.last_date)]
+        return held.index.equals(self.recent_dates) and np.array_equal(held.to_numpy(dtype=np.float64), self.recent_prices)
+
+    def update(self, prices):
+        """
+        Fold in the returns of price rows dated after last_date.
+
+        Args:
+        prices (pandas.DataFrame): dates x tickers prices, may overlap what is held.
+        """
+        prices = prices[self.tickers].dropna()
+        if self.last_date is not None:
+            prices = prices[prices.index > self.last_date]
+        if prices.empty:
+            return
+        values = prices.to_numpy(dtype=np.float64)
+        base = np.vstack([self.recent_prices[-1:], values])
+        returns = base[1:] / base[:-1] - 1
+        if len(returns):
+            self.moments.update_many(returns)
+            self.ewma.update_many(returns)
+        self.recent_dates = self.recent_dates.append(prices.index)[-RECENT_DAYS:]
+        self.recent_prices = np.vstack([self.recent_prices, values])[-RECENT_DAYS:]
+
+    def mean(self):
+        return pd.Series(self.moments.mean(), index=self.tickers)
+
+    def covariance(self, method='sample', ddof=0):
+        """
+        Covariance matrix of daily returns.
+
+        Args:
+        method (str): 'sample', 'ewma' (zero mean, RiskMetrics) or 'ledoit_wolf'.
+        ddof (int): Delta degrees of freedom of the sample covariance.
+
+        Returns:
+        pandas.DataFrame: tickers x tickers covariance.
+        """
+        if method == 'sample':
+            matrix = self.moments.covariance(ddof)
+        elif method == 'ewma':
+            matrix = self.ewma.covariance()
+        elif method == 'ledoit_wolf':
+            matrix = self.moments.ledoit_wolf()[0]
+        else:
+            raise ValueError(f"Unknown method {method!r}, expected one of {COVARIANCE_METHODS}")
+        return pd.DataFrame(matrix, index=self.tickers, columns=self.tickers)
+
+    def state(self):
+        state = {'tickers': np.array(self.tickers)}
+        state.update({'moments_' + key: value for key, value in self.moments.state().items()})
+        state.update({'ewma_' + key: value for key, value in self.ewma.state().items()})
+        state['recent_dates'] = self.recent_dates.values.astype('datetime64[ns]').astype(np.int64)
+        state['recent_prices'] = self.recent_prices
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        moments = ExpandingMoments.from_state({key[8:]: state[key] for key in state if key.startswith('moments_')})
+        ewma = EWMACovariance.from_state({key[5:]: state[key] for key in state if key.startswith('ewma_')})
+        if 'recent_dates' in state:
+            recent_dates = pd.DatetimeIndex(np.array(state['recent_dates']).view('datetime64[ns]'))
+            recent_prices = np.array(state['recent_prices'], dtype=np.float64)
+        elif 'last_date' in state:
+            # Saved before the recent rows were kept
+            recent_dates = pd.DatetimeIndex([pd.Timestamp(int(state['last_date']))])
+            recent_prices = np.array(state['last_prices'], dtype=np.float64)[None]
+        else:
+            recent_dates, recent_prices = None, None
+        return cls([str(ticker) for ticker in state['tickers']], moments, ewma, recent_dates, recent_prices)
+
+
+class EstimatorStore:
+    """
+    Persistent return statistics per universe, kept current as new bars arrive.
+
+    A universe is a list of tickers, the price field and the start date the statistics
+    run from. Its running sums are saved as one .npz file, so reading the current mean
+    and covariance costs O(tickers^2) however long the history is, and bringing them up
+    to date only folds in the days after the last update.
+
+    Args:
+    root (str, optional): Directory of the saved states, defaults to DEFAULT_ESTIMATOR_DIR.
+    decay (float): EWMA decay factor of new universes.
+    """
+
+    def __init__(self, root=None, decay=0.94):
+        self.root = root or DEFAULT_ESTIMATOR_DIR
+        self.decay = decay
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, tickers, start_date, field):
+        key = json.dumps([list(tickers), field, str(to_day(start_date).date()), self.decay])
+        return os.path.join(self.root, hashlib.sha1(key.encode()).hexdigest()[:20] + ".npz")
+
+    def load(self, tickers, start_date, field='Adj Close'):
+        """
+        Return the saved statistics of a universe without updating them, None if absent.
+        """
+        path = self._path(tickers, start_date, field)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as state:
+            return UniverseEstimates.from_state(dict(state))
+
+    def save(self, estimates, start_date, field='Adj Close'):
+        path = self._path(estimates.tickers, start_date, field)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **estimates.state())
+        os.replace(tmp, path)
+
+    def get(self, tickers, start_date, end_date, field='Adj Close'):
+        """
+        Return the statistics of a universe brought up to end_date.
+
+        Only prices from the saved recent days on are read from the price cache. When
+        those held prices were revised since, e.g. Adj Close after a dividend, the
+        statistics are rebuilt from start_date. Today's bar may still be forming, so it is
+        folded into the returned statistics but not into the saved ones. Asking for an
+        end date before the saved last day computes the statistics afresh without saving
+        them, since saved sums cannot be rewound.
+
+        Args:
+        tickers (list): Ticker symbols.
+        start_date (str): First day of the statistics.
+        end_date (str): End date, exclusive like the price cache.
+        field (str): Price field the returns are computed from.
+
+        Returns:
+        UniverseEstimates: The statistics.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        with self._lock:
+            estimates = self.load(tickers, start_date, field)
+            if estimates is not None and estimates.last_date is not None and to_day(end_date) <= estimates.last_date:
+                estimates = None
+                persist = False
+            else:
+                persist = True
+            if estimates is not None and estimates.last_date is not None:
+                prices = fetch_panel(tickers, estimates.recent_dates[0], end_date, field)
+                if not estimates.matches(prices):
+                    # The held history was revised, so the saved sums no longer describe it
+                    estimates = None
+            else:
+                estimates = None
+            if estimates is None:
+                estimates = UniverseEstimates(tickers, ExpandingMoments(len(tickers)), EWMACovariance(self.decay, len(tickers)))
+                prices = fetch_panel(tickers, start_date, end_date, field)
+            # Today's bar may still be forming, so only past days are folded into the saved sums
+            today = to_day(pd.Timestamp.today())
+            estimates.update(prices[prices.index < today])
+            if persist:
+                self.save(estimates, start_date, field)
+            estimates.update(prices[prices.index >= today])
+        return estimates
+
+
+_default_estimator_store = None
+_default_estimator_store_lock = threading.Lock()
+
+
+def default_estimator_store():
+    global _default_estimator_store
+    with _default_estimator_store_lock:
+        if _default_estimator_store is None:
+            _default_estimator_store = EstimatorStore()
+    return _default_estimator_store
+
+
+def fetch_moments(tickers, start_date, end_date, field='Adj Close', method='sample', ddof=0):
+    """
+    Mean vector and covariance matrix of daily returns from the shared estimator store.
+
+    Returns:
+    tuple: (pandas.Series mean, pandas.DataFrame covariance).
+    """
+    estimates = default_estimator_store().get(tickers, start_date, end_date, field)
+    return estimates.mean(), estimates.covariance(method, ddof)
@@ -0,0 +1,173 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+from dataModels.PriceStore import DEFAULT_STORE_DIR, fetch_prices, to_day
+from indicatorModels.IndicatorEngine import INDICATORS, PANEL_FIELDS, calculate_indicators
+
+# Engineered features live next to the price cache, override with FEATURE_STORE_DIR
+DEFAULT_FEATURE_DIR = os.environ.get(
+    "FEATURE_STORE_DIR",
+    os.path.join(os.path.dirname(DEFAULT_STORE_DIR), "features")
+)
+
+FEATURE_COLUMNS = PANEL_FIELDS + ['Adj Close', 'Daily_Return', 'Volatility'] + INDICATORS
+
+
+def engineer_features(prices):
+    """
+    Daily return, 30-day volatility of returns and the IndicatorEngine indicators of
+    OHLCV bars, next to the bars themselves.
+
+    Returns:
+    pandas.DataFrame: FEATURE_COLUMNS, NaN where a window is not full yet.
+    """
+    features = calculate_indicators(prices[PANEL_FIELDS].copy())
+    features['Adj Close'] = prices['Adj Close']
+    features['Daily_Return'] = prices['Adj Close'].pct_change()
+    features['Volatility'] = features['Daily_Return'].rolling(window=30).std()
+    return features[FEATURE_COLUMNS]
+
+
+class FeatureStore:
+    """
+    Engineered features per ticker in a float32 columnar layout on disk.
+
+    Like the price cache, every column is one flat binary file next to an int64 Date
+    file, so a training run memory-maps just the columns it uses, already in the
+    float32 that sklearn's trees work in, at half the size of float64. An update only
+    appends the days after the last stored one, up to yesterday; saved rows are never
+    recomputed. The features are computed from the start date the ticker was first
+    stored with, and asking for an earlier start rebuilds the ticker.
+
+    Args:
+    root (str, optional): Directory of the features, defaults to DEFAULT_FEATURE_DIR.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or DEFAULT_FEATURE_DIR
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.root, ticker.strip().upper().replace('/', '_'))
+
+    def _read_meta(self, ticker):
+        path = os.path.join(self._ticker_dir(ticker), 'meta.json')
+        if not os.path.exists(path):
+            return {'rows': 0, 'columns': FEATURE_COLUMNS, 'start_date': None, 'last_date': None}
+        with open(path) as handle:
+            return json.load(handle)
+
+    def _write_meta(self, ticker, meta):
+        path = os.path.join(self._ticker_dir(ticker), 'meta.json')
+        with open(path + '.tmp', 'w') as handle:
+            json.dump(meta, handle)
+        os.replace(path + '.tmp', path)
+
+    def _column(self, ticker, name, rows):
+        dtype = np.int64 if name == 'Date' else np.float32
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self._ticker_dir(ticker), name + '.bin'), dtype=dtype, mode='r', shape=(rows,))
+
+    def update(self, ticker, prices, start_date):
+        """
+        Append the features of bars after the last stored day and before today.
+
+        Args:
+        ticker (str): Ticker symbol.
+        prices (pandas.DataFrame): OHLCV bars from start_date on, oldest first.
+        start_date (str): First day of the bars.
+
+        Returns:
+        int: Rows appended.
+        """
+        with self._lock:
+            meta = self._read_meta(ticker)
+            start = str(to_day(start_date).date())
+            if meta['start_date'] is not None and start < meta['start_date']:
+                meta = {'rows': 0, 'columns': FEATURE_COLUMNS, 'start_date': None, 'last_date': None}
+            features = engineer_features(prices)
+            # Today's bar may still be forming and stored rows are never recomputed, so it waits for tomorrow
+            features = features[features.index < to_day(pd.Timestamp.today())]
+            if meta['last_date'] is not None:
+                features = features[features.index > pd.Timestamp(meta['last_date'])]
+            if features.empty:
+                return 0
+            directory = self._ticker_dir(ticker)
+            os.makedirs(directory, exist_ok=True)
+            arrays = {'Date': features.index.values.astype('datetime64[ns]').astype(np.int64)}
+            arrays.update({name: features[name].to_numpy(dtype=np.float32) for name in meta['columns']})
+            for name, values in arrays.items():
+                path = os.path.join(directory, name + '.bin')
+                # Truncate first so bytes left behind by an interrupted append are overwritten
+                with open(path, 'r+b' if meta['rows'] and os.path.exists(path) else 'wb') as handle:
+                    handle.truncate(meta['rows'] * values.itemsize)
+                    handle.seek(0, os.SEEK_END)
+                    values.tofile(handle)
+            meta.update(rows=meta['rows'] + len(features), start_date=meta['start_date'] or start,
+                        last_date=str(features.index[-1].date()))
+            self._write_meta(ticker, meta)
+            return len(features)
+
+    def refresh(self, ticker, start_date, end_date):
+        """
+        Bring a ticker's features up to end_date from the price cache.
+        """
+        meta = self._read_meta(ticker)
+        start = start_date if meta['start_date'] is None else min(meta['start_date'], str(to_day(start_date).date()))
+        return self.update(ticker, fetch_prices(ticker, start, end_date), start)
+
+    def matrix(self, ticker, columns, start_date=None, end_date=None, dropna=True):
+        """
+        Stored features of a ticker as one float32 array.
+
+        Args:
+        ticker (str): Ticker symbol.
+        columns (list): Feature names, in column order.
+        start_date (str, optional): First day.
+        end_date (str, optional): End date, exclusive like the price cache.
+        dropna (bool): Drop days where any requested feature is missing.
+
+        Returns:
+        tuple: (pandas.DatetimeIndex, numpy.ndarray days x columns float32).
+        """
+        meta = self._read_meta(ticker)
+        dates = self._column(ticker, 'Date', meta['rows'])
+        lo = 0 if start_date is None else np.searchsorted(dates, to_day(start_date).value, side='left')
+        hi = len(dates) if end_date is None else np.searchsorted(dates, to_day(end_date).value, side='left')
+        values = np.empty((hi - lo, len(columns)), dtype=np.float32)
+        for k, name in enumerate(columns):
+            values[:, k] = self._column(ticker, name, meta['rows'])[lo:hi]
+        index = pd.DatetimeIndex(np.array(dates[lo:hi]).view('datetime64[ns]'), name='Date')
+        if dropna:
+            observed = ~np.isnan(values).any(axis=1)
+            index, values = index[observed], values[observed]
+        return index, values
+
+
+_default_feature_store = None
+_default_feature_store_lock = threading.Lock()
+
+
+def default_feature_store():
+    global _default_feature_store
+    with _default_feature_store_lock:
+        if _default_feature_store is None:
+            _default_feature_store = FeatureStore()
+    return _default_feature_store
+
+
+def fetch_features(ticker, columns, start_date, end_date):
+    """
+    Features of a ticker from the shared feature store, refreshed up to end_date first.
+
+    Returns:
+    tuple: (pandas.DatetimeIndex, numpy.ndarray days x columns float32), days with a
+    missing feature dropped.
+    """
+    store = default_feature_store()
+    store.refresh(ticker, start_date, end_date)
+    return store.matrix(ticker, columns, start_date, end_date)
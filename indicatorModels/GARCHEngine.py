@@ -0,0 +1,255 @@
+import os
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from arch import arch_model
+from dataModels.PriceStore import DEFAULT_STORE_DIR, fetch_prices_many, to_day
+from indicatorModels.RiskEngine import MEASURES, tail_measures
+from predictionModels.MonteCarloEngine import cholesky_factor
+
+# Fitted GARCH state lives next to the price cache, override with GARCH_STORE_DIR
+DEFAULT_GARCH_DIR = os.environ.get(
+    "GARCH_STORE_DIR",
+    os.path.join(os.path.dirname(DEFAULT_STORE_DIR), "garch")
+)
+
+# Returns are fitted in percent, where the arch optimizer is best conditioned
+SCALE = 100.0
+
+GARCH_PARAMETERS = ['mu', 'omega', 'alpha[1]', 'beta[1]']
+
+
+def fit_garch(returns, starting_values=None):
+    """
+    Fit a constant-mean GARCH(1,1) to daily returns.
+
+    Args:
+    returns (numpy.ndarray): Daily simple returns, oldest first.
+    starting_values (list, optional): [mu, omega, alpha, beta] to start the optimizer
+        from, usually the previous fit of the same series.
+
+    Returns:
+    dict: 'params' [mu, omega, alpha, beta] in percent units, the last 'variance' and
+    'residual' of the fitted recursion, 'observations' and 'iterations'.
+    """
+    model = arch_model(np.asarray(returns) * SCALE, vol='Garch', p=1, q=1, rescale=False)
+    result = model.fit(disp='off', update_freq=0, show_warning=False,
+                       starting_values=None if starting_values is None else np.asarray(starting_values))
+    if result.convergence_flag != 0 and starting_values is not None:
+        # A stale warm start can strand the optimizer, fall back to arch's own guess
+        return fit_garch(returns)
+    return {
+        'params': [float(value) for value in result.params[GARCH_PARAMETERS]],
+        'variance': float(result.conditional_volatility[-1] ** 2),
+        'residual': float(result.resid[-1]),
+        'observations': len(returns),
+        'iterations': int(getattr(result.optimization_result, 'nit', 0)),
+    }
+
+
+def roll_variance(state, returns):
+    """
+    Carry a fitted GARCH(1,1) forward over new returns without refitting.
+
+    Each observation costs one step of sigma2_t = omega + alpha * eps_{t-1}^2 + beta * sigma2_{t-1}.
+
+    Args:
+    state (dict): State as returned by fit_garch, updated in place.
+    returns (numpy.ndarray): New daily simple returns, oldest first.
+
+    Returns:
+    dict: The updated state.
+    """
+    mu, omega, alpha, beta = state['params']
+    variance, residual = state['variance'], state['residual']
+    for value in np.asarray(returns) * SCALE:
+        variance = omega + alpha * residual ** 2 + beta * variance
+        residual = value - mu
+    state['variance'], state['residual'] = float(variance), float(residual)
+    state['observations'] += len(returns)
+    return state
+
+
+def forecast_variance(state):
+    """
+    Next-day conditional variance of a state, in percent squared.
+    """
+    mu, omega, alpha, beta = state['params']
+    return omega + alpha * state['residual'] ** 2 + beta * state['variance']
+
+
+def simulate_garch(states, horizon=10, num_paths=100000, correlation=None, seed=None):
+    """
+    Simulate volatility-clustered returns from fitted GARCH(1,1) states.
+
+    All paths and tickers advance together, one vectorized step per day: each day's
+    shocks scale the next day's variance through the GARCH recursion, so large moves
+    cluster along a path. Innovations are normal, optionally correlated across tickers
+    through the Cholesky factor of `correlation` (constant conditional correlation).
+
+    Args:
+    states (list): GARCH states as saved by VolatilityService, one per ticker.
+    horizon (int): Number of days simulated.
+    num_paths (int): Number of paths.
+    correlation (numpy.ndarray, optional): tickers x tickers correlation of the shocks.
+    seed (int, optional): Seed of the random generator.
+
+    Returns:
+    numpy.ndarray: (num_paths, tickers) compounded simple returns over the horizon.
+    """
+    mu, omega, alpha, beta = np.array([state['params'] for state in states]).T
+    variance = np.tile([forecast_variance(state) for state in states], (num_paths, 1))
+    factor = None if correlation is None else cholesky_factor(correlation).T
+    rng = np.random.default_rng(seed)
+    growth = np.ones((num_paths, len(states)))
+    for day in range(horizon):
+        shock = rng.standard_normal((num_paths, len(states)))
+        if factor is not None:
+            shock = shock @ factor
+        shock *= np.sqrt(variance)
+        growth *= 1 + (mu + shock) / SCALE
+        variance = omega + alpha * shock ** 2 + beta * variance
+    return growth - 1
+
+
+def garch_var(states, weights=None, horizon=10, confidence_levels=(0.95, 0.99), num_paths=100000,
+              correlation=None, seed=None):
+    """
+    Multi-day VaR and expected shortfall from GARCH scenario paths.
+
+    Args:
+    states (dict): {ticker: GARCH state} as returned by VolatilityService.states.
+    weights (dict, optional): {ticker: weight} of a buy-and-hold portfolio to report.
+    horizon (int): Holding period in days.
+    confidence_levels (tuple): Confidence levels to report.
+    num_paths (int): Number of simulated paths.
+    correlation (pandas.DataFrame, optional): Correlation of the shocks across tickers.
+    seed (int, optional): Seed of the random generator.
+
+    Returns:
+    pandas.DataFrame: One row per ticker, then 'Portfolio' if weights are given, columns
+    (measure, confidence level), values as horizon returns so losses are negative.
+    """
+    tickers = list(states)
+    if correlation is not None:
+        correlation = np.asarray(correlation.loc[tickers, tickers], dtype=np.float64)
+    scenarios = simulate_garch([states[ticker] for ticker in tickers], horizon, num_paths, correlation, seed)
+    index = tickers
+    if weights is not None:
+        scenarios = np.hstack([scenarios, scenarios @ np.array([[weights.get(ticker, 0.0)] for ticker in tickers])])
+        index = tickers + ['Portfolio']
+    var, es = tail_measures(scenarios, list(confidence_levels))
+    columns = pd.MultiIndex.from_product([MEASURES, list(confidence_levels)], names=['Measure', 'Confidence'])
+    return pd.DataFrame(np.vstack([var, es]).T, index=index, columns=columns)
+
+
+def _fit_ticker(job):
+    ticker, returns, starting_values = job
+    try:
+        return ticker, fit_garch(returns, starting_values)
+    except Exception as e:
+        print(f"GARCH fit failed for {ticker}: {e}")
+        return ticker, None
+
+
+class VolatilityService:
+    """
+    Per-ticker GARCH(1,1) volatilities for a whole universe, kept current day by day.
+
+    On a refit every ticker is fitted again across a process pool, each optimizer
+    starting from that ticker's previous parameters, which are usually a few
+    iterations away from the new optimum. Without a refit, the saved conditional
+    variance is rolled forward over the new returns with the GARCH recursion. States
+    are saved as one JSON file per ticker.
+
+    Args:
+    root (str, optional): Directory of the saved states, defaults to DEFAULT_GARCH_DIR.
+    workers (int, optional): Fitting processes, None for one per CPU.
+    """
+
+    def __init__(self, root=None, workers=None):
+        self.root = root or DEFAULT_GARCH_DIR
+        self.workers = workers
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, ticker):
+        return os.path.join(self.root, ticker.upper().replace('/', '_') + ".json")
+
+    def load(self, ticker):
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def save(self, ticker, state):
+        path = self._path(ticker)
+        with open(path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+    def states(self, tickers):
+        """
+        Return the saved states of the tickers that have one, as {ticker: state}.
+        """
+        states = {ticker: self.load(ticker) for ticker in tickers}
+        return {ticker: state for ticker, state in states.items() if state is not None}
+
+    def refresh(self, tickers, start_date, end_date, refit=True, field='Adj Close'):
+        """
+        Bring the volatility of every ticker up to end_date.
+
+        Tickers without a saved state are always fitted. Use refit=False between
+        scheduled refits to only roll the saved variances forward.
+
+        Args:
+        tickers (list): Ticker symbols.
+        start_date (str): First day of the fitted history.
+        end_date (str): End date, exclusive like the price cache.
+        refit (bool): Refit the parameters of tickers that have a saved state.
+        field (str): Price field the returns are computed from.
+
+        Returns:
+        pandas.DataFrame: Per ticker the parameters, the next-day 'Volatility' and its
+        annualized value, in return units, and the last day included.
+        """
+        frames = fetch_prices_many(tickers, start_date, end_date)
+        # Today's bar is still forming, so only completed days enter the saved variances
+        today = to_day(pd.Timestamp.today())
+        returns = {ticker: frame[field].pct_change().dropna() for ticker, frame in frames.items()}
+        returns = {ticker: series[series.index < today] for ticker, series in returns.items()}
+        returns = {ticker: series for ticker, series in returns.items() if len(series) > 1}
+        with self._lock:
+            states = {ticker: self.load(ticker) for ticker in returns}
+            jobs = [(ticker, series.to_numpy(), states[ticker]['params'] if states[ticker] else None)
+                    for ticker, series in returns.items() if refit or states[ticker] is None]
+            if self.workers == 1 or len(jobs) < 2:
+                fitted = list(map(_fit_ticker, jobs))
+            else:
+                workers = self.workers or os.cpu_count()
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    fitted = list(pool.map(_fit_ticker, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+            for ticker, state in fitted:
+                # A failed refit keeps the previous state, which is rolled forward below
+                if state is not None:
+                    state['last_date'] = str(returns[ticker].index[-1].date())
+                    states[ticker] = state
+
+            rows = {}
+            for ticker, series in returns.items():
+                state = states[ticker]
+                if state is None:
+                    continue
+                roll_variance(state, series[series.index > pd.Timestamp(state['last_date'])].to_numpy())
+                # An end_date before the saved day rolls nothing and must not move it back
+                state['last_date'] = max(state['last_date'], str(series.index[-1].date()))
+                self.save(ticker, state)
+                mu, omega, alpha, beta = state['params']
+                volatility = np.sqrt(forecast_variance(state)) / SCALE
+                rows[ticker] = {'mu': mu / SCALE, 'omega': omega / SCALE ** 2, 'alpha': alpha, 'beta': beta,
+                                'Volatility': volatility, 'Annual Volatility': volatility * np.sqrt(252),
+                                'Last Date': state['last_date']}
+        return pd.DataFrame.from_dict(rows, orient='index')
@@ -1,38 +1,57 @@
-import yfinance as yf
 import numpy as np
 import pandas as pd
 from arch import arch_model
 import matplotlib.pyplot as plt
-
-portfolio = {"ENB": 0.15, "QQQ": 0.15, "SPY": 0.05, "NVDA": 0.1, "MSFT": 0.07, "GOOG": 0.05, "VZ": 0.07, "T": 0.05, "AMZN": 0.07, "C": 0.03, "RY": 0.05, "BNS": 0.03, "BAC": 0.03, "MA": 0.05, "UBER": 0.05}
-
-start_date = "2022-01-01"
-end_date = "2023-01-01"
-
-stock_data = {}
-for ticker, weight in portfolio.items():
-    data = yf.download(ticker, start=start_date, end=end_date)
-    stock_data[ticker] = {'data': data, 'weight': weight}
-
-returns = pd.DataFrame()
-for ticker, stock_info in stock_data.items():
-    data = stock_info['data']
-    weight = stock_info['weight']
-    returns[ticker] = data['Adj Close'].pct_change().dropna() * 10 * weight
-
-returns['Portfolio'] = returns.sum(axis=1)
-
-model = arch_model(returns['Portfolio'], vol='Garch', p=1, q=1)
-results = model.fit()
-
-print(results.summary())
-
-fig, ax = plt.subplots(figsize=(10, 6))
-ax.plot(returns.index, returns['Portfolio'], label='Portfolio Returns')
-ax.plot(returns.index, results.conditional_volatility, label='Conditional Volatility (GARCH(1,1))', color='red')
-
-ax.set(title='Portfolio Returns and GARCH(1,1) Conditional Volatility',
-       xlabel='Date', ylabel='Returns / Volatility')
-ax.legend()
-
-plt.show()
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices_many
+from indicatorModels.GARCHEngine import VolatilityService, garch_var
+from indicatorModels.EstimatorStore import fetch_moments
+
+if __name__ == "__main__":
+    portfolio = {"ENB": 0.15, "QQQ": 0.15, "SPY": 0.05, "NVDA": 0.1, "MSFT": 0.07, "GOOG": 0.05, "VZ": 0.07, "T": 0.05, "AMZN": 0.07, "C": 0.03, "RY": 0.05, "BNS": 0.03, "BAC": 0.03, "MA": 0.05, "UBER": 0.05}
+
+    start_date = "2022-01-01"
+    end_date = "2023-01-01"
+
+    # Download every ticker at once, concurrently
+    frames = fetch_prices_many(list(portfolio), start_date, end_date)
+    stock_data = {}
+    for ticker, weight in portfolio.items():
+        stock_data[ticker] = {'data': frames[ticker], 'weight': weight}
+
+    returns = pd.DataFrame()
+    for ticker, stock_info in stock_data.items():
+        data = stock_info['data']
+        weight = stock_info['weight']
+        returns[ticker] = data['Adj Close'].pct_change().dropna() * 10 * weight
+
+    returns['Portfolio'] = returns.sum(axis=1)
+
+    model = arch_model(returns['Portfolio'], vol='Garch', p=1, q=1)
+    results = model.fit()
+
+    print(results.summary())
+
+    # Per-ticker GARCH(1,1) fitted across a process pool, warm-started from the saved fits
+    service = VolatilityService()
+    volatility = service.refresh(list(portfolio), start_date, end_date)
+    print(volatility[['alpha', 'beta', 'Volatility', 'Annual Volatility']])
+
+    # 10-day VaR and expected shortfall from 100k volatility-clustered scenarios, shocks
+    # correlated like the daily returns
+    _, covariance = fetch_moments(list(portfolio), start_date, end_date, 'Adj Close')
+    deviation = np.sqrt(np.diag(covariance))
+    correlation = covariance / np.outer(deviation, deviation)
+    print(garch_var(service.states(list(portfolio)), portfolio, horizon=10, correlation=correlation))
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(returns.index, returns['Portfolio'], label='Portfolio Returns')
+    ax.plot(returns.index, results.conditional_volatility, label='Conditional Volatility (GARCH(1,1))', color='red')
+
+    ax.set(title='Portfolio Returns and GARCH(1,1) Conditional Volatility',
+           xlabel='Date', ylabel='Returns / Volatility')
+    ax.legend()
+
+    plt.show()
@@ -1,19 +1,20 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import seaborn as sns
 import mplfinance as mpf
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices_many, period_to_range
 
 sns.set(style="whitegrid")
 
 indices = ['^GSPC', '^DJI', '^IXIC', '^RUT']  # S&P 500, Dow Jones, Nasdaq, Russell 2000
 
 def fetch_data(tickers, period='1y'):
-    data = {}
-    for ticker in tickers:
-        data[ticker] = yf.download(ticker, period=period)
-    return data
+    start_date, end_date = period_to_range(period)
+    return fetch_prices_many(tickers, start_date, end_date)
 
 def calculate_daily_change(data):
     for ticker, df in data.items():
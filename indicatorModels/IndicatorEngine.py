@@ -0,0 +1,349 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+PANEL_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+INDICATORS = [
+    'EMA_20', 'MA_20', 'Upper_BB', 'Lower_BB', 'RSI', 'MACD', 'Signal_Line', 'ATR', 'OBV',
+    'MFI', 'Upper_Envelope', 'Lower_Envelope', 'Chaikin_Oscillator', '%K', '%D'
+]
+
+
+# Every function below works on 2-D dates x tickers arrays, one column per ticker.
+# Leading rows where every field of a ticker is NaN are rows the ticker does not have
+# (stack_tails pads shorter histories this way); a NaN after its first bar is a missing
+# bar of its own DataFrame. A column thus gives the same values as the pandas formulas
+# applied to that ticker's own DataFrame, gaps included. Like pandas rolling/ewm, the
+# window functions treat +/-inf as missing.
+
+def finite(x):
+    return np.where(np.isinf(x), np.nan, x)
+
+
+def shift(x, periods=1):
+    out = np.full_like(x, np.nan)
+    out[periods:] = x[:-periods]
+    return out
+
+
+def ema(x, span, state=None):
+    """
+    Exponential moving average matching pandas ewm(span=span, adjust=False).mean().
+
+    Args:
+    x (numpy.ndarray): dates x tickers values.
+    span (int): EMA span.
+    state (dict, optional): Carries the recursion across consecutive row blocks; pass
+        the same dict for every block and it is updated in place.
+
+    Returns:
+    numpy.ndarray: dates x tickers EMA.
+    """
+    alpha = 2.0 / (span + 1)
+    x = finite(x)
+    state = {} if state is None else state
+    weighted = state.get('weighted', np.full(x.shape[1:], np.nan))
+    old_wt = state.get('old_wt', np.ones(x.shape[1:]))
+    started = ~np.isnan(weighted)
+    missing = np.isnan(x)
+    leading = np.logical_and.accumulate(missing, axis=0)
+    if (missing == leading).all() and not (leading[0] & started).any() and (old_wt[started] == 1).all():
+        # Columns only start late and none carries a gap from the previous block: hold
+        # each at its first value so the filter output is unchanged from there on, then
+        # blank the leading rows again
+        first = x[np.argmax(~missing, axis=0), np.arange(x.shape[1])]
+        filled = np.where(leading, first, x)
+        initial = np.where(started, weighted, first)
+        out = lfilter([alpha], [1.0, alpha - 1.0], filled, axis=0, zi=(1.0 - alpha) * initial[None, :])[0]
+        out[leading] = np.nan
+        state['weighted'] = out[-1].copy()
+        state['old_wt'] = np.ones(x.shape[1:])
+        return out
+
+    # Gaps inside a column: step every column through pandas' recursion, which decays
+    # the old weight across the missing bars
+    out = np.empty_like(x)
+    for i in range(len(x)):
+        cur = x[i]
+        observed = ~np.isnan(cur)
+        started = ~np.isnan(weighted)
+        old_wt = np.where(started, old_wt * (1.0 - alpha), old_wt)
+        # pandas special-cases com == 1 (span 3) to renormalize after gaps
+        new_wt = 1.0 - old_wt if span == 3 else alpha
+        update = started & observed & (weighted != cur)
+        weighted = np.where(update, (old_wt * weighted + new_wt * cur) / (old_wt + new_wt), weighted)
+        old_wt = np.where(started & observed, 1.0, old_wt)
+        weighted = np.where(~started & observed, cur, weighted)
+        out[i] = weighted
+    state['weighted'] = weighted
+    state['old_wt'] = old_wt
+    return out
+
+
+def rolling_sum(x, window):
+    """
+    Rolling sum matching pandas rolling(window).sum(), NaN until a window holds no missing bar.
+    """
+    x = finite(x)
+    missing = np.isnan(x)
+    sums = np.cumsum(np.where(missing, 0.0, x), axis=0)
+    counts = np.cumsum(missing, axis=0)
+    out = sums.copy()
+    out[window:] -= sums[:-window]
+    gaps = counts.copy()
+    gaps[window:] -= counts[:-window]
+    out[gaps > 0] = np.nan
+    out[:window - 1] = np.nan
+    return out
+
+
+def rolling_mean(x, window):
+    return rolling_sum(x, window) / window
+
+
+def rolling_std(x, window):
+    """
+    Rolling sample standard deviation matching pandas rolling(window).std().
+    """
+    # Centering each column first keeps the sum-of-squares difference well conditioned
+    x = finite(x)
+    center = np.nanmean(np.where(np.isnan(x).all(axis=0), 0.0, x), axis=0)
+    centered = x - center
+    s1 = rolling_sum(centered, window)
+    s2 = rolling_sum(centered * centered, window)
+    return np.sqrt(np.maximum(s2 - s1 * s1 / window, 0.0) / (window - 1))
+
+
+def rolling_min(x, window):
+    out = np.full_like(x, np.nan)
+    if len(x) < window:
+        return out
+    out[window - 1:] = np.lib.stride_tricks.sliding_window_view(finite(x), window, axis=0).min(axis=-1)
+    return out
+
+
+def rolling_max(x, window):
+    out = np.full_like(x, np.nan)
+    if len(x) < window:
+        return out
+    out[window - 1:] = np.lib.stride_tricks.sliding_window_view(finite(x), window, axis=0).max(axis=-1)
+    return out
+
+
+def cumsum_skipna(x, state=None, key='total'):
+    """
+    Cumulative sum matching pandas cumsum(), skipping but keeping missing bars.
+
+    The running total is carried in state[key] when a state dict is given.
+    """
+    missing = np.isnan(x)
+    out = np.cumsum(np.where(missing, 0.0, x), axis=0)
+    if state is not None:
+        out += state.get(key, 0.0)
+        state[key] = out[-1].copy()
+    out[missing] = np.nan
+    return out
+
+
+def where_present(condition, values, present):
+    # pandas Series.where(condition, 0) on a per-ticker frame: a missing bar fails the
+    # condition and becomes 0 like any other, only rows the ticker does not have stay NaN
+    return np.where(present, np.where(condition, values, 0.0), np.nan)
+
+
+# Rows of input history a block needs before its first row: the longest window (20)
+# plus the lags of diff/shift and of the 3-bar %D smoothing, rounded up
+CONTEXT_ROWS = 32
+
+
+def compute_indicators(panel, indicators=INDICATORS, out=None, block_elements=1 << 16):
+    """
+    Compute technical indicators for every ticker of a panel in vectorized passes.
+
+    The panel is processed as a fused kernel over blocks of rows: each block reads its
+    rows plus CONTEXT_ROWS of history, EMA recursions and cumulative sums carry their
+    state into the next block, and only the requested indicators are written, straight
+    into the output buffer. Temporaries therefore stay at block size however long the
+    history is, and intermediates such as MA_20, EMA_12 or the ADL are never stored.
+
+    Args:
+    panel (dict): 'Open', 'High', 'Low', 'Close' and 'Volume' dates x tickers arrays.
+    indicators (list): Names of the indicators to compute, a subset of INDICATORS.
+    out (numpy.ndarray, optional): Preallocated (len(indicators), dates, tickers) float64
+        buffer to write into, allocated when omitted.
+    block_elements (int): Approximate number of values per block and temporary.
+
+    Returns:
+    dict: Indicator name -> dates x tickers view into `out`.
+    """
+    indicators = list(indicators)
+    unknown = set(indicators) - set(INDICATORS)
+    if unknown:
+        raise ValueError(f"Unknown indicators: {sorted(unknown)}")
+    o, h, l, c, v = (np.asarray(panel[field], dtype=np.float64) for field in PANEL_FIELDS)
+    rows, columns = c.shape
+    # First row each ticker has, the rows before it are padding
+    observed = ~(np.isnan(o) & np.isnan(h) & np.isnan(l) & np.isnan(c) & np.isnan(v))
+    first = np.where(observed.any(axis=0), observed.argmax(axis=0), rows)
+    if out is None:
+        out = np.empty((len(indicators), rows, columns))
+    targets = dict(zip(indicators, out))
+    rows_per_block = max(8 * CONTEXT_ROWS, block_elements // max(columns, 1))
+    state = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, rows, rows_per_block):
+            stop = min(start + rows_per_block, rows)
+            lead = min(start, CONTEXT_ROWS)
+            block = slice(start - lead, stop)
+            present = np.arange(start - lead, stop)[:, None] >= first[None, :]
+            _fill_block(o[block], h[block], l[block], c[block], v[block], present, lead,
+                        {name: target[start:stop] for name, target in targets.items()}, state)
+    return targets
+
+
+def _fill_block(o, h, l, c, v, present, lead, targets, state):
+    # Write the requested indicators for the rows after the first `lead` context rows
+    new = slice(lead, None)
+
+    def wanted(*names):
+        return any(name in targets for name in names)
+
+    def emit(name, values):
+        if name in targets:
+            targets[name][...] = values
+
+    # Exponential Moving Average (EMA)
+    if wanted('EMA_20'):
+        emit('EMA_20', ema(c[new], 20, state.setdefault('EMA_20', {})))
+
+    # Bollinger Bands and Moving Average Envelopes
+    if wanted('MA_20', 'Upper_BB', 'Lower_BB', 'Upper_Envelope', 'Lower_Envelope'):
+        ma_20 = rolling_mean(c, 20)[new]
+        emit('MA_20', ma_20)
+        if wanted('Upper_BB', 'Lower_BB'):
+            std_20 = rolling_std(c, 20)[new]
+            emit('Upper_BB', ma_20 + std_20 * 2)
+            emit('Lower_BB', ma_20 - std_20 * 2)
+        emit('Upper_Envelope', ma_20 * 1.025)
+        emit('Lower_Envelope', ma_20 * 0.975)
+
+    # Relative Strength Index (RSI)
+    if wanted('RSI'):
+        delta = c - shift(c)
+        gain = rolling_mean(where_present(delta > 0, delta, present), 14)[new]
+        loss = rolling_mean(where_present(delta < 0, -delta, present), 14)[new]
+        emit('RSI', 100 - (100 / (1 + gain / loss)))
+
+    # Moving Average Convergence Divergence (MACD)
+    if wanted('MACD', 'Signal_Line'):
+        macd = ema(c[new], 12, state.setdefault('EMA_12', {})) - ema(c[new], 26, state.setdefault('EMA_26', {}))
+        emit('MACD', macd)
+        emit('Signal_Line', ema(macd, 9, state.setdefault('Signal_Line', {})))
+
+    # Average True Range (ATR)
+    if wanted('ATR'):
+        emit('ATR', rolling_mean(np.abs(h - l), 14)[new])
+
+    # On-Balance Volume (OBV)
+    if wanted('OBV'):
+        emit('OBV', cumsum_skipna(v[new] * ((c[new] - o[new]) / (h[new] - l[new])), state, 'OBV'))
+
+    # Money Flow Index (MFI)
+    if wanted('MFI'):
+        typical_price = (h + l + c) / 3
+        previous = shift(typical_price)
+        raw_money_flow = typical_price * v
+        positive_flow = rolling_sum(where_present(typical_price > previous, raw_money_flow, present), 14)[new]
+        negative_flow = rolling_sum(where_present(typical_price < previous, -raw_money_flow, present), 14)[new]
+        emit('MFI', 100 - (100 / (1 + positive_flow / negative_flow)))
+
+    # Chaikin Oscillator
+    if wanted('Chaikin_Oscillator'):
+        adl = cumsum_skipna(((2 * c[new] - h[new] - l[new]) / (h[new] - l[new])) * v[new], state, 'ADL')
+        emit('Chaikin_Oscillator', ema(adl, 3, state.setdefault('EMA_3_ADL', {}))
+             - ema(adl, 10, state.setdefault('EMA_10_ADL', {})))
+
+    # Stochastic Oscillator
+    if wanted('%K', '%D'):
+        lowest_low = rolling_min(l, 14)
+        highest_high = rolling_max(h, 14)
+        k = ((c - lowest_low) / (highest_high - lowest_low)) * 100
+        emit('%K', k[new])
+        emit('%D', rolling_mean(k, 3)[new])
+
+
+def build_panel(frames, fields=PANEL_FIELDS):
+    """
+    Align per-ticker OHLCV DataFrames into dates x tickers arrays.
+
+    Args:
+    frames (dict): Ticker -> OHLCV DataFrame.
+    fields (list): Columns to stack.
+
+    Returns:
+    tuple: (pandas.DatetimeIndex of all dates, list of tickers, dict field -> numpy.ndarray).
+    """
+    tickers = list(frames)
+    index = pd.DatetimeIndex([])
+    for frame in frames.values():
+        index = index.union(frame.index)
+    panel = {field: pd.DataFrame({ticker: frames[ticker][field] for ticker in tickers})
+             .reindex(index).to_numpy(dtype=np.float64) for field in fields}
+    return index, tickers, panel
+
+
+def stack_tails(frames, fields=PANEL_FIELDS):
+    """
+    Stack per-ticker OHLCV DataFrames row by row, aligned on their last bar.
+
+    Shorter histories are padded with leading NaN, so every column gives exactly the
+    values the formulas produce on that ticker's own DataFrame, whatever its calendar.
+
+    Args:
+    frames (dict): Ticker -> OHLCV DataFrame.
+    fields (list): Columns to stack.
+
+    Returns:
+    dict: Field -> rows x tickers numpy.ndarray.
+    """
+    rows = max(len(frame) for frame in frames.values())
+    panel = {}
+    for field in fields:
+        values = np.full((rows, len(frames)), np.nan)
+        for column, frame in enumerate(frames.values()):
+            values[rows - len(frame):, column] = frame[field].to_numpy(dtype=np.float64)
+        panel[field] = values
+    return panel
+
+
+def calculate_indicators_many(frames, indicators=INDICATORS):
+    """
+    Add indicator columns to many per-ticker OHLCV DataFrames with one panel computation.
+
+    Args:
+    frames (dict): Ticker -> OHLCV DataFrame, updated in place.
+    indicators (list): Names of the indicators to add.
+
+    Returns:
+    dict: The same frames with one column per indicator.
+    """
+    present = {ticker: frame for ticker, frame in frames.items() if not frame.empty}
+    if not present:
+        return frames
+    panel = stack_tails(present)
+    rows = len(panel['Close'])
+    out = np.empty((len(indicators), rows, len(present)))
+    compute_indicators(panel, indicators, out=out)
+    for column, frame in enumerate(present.values()):
+        frame[list(indicators)] = out[:, rows - len(frame):, column].T
+    return frames
+
+
+def calculate_indicators(data, indicators=INDICATORS):
+    """
+    Add indicator columns to a single OHLCV DataFrame.
+    """
+    if data.empty:
+        return data
+    return calculate_indicators_many({'': data}, indicators)['']
@@ -1,14 +1,18 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices, fetch_panel
 
 # Function to fetch data
 def fetch_data(tickers, start, end):
-    data = yf.download(tickers, start=start, end=end)
-    return data['Adj Close']
+    if isinstance(tickers, str):
+        return fetch_prices(tickers, start, end)['Adj Close']
+    return fetch_panel(tickers, start, end, 'Adj Close')
 
 # Function to calculate moving averages
 def moving_average(data, window):
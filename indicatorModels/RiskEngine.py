@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+from dataModels.PriceStore import fetch_panel
+from predictionModels.MonteCarloEngine import cholesky_factor
+
+METHODS = ['Parametric', 'Historical', 'Monte Carlo']
+MEASURES = ['VaR', 'ES']
+
+
+def load_returns(tickers, start_date, end_date, field='Adj Close'):
+    """
+    Load one aligned matrix of daily returns for many tickers.
+
+    Prices come from the shared price cache in a single panel request; only the dates
+    every ticker traded are kept so all columns share one calendar.
+
+    Args:
+    tickers (list): Ticker symbols.
+    start_date (str): Start date.
+    end_date (str): End date.
+    field (str): Price field the returns are computed from.
+
+    Returns:
+    pandas.DataFrame: dates x tickers simple returns.
+    """
+    prices = fetch_panel(list(dict.fromkeys(tickers)), start_date, end_date, field)
+    return prices.pct_change().dropna()
+
+
+def weight_matrix(portfolios, tickers):
+    """
+    Turn {name: {ticker: weight}} into a (portfolios, tickers) matrix, absent tickers at 0.
+    """
+    weights = np.zeros((len(portfolios), len(tickers)))
+    column = {ticker: i for i, ticker in enumerate(tickers)}
+    for row, holdings in enumerate(portfolios.values()):
+        for ticker, weight in holdings.items():
+            if ticker not in column:
+                raise KeyError(f"{ticker} is held by a portfolio but has no returns")
+            weights[row, column[ticker]] = weight
+    return weights
+
+
+def tail_measures(sample, confidence_levels):
+    """
+    Historical VaR and expected shortfall of every column of a sample.
+
+    One np.partition per column places the order statistic of every confidence level at
+    once; everything in front of a level's order statistic is at least as bad, so its
+    expected shortfall is the mean of that prefix.
+
+    Args:
+    sample (numpy.ndarray): observations x columns returns.
+    confidence_levels (list): Confidence levels, e.g. [0.95, 0.99].
+
+    Returns:
+    tuple: (levels x columns VaR, levels x columns ES), as returns (losses negative).
+    """
+    count = len(sample)
+    ranks = [max(int(np.ceil((1 - level) * count)) - 1, 0) for level in confidence_levels]
+    ordered = np.partition(sample, sorted(set(ranks)), axis=0)
+    var = np.stack([ordered[rank] for rank in ranks])
+    es = np.stack([ordered[:rank + 1].mean(axis=0) for rank in ranks])
+    return var, es
+
+
+def risk_report(returns, portfolios=None, confidence_levels=(0.95, 0.99), num_simulations=10000, seed=None):
+    """
+    Parametric, historical and Monte Carlo VaR and expected shortfall for every asset and portfolio.
+
+    The covariance matrix is computed once; portfolio volatilities are quadratic forms
+    against it and portfolio returns are one matrix product with the weights. The Monte
+    Carlo sample draws correlated normal returns through the Cholesky factor of the same
+    covariance. Like calculate_var, the parametric figures assume zero mean returns and
+    the variance uses ddof=0 as np.var does.
+
+    Args:
+    returns (pandas.DataFrame): dates x tickers returns, as from load_returns.
+    portfolios (dict, optional): {name: {ticker: weight}} portfolios to report on.
+    confidence_levels (tuple): Confidence levels to report.
+    num_simulations (int): Monte Carlo sample size.
+    seed (int, optional): Seed of the Monte Carlo sample.
+
+    Returns:
+    pandas.DataFrame: One row per asset then per portfolio, columns (method, measure,
+    confidence level), values as daily returns so losses are negative.
+    """
+    portfolios = portfolios or {}
+    tickers = list(returns.columns)
+    levels = list(confidence_levels)
+    weights = weight_matrix(portfolios, tickers)
+    data = returns.to_numpy(dtype=np.float64)
+    mean = data.mean(axis=0)
+    centered = data - mean
+    covariance = centered.T @ centered / len(data)
+
+    # Parametric: normal quantiles of the asset and portfolio volatilities
+    volatility = np.concatenate([np.sqrt(np.diag(covariance)),
+                                 np.sqrt(np.einsum('pa,ab,pb->p', weights, covariance, weights))])
+    z = norm.ppf(1 - np.asarray(levels))[:, None]
+    parametric = (z * volatility, -norm.pdf(z) / (1 - np.asarray(levels))[:, None] * volatility)
+
+    # Historical: the observed returns, portfolios appended as extra columns
+    historical = tail_measures(np.hstack([data, data @ weights.T]), levels)
+
+    # Monte Carlo: correlated normal returns with the sample mean and covariance
+    rng = np.random.default_rng(seed)
+    simulated = rng.standard_normal((num_simulations, len(tickers))) @ cholesky_factor(covariance).T + mean
+    monte_carlo = tail_measures(np.hstack([simulated, simulated @ weights.T]), levels)
+
+    columns = pd.MultiIndex.from_product([METHODS, MEASURES, levels], names=['Method', 'Measure', 'Confidence'])
+    values = np.vstack([measure for method in (parametric, historical, monte_carlo) for measure in method])
+    return pd.DataFrame(values.T, index=tickers + list(portfolios), columns=columns)
@@ -0,0 +1,428 @@
+import math
+from collections import deque
+
+NAN = float('nan')
+
+
+def divide(a, b):
+    # Float division with numpy semantics (x / 0 -> +/-inf, 0 / 0 -> nan)
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class StreamingIndicator:
+    """
+    Base class of the indicators that update in constant time per new bar.
+
+    State lives in __slots__, so an indicator is a handful of floats plus at most one
+    window buffer. checkpoint() turns that state into plain JSON-serializable values
+    and restore() rebuilds an identical indicator from them, which lets end-of-day and
+    intraday jobs resume where the previous run stopped instead of replaying history.
+    Outputs are NaN until the indicator has seen enough bars, like the batch versions.
+    """
+
+    __slots__ = ()
+    _types = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        StreamingIndicator._types[cls.__name__] = cls
+
+    @classmethod
+    def _slots(cls):
+        return [name for klass in reversed(cls.__mro__) for name in getattr(klass, '__slots__', ())]
+
+    def checkpoint(self):
+        """
+        Return the indicator state as a dict of plain values.
+        """
+        state = {'type': type(self).__name__}
+        for name in self._slots():
+            value = getattr(self, name)
+            if isinstance(value, StreamingIndicator):
+                value = value.checkpoint()
+            elif isinstance(value, deque):
+                value = {'deque': [list(item) if isinstance(item, tuple) else item for item in value],
+                         'maxlen': value.maxlen}
+            state[name] = value
+        return state
+
+    @staticmethod
+    def restore(state):
+        """
+        Rebuild an indicator from a dict produced by checkpoint().
+        """
+        cls = StreamingIndicator._types[state['type']]
+        indicator = cls.__new__(cls)
+        for name in cls._slots():
+            value = state[name]
+            if isinstance(value, dict) and 'type' in value:
+                value = StreamingIndicator.restore(value)
+            elif isinstance(value, dict) and 'deque' in value:
+                value = deque((tuple(item) if isinstance(item, list) else item for item in value['deque']),
+                              maxlen=value['maxlen'])
+            setattr(indicator, name, value)
+        return indicator
+
+    def replay(self, *series):
+        """
+        Feed a history through update() and return the last output.
+        """
+        result = NAN
+        for values in zip(*series):
+            result = self.update(*values)
+        return result
+
+
+class RollingSum(StreamingIndicator):
+    """
+    Sum over the last `window` values, NaN while the window holds a missing value.
+    """
+
+    __slots__ = ('window', 'values', 'total', 'missing', 'since_resync')
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.missing = 0
+        self.since_resync = 0
+
+    def update(self, value):
+        if len(self.values) == self.window:
+            dropped = self.values[0]
+            if math.isnan(dropped):
+                self.missing -= 1
+            else:
+                self.total -= dropped
+        self.values.append(value)
+        if math.isnan(value):
+            self.missing += 1
+        else:
+            self.total += value
+        # Re-add the window once per cycle so add/remove rounding cannot drift
+        self.since_resync += 1
+        if self.since_resync >= self.window:
+            self.total = math.fsum(v for v in self.values if not math.isnan(v))
+            self.since_resync = 0
+        if self.missing or len(self.values) < self.window:
+            return NAN
+        return self.total
+
+
+class SMA(RollingSum):
+    """
+    Simple moving average, the streaming form of rolling(window).mean().
+    """
+
+    __slots__ = ()
+
+    def update(self, value):
+        return RollingSum.update(self, value) / self.window
+
+
+class RollingStd(StreamingIndicator):
+    """
+    Sample standard deviation over the last `window` values, as rolling(window).std().
+
+    Uses Welford's update and its inverse as values enter and leave the window, which
+    stays accurate for prices far from zero. Missing values are kept out of the mean
+    and m2 and the output is NaN while the window holds one.
+    """
+
+    __slots__ = ('window', 'values', 'mean', 'm2', 'missing')
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.missing = 0
+
+    def update(self, value):
+        if math.isinf(value):
+            value = NAN
+        if len(self.values) == self.window:
+            dropped = self.values.popleft()
+            count = len(self.values) + 1 - self.missing
+            if math.isnan(dropped):
+                self.missing -= 1
+            elif count == 1:
+                self.mean = self.m2 = 0.0
+            else:
+                delta = dropped - self.mean
+                self.mean -= delta / (count - 1)
+                self.m2 -= delta * (dropped - self.mean)
+        self.values.append(value)
+        if math.isnan(value):
+            self.missing += 1
+        else:
+            delta = value - self.mean
+            self.mean += delta / (len(self.values) - self.missing)
+            self.m2 += delta * (value - self.mean)
+        if self.missing or len(self.values) < self.window:
+            return NAN
+        return math.sqrt(max(self.m2, 0.0) / (self.window - 1))
+
+
+class EMA(StreamingIndicator):
+    """
+    Exponential moving average, the streaming form of ewm(span=span, adjust=False).mean().
+
+    Like pandas, the weight of the average decays across missing values, so the first
+    value after a gap counts for more than alpha.
+    """
+
+    __slots__ = ('alpha', 'value', 'old_wt')
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1)
+        self.value = NAN
+        self.old_wt = 1.0
+
+    def update(self, value):
+        observed = not (math.isnan(value) or math.isinf(value))
+        if math.isnan(self.value):
+            if observed:
+                self.value = value
+            return self.value
+        self.old_wt *= 1.0 - self.alpha
+        if observed:
+            # pandas special-cases com == 1 (span 3) to renormalize after gaps
+            new_wt = 1.0 - self.old_wt if self.alpha == 0.5 else self.alpha
+            if self.value != value:
+                self.value = (self.old_wt * self.value + new_wt * value) / (self.old_wt + new_wt)
+            self.old_wt = 1.0
+        return self.value
+
+
+class BollingerBands(StreamingIndicator):
+    """
+    Moving average with bands `width` standard deviations above and below it.
+
+    update() returns (middle, upper, lower).
+    """
+
+    __slots__ = ('width', 'average', 'deviation')
+
+    def __init__(self, window=20, width=2):
+        self.width = width
+        self.average = SMA(window)
+        self.deviation = RollingStd(window)
+
+    def update(self, value):
+        middle = self.average.update(value)
+        spread = self.deviation.update(value) * self.width
+        return middle, middle + spread, middle - spread
+
+
+class RSI(StreamingIndicator):
+    """
+    Relative Strength Index on simple averages of gains and losses, as in RSI.rsi().
+    """
+
+    __slots__ = ('previous', 'gains', 'losses')
+
+    def __init__(self, window=14):
+        self.previous = NAN
+        self.gains = SMA(window)
+        self.losses = SMA(window)
+
+    def update(self, close):
+        delta = close - self.previous
+        self.previous = close
+        gain = self.gains.update(delta if delta > 0 else 0.0)
+        loss = self.losses.update(-delta if delta < 0 else 0.0)
+        return 100 - divide(100, 1 + divide(gain, loss))
+
+
+class MACD(StreamingIndicator):
+    """
+    MACD line and signal line. update() returns (macd, signal).
+    """
+
+    __slots__ = ('fast', 'slow', 'signal')
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close):
+        line = self.fast.update(close) - self.slow.update(close)
+        return line, self.signal.update(line)
+
+
+class ATR(StreamingIndicator):
+    """
+    Average of the high-low range over `window` bars, as in the dashboards.
+    """
+
+    __slots__ = ('ranges',)
+
+    def __init__(self, window=14):
+        self.ranges = SMA(window)
+
+    def update(self, high, low):
+        return self.ranges.update(abs(high - low))
+
+
+class OBV(StreamingIndicator):
+    """
+    Volume weighted by where the close sits in the bar, accumulated over all bars.
+    """
+
+    __slots__ = ('total',)
+
+    def __init__(self):
+        self.total = 0.0
+
+    def update(self, open, high, low, close, volume):
+        flow = volume * divide(close - open, high - low)
+        if math.isnan(flow):
+            return NAN
+        self.total += flow
+        return self.total
+
+
+class MFI(StreamingIndicator):
+    """
+    Money Flow Index over `window` bars, computed like the batch indicator engine.
+    """
+
+    __slots__ = ('previous', 'positive', 'negative')
+
+    def __init__(self, window=14):
+        self.previous = NAN
+        self.positive = RollingSum(window)
+        self.negative = RollingSum(window)
+
+    def update(self, high, low, close, volume):
+        typical_price = (high + low + close) / 3
+        raw_money_flow = typical_price * volume
+        positive = self.positive.update(raw_money_flow if typical_price > self.previous else 0.0)
+        negative = self.negative.update(-raw_money_flow if typical_price < self.previous else 0.0)
+        self.previous = typical_price
+        return 100 - divide(100, 1 + divide(positive, negative))
+
+
+class ChaikinOscillator(StreamingIndicator):
+    """
+    Difference of the fast and slow EMAs of the accumulation/distribution line.
+    """
+
+    __slots__ = ('adl', 'fast', 'slow')
+
+    def __init__(self, fast=3, slow=10):
+        self.adl = 0.0
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+
+    def update(self, high, low, close, volume):
+        flow = divide(2 * close - high - low, high - low) * volume
+        if math.isnan(flow):
+            # The line is missing on this bar, as in cumsum(), so the EMAs see a gap
+            return self.fast.update(NAN) - self.slow.update(NAN)
+        self.adl += flow
+        return self.fast.update(self.adl) - self.slow.update(self.adl)
+
+
+class Stochastic(StreamingIndicator):
+    """
+    Stochastic oscillator. update() returns (%K, %D).
+
+    The lowest low and highest high of the window are kept in monotonic deques, so
+    each bar costs amortized O(1) whatever the window length. Missing lows and highs
+    stay out of the deques; %K is NaN until they have left the window, as with
+    rolling(window).min() and max().
+    """
+
+    __slots__ = ('window', 'count', 'lows', 'highs', 'last_missing', 'smooth')
+
+    def __init__(self, window=14, smooth=3):
+        self.window = window
+        self.count = 0
+        self.lows = deque()
+        self.highs = deque()
+        self.last_missing = -window
+        self.smooth = SMA(smooth)
+
+    def update(self, high, low, close):
+        self.count += 1
+        if math.isfinite(low) and math.isfinite(high):
+            while self.lows and self.lows[-1][1] >= low:
+                self.lows.pop()
+            self.lows.append((self.count, low))
+            while self.highs and self.highs[-1][1] <= high:
+                self.highs.pop()
+            self.highs.append((self.count, high))
+        else:
+            self.last_missing = self.count
+        oldest = self.count - self.window
+        while self.lows and self.lows[0][0] <= oldest:
+            self.lows.popleft()
+        while self.highs and self.highs[0][0] <= oldest:
+            self.highs.popleft()
+        if self.count < self.window or self.last_missing > oldest:
+            k = NAN
+        else:
+            lowest_low, highest_high = self.lows[0][1], self.highs[0][1]
+            k = divide(close - lowest_low, highest_high - lowest_low) * 100
+        return k, self.smooth.update(k)
+
+
+class IndicatorSet(StreamingIndicator):
+    """
+    Every dashboard indicator for one ticker, updated together from one OHLCV bar.
+
+    update() takes a mapping with 'Open', 'High', 'Low', 'Close' and 'Volume' (a dict
+    or a DataFrame row) and returns a dict keyed like IndicatorEngine.INDICATORS.
+    """
+
+    __slots__ = ('ema_20', 'bollinger', 'rsi', 'macd', 'atr', 'obv', 'mfi', 'chaikin', 'stochastic')
+
+    def __init__(self):
+        self.ema_20 = EMA(20)
+        self.bollinger = BollingerBands(20, 2)
+        self.rsi = RSI(14)
+        self.macd = MACD(12, 26, 9)
+        self.atr = ATR(14)
+        self.obv = OBV()
+        self.mfi = MFI(14)
+        self.chaikin = ChaikinOscillator(3, 10)
+        self.stochastic = Stochastic(14, 3)
+
+    def update(self, bar):
+        o, h, l, c, v = (float(bar[field]) for field in ('Open', 'High', 'Low', 'Close', 'Volume'))
+        ma_20, upper_bb, lower_bb = self.bollinger.update(c)
+        macd, signal = self.macd.update(c)
+        k, d = self.stochastic.update(h, l, c)
+        return {
+            'EMA_20': self.ema_20.update(c),
+            'MA_20': ma_20,
+            'Upper_BB': upper_bb,
+            'Lower_BB': lower_bb,
+            'RSI': self.rsi.update(c),
+            'MACD': macd,
+            'Signal_Line': signal,
+            'ATR': self.atr.update(h, l),
+            'OBV': self.obv.update(o, h, l, c, v),
+            'MFI': self.mfi.update(h, l, c, v),
+            'Upper_Envelope': ma_20 * 1.025,
+            'Lower_Envelope': ma_20 * 0.975,
+            'Chaikin_Oscillator': self.chaikin.update(h, l, c, v),
+            '%K': k,
+            '%D': d,
+        }
+
+    def replay(self, data):
+        """
+        Feed every row of an OHLCV DataFrame through update() and return the last outputs.
+        """
+        result = {}
+        for bar in data[['Open', 'High', 'Low', 'Close', 'Volume']].itertuples(index=False, name=None):
+            result = self.update(dict(zip(('Open', 'High', 'Low', 'Close', 'Volume'), bar)))
+        return result
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from scipy.special import xlogy
+from scipy.stats import chi2, norm
+from tabulate import tabulate
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indicatorModels.CovarianceEstimators import RollingCovariance, EWMACovariance
+from indicatorModels.RiskEngine import load_returns
+
+
+def backtest_var(returns, weights, window=250, confidence_level=0.95, method='sample', decay=0.94):
+    """
+    Rolling parametric VaR forecasts for a portfolio, compared with the realized returns.
+
+    Each day's VaR comes from the covariance of the returns strictly before that day,
+    as calculate_var computes it (zero mean, normal quantile), so no day sees its own
+    return. The covariance is updated incrementally rather than recomputed per window.
+
+    Args:
+    returns (pandas.DataFrame): dates x tickers returns, as from load_returns.
+    weights (dict or pandas.DataFrame): Portfolio weights by ticker, or dates x tickers
+        weights to backtest a portfolio that is rebalanced over time.
+    window (int): Observations in the rolling window, and warm-up length for EWMA.
+    confidence_level (float): VaR confidence level.
+    method (str): 'sample' for an equally weighted rolling window, 'ewma' for
+        exponential weighting.
+    decay (float): EWMA decay factor.
+
+    Returns:
+    pandas.DataFrame: 'Return', 'VaR' and 'Exception' for every day after the first window.
+    """
+    tickers = list(returns.columns)
+    data = returns.to_numpy(dtype=np.float64)
+    if isinstance(weights, pd.DataFrame):
+        weight_rows = weights.reindex(index=returns.index, columns=tickers).ffill().fillna(0.0).to_numpy()
+    else:
+        weight_rows = np.broadcast_to(pd.Series(weights).reindex(tickers).fillna(0.0).to_numpy(), data.shape)
+    if method == 'sample':
+        estimator = RollingCovariance(window, len(tickers))
+    elif method == 'ewma':
+        estimator = EWMACovariance(decay, len(tickers))
+    else:
+        raise ValueError(f"Unknown method {method!r}, expected 'sample' or 'ewma'")
+
+    z_score = norm.ppf(1 - confidence_level)
+    var = np.full(len(data), np.nan)
+    for day, x in enumerate(data):
+        if day >= window:
+            var[day] = z_score * np.sqrt(max(estimator.portfolio_variance(weight_rows[day]), 0.0))
+        estimator.update(x)
+
+    realized = np.einsum('ta,ta->t', data, weight_rows)
+    result = pd.DataFrame({'Return': realized, 'VaR': var}, index=returns.index).iloc[window:]
+    result['Exception'] = result['Return'] < result['VaR']
+    return result
+
+
+def exception_tests(exceptions, confidence_level=0.95):
+    """
+    Kupiec and Christoffersen likelihood-ratio tests of a series of VaR exceptions.
+
+    Kupiec's proportion-of-failures test checks the exception rate against 1 - confidence
+    level; Christoffersen's test checks that exceptions do not cluster, from the
+    day-to-day transition counts; the conditional coverage test combines both.
+
+    Args:
+    exceptions (pandas.Series): True on days the loss exceeded VaR.
+    confidence_level (float): Confidence level the VaR was computed at.
+
+    Returns:
+    dict: Exception counts and each test's statistic and p-value.
+    """
+    hits = np.asarray(exceptions, dtype=bool)
+    n, x = len(hits), int(hits.sum())
+    p = 1 - confidence_level
+    rate = x / n
+    kupiec = -2 * (xlogy(n - x, 1 - p) + xlogy(x, p) - xlogy(n - x, 1 - rate) - xlogy(x, rate))
+
+    previous, current = hits[:-1], hits[1:]
+    n00 = int(np.sum(~previous & ~current))
+    n01 = int(np.sum(~previous & current))
+    n10 = int(np.sum(previous & ~current))
+    n11 = int(np.sum(previous & current))
+    pi01 = n01 / max(n00 + n01, 1)
+    pi11 = n11 / max(n10 + n11, 1)
+    pi = (n01 + n11) / max(n00 + n01 + n10 + n11, 1)
+    independence = -2 * (xlogy(n00 + n10, 1 - pi) + xlogy(n01 + n11, pi)
+                         - xlogy(n00, 1 - pi01) - xlogy(n01, pi01) - xlogy(n10, 1 - pi11) - xlogy(n11, pi11))
+    conditional = kupiec + independence
+
+    return {
+        'observations': n,
+        'exceptions': x,
+        'expected': n * p,
+        'kupiec_lr': kupiec,
+        'kupiec_pvalue': chi2.sf(kupiec, 1),
+        'independence_lr': independence,
+        'independence_pvalue': chi2.sf(independence, 1),
+        'conditional_lr': conditional,
+        'conditional_pvalue': chi2.sf(conditional, 2),
+    }
+
+
+if __name__ == "__main__":
+    portfolio = {"ENB": 0.15, "QQQ": 0.15, "SPY": 0.05, "NVDA": 0.1, "MSFT": 0.07, "GOOG": 0.05, "VZ": 0.07, "T": 0.05, "AMZN": 0.07, "C": 0.03, "RY": 0.05, "BNS": 0.03, "BAC": 0.03, "MA": 0.05, "UBER": 0.05}
+
+    start_date = "2014-01-01"
+    end_date = "2024-01-01"
+    confidence_level = 0.95
+
+    returns = load_returns(list(portfolio.keys()), start_date, end_date)
+
+    table_data = []
+    for method in ['sample', 'ewma']:
+        backtest = backtest_var(returns, portfolio, window=250, confidence_level=confidence_level, method=method)
+        tests = exception_tests(backtest['Exception'], confidence_level)
+        table_data.append([method, tests['observations'], tests['exceptions'], f"{tests['expected']:.1f}",
+                           f"{tests['kupiec_pvalue']:.3f}", f"{tests['independence_pvalue']:.3f}", f"{tests['conditional_pvalue']:.3f}"])
+
+    headers = ["Method", "Days", "Exceptions", "Expected", "Kupiec p", "Independence p", "Conditional p"]
+    print(tabulate(table_data, headers=headers, tablefmt="pretty"))
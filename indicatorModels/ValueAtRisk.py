@@ -1,14 +1,16 @@
-import yfinance as yf
 import numpy as np
 import pandas as pd
 from tabulate import tabulate
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indicatorModels.RiskEngine import load_returns, risk_report
+from indicatorModels.EstimatorStore import fetch_moments
 
 def calculate_portfolio_var(portfolio, start_date, end_date):
-    data = yf.download(list(portfolio.keys()), start=start_date, end=end_date)['Adj Close']
-    returns = data.pct_change().dropna()
+    _, covariance = fetch_moments(list(portfolio.keys()), start_date, end_date, 'Adj Close')
     weights = np.array(list(portfolio.values()))
-    weighted_returns = returns.dot(weights)
-    portfolio_var = np.var(weighted_returns)
+    portfolio_var = weights @ covariance.to_numpy() @ weights
     return portfolio_var
 
 def calculate_var(portfolio, start_date, end_date):
@@ -18,9 +20,8 @@ def calculate_var(portfolio, start_date, end_date):
     return var
 
 def calculate_stock_var(ticker, start_date, end_date):
-    data = yf.download(ticker, start=start_date, end=end_date)['Adj Close']
-    returns = data.pct_change().dropna()
-    stock_var = np.var(returns)
+    _, covariance = fetch_moments([ticker], start_date, end_date, 'Adj Close')
+    stock_var = covariance.iloc[0, 0]
     var = np.sqrt(stock_var) * -1.96
     return var
 
@@ -31,16 +32,13 @@ if __name__ == "__main__":
     start_date = "2022-01-01"
     end_date = "2023-01-01"
 
-    confidence_level = 0.95
-    printable_confidence = str(100 * confidence_level) + "%"
+    confidence_levels = [0.95, 0.99]
 
-    var = calculate_var(portfolio, start_date, end_date)
+    # One aligned returns matrix for every stock, then every measure from one call
+    returns = load_returns(stocks + list(portfolio.keys()), start_date, end_date)
+    report = risk_report(returns, {"Portfolio": portfolio}, confidence_levels)
+    report = report.loc[["Portfolio"] + stocks]
 
-    table_data = [["Portfolio", f"{var:.2%}"]]
-    
-    for stock in stocks:
-        stock_var = calculate_stock_var(stock, start_date, end_date)
-        table_data.append([stock, f"{stock_var:.2%}"])
-
-    headers = ["Asset", f"Value at Risk ({printable_confidence})"]
-    print(tabulate(table_data, headers=headers, tablefmt="pretty"))
\ No newline at end of file
+    table_data = [[asset] + [f"{value:.2%}" for value in row] for asset, row in zip(report.index, report.to_numpy())]
+    headers = ["Asset"] + [f"{method} {measure} ({100 * level}%)" for method, measure, level in report.columns]
+    print(tabulate(table_data, headers=headers, tablefmt="pretty"))
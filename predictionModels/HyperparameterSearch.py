@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import DEFAULT_STORE_DIR, fetch_prices
+from predictionModels.SequenceWindows import sliding_windows
+
+# Trial results live next to the price cache, override with TUNING_STORE_DIR
+DEFAULT_TUNING_DIR = os.environ.get(
+    "TUNING_STORE_DIR",
+    os.path.join(os.path.dirname(DEFAULT_STORE_DIR), "tuning")
+)
+
+# Lists are choices, ('log', low, high) is log-uniform
+SEARCH_SPACE = {
+    'window_size': [10, 20, 40, 60],
+    'units': [16, 32, 64, 128],
+    'layers': [1, 2, 3],
+    'learning_rate': ('log', 1e-4, 1e-2),
+    'batch_size': [32, 64, 128],
+}
+
+
+def sample_configurations(space, n, seed=0):
+    """
+    Draw n configurations from a search space, the same ones for the same seed.
+    """
+    rng = np.random.default_rng(seed)
+    configurations = []
+    for _ in range(n):
+        params = {}
+        for key, choices in space.items():
+            if isinstance(choices, tuple) and choices[0] == 'log':
+                params[key] = float(np.exp(rng.uniform(np.log(choices[1]), np.log(choices[2]))))
+            else:
+                params[key] = choices[rng.integers(len(choices))]
+                params[key] = params[key].item() if isinstance(params[key], np.generic) else params[key]
+        configurations.append(params)
+    return configurations
+
+
+def trial_id(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class TrialStore:
+    """
+    One JSON file per trial of a study: its parameters, status and validation loss per
+    epoch. Files are rewritten atomically after every epoch, so running trials in other
+    processes can read each other's progress and an interrupted study can resume.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, trial):
+        return os.path.join(self.root, trial + ".json")
+
+    def load(self, trial):
+        path = self._path(trial)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def save(self, record):
+        path = self._path(record['trial'])
+        with open(path + ".tmp", "w") as f:
+            json.dump(record, f)
+        os.replace(path + ".tmp", path)
+
+    def records(self):
+        records = []
+        for name in os.listdir(self.root):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.root, name)) as f:
+                        records.append(json.load(f))
+                except (OSError, ValueError):
+                    # Another process is replacing it
+                    continue
+        return records
+
+
+class MedianPruner:
+    """
+    Stop a trial whose best validation loss so far is worse than the median of the other
+    trials' best losses at the same epoch.
+
+    Args:
+    warmup_epochs (int): Epochs every trial runs before it can be pruned.
+    min_trials (int): Other trials that must have reached the epoch before pruning.
+    """
+
+    def __init__(self, warmup_epochs=3, min_trials=4):
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+
+    def should_prune(self, curve, others):
+        epoch = len(curve)
+        if epoch <= self.warmup_epochs:
+            return False
+        reached = [min(other[:epoch]) for other in others if len(other) >= epoch]
+        if len(reached) < self.min_trials:
+            return False
+        return min(curve) > np.median(reached)
+
+
+class Trial:
+    """
+    A running trial, handed to the objective to report its validation loss each epoch.
+    """
+
+    def __init__(self, store, params, pruner):
+        self.store = store
+        self.pruner = pruner
+        self.record = {'trial': trial_id(params), 'params': params, 'status': 'running', 'curve': []}
+        self.store.save(self.record)
+
+    def report(self, value):
+        """
+        Record an epoch's validation loss; True means the trial should stop now.
+        """
+        self.record['curve'].append(float(value))
+        others = [record['curve'] for record in self.store.records() if record['trial'] != self.record['trial']]
+        prune = self.pruner.should_prune(self.record['curve'], others)
+        if prune:
+            self.record['status'] = 'pruned'
+        self.store.save(self.record)
+        return prune
+
+    def finish(self, status='complete', **extra):
+        if self.record['status'] == 'running':
+            self.record['status'] = status
+        self.record.update(extra)
+        self.store.save(self.record)
+
+
+def build_sequence_model(params, input_shape, cell='lstm'):
+    """
+    Stacked LSTM or SimpleRNN regressor of the searched shape.
+
+    Args:
+    params (dict): 'units', 'layers' and 'learning_rate'.
+    input_shape (tuple): (window_size, features).
+    cell (str): 'lstm' or 'rnn'.
+    """
+    import tensorflow as tf
+
+    Layer = tf.keras.layers.LSTM if cell == 'lstm' else tf.keras.layers.SimpleRNN
+    model = tf.keras.Sequential([tf.keras.Input(shape=input_shape)])
+    for layer in range(params['layers']):
+        model.add(Layer(params['units'], return_sequences=layer < params['layers'] - 1))
+    model.add(tf.keras.layers.Dense(1))
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=params['learning_rate']), loss='mse')
+    return model
+
+
+def keras_objective(params, values, max_epochs, trial, cell='lstm', validation=0.2):
+    """
+    Train a sequence model on closes and return its best validation loss.
+
+    The last `validation` share of the windows is held out, and the scaler is fitted on
+    the training closes only.
+    """
+    import tensorflow as tf
+
+    window_size = params['window_size']
+    split = int((1 - validation) * (len(values) - window_size))
+    low, high = values[:split + window_size].min(), values[:split + window_size].max()
+    scaled = ((values - low) / (high - low or 1.0)).astype(np.float32)
+    X, y = sliding_windows(scaled, window_size)
+
+    class Report(tf.keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            if trial.report(logs['val_loss']):
+                self.model.stop_training = True
+
+    model = build_sequence_model(params, (window_size, 1), cell)
+    history = model.fit(X[:split], y[:split], validation_data=(X[split:], y[split:]), epochs=max_epochs,
+                        batch_size=params['batch_size'], verbose=0,
+                        callbacks=[Report(), tf.keras.callbacks.EarlyStopping(patience=5)])
+    return min(history.history['val_loss'])
+
+
+def _init_worker(threads):
+    if threads:
+        try:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except ImportError:
+            pass
+
+
+def _run_trial(job):
+    root, params, values, max_epochs, pruner, objective, options = job
+    trial = Trial(TrialStore(root), params, pruner)
+    try:
+        loss = objective(params, values, max_epochs, trial, **options)
+    except Exception as e:
+        trial.finish('failed', error=f"{type(e).__name__}: {e}")
+        return trial.record
+    trial.finish('complete', loss=float(loss))
+    return trial.record
+
+
+def search(values, study, space=SEARCH_SPACE, n_trials=32, max_epochs=50, workers=None, seed=0,
+           pruner=None, objective=keras_objective, root=None, **options):
+    """
+    Random search over a space, trials running in parallel processes and pruned early.
+
+    Every trial reports its validation loss after each epoch and is stopped as soon as it
+    falls behind the median of the trials before it (MedianPruner), so most bad
+    configurations cost a few epochs rather than max_epochs. Trials are saved as they
+    run; calling search again with the same study and seed skips the trials that already
+    finished or were pruned and reruns those that were interrupted.
+
+    Args:
+    values (numpy.ndarray): Series the models are fitted on, e.g. closes, oldest first.
+    study (str): Name of the study, e.g. 'lstm-AAPL'.
+    space (dict): Search space, as SEARCH_SPACE.
+    n_trials (int): Configurations tried.
+    max_epochs (int): Epochs of a trial that is never pruned.
+    workers (int, optional): Trial processes, None for one per CPU.
+    seed (int): Seed of the configurations.
+    pruner (MedianPruner, optional): Pruning rule, MedianPruner() by default.
+    objective (callable): objective(params, values, max_epochs, trial, **options) -> loss.
+    root (str, optional): Directory of the studies, defaults to DEFAULT_TUNING_DIR.
+    **options: Passed on to the objective, e.g. cell='rnn'.
+
+    Returns:
+    pandas.DataFrame: One row per trial, best loss first, with its parameters, status,
+    loss and epochs run.
+    """
+    root = os.path.join(root or DEFAULT_TUNING_DIR, study)
+    store = TrialStore(root)
+    pruner = pruner or MedianPruner()
+    values = np.asarray(values, dtype=np.float64)
+    done = {record['trial'] for record in store.records() if record['status'] in ('complete', 'pruned')}
+    jobs = [(root, params, values, max_epochs, pruner, objective, options)
+            for params in sample_configurations(space, n_trials, seed) if trial_id(params) not in done]
+    workers = min(workers or os.cpu_count(), max(1, len(jobs)))
+    if workers == 1:
+        list(map(_run_trial, jobs))
+    elif jobs:
+        # Spawned workers share the cores, one TensorFlow thread pool each
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(max(1, os.cpu_count() // workers),)) as pool:
+            list(pool.map(_run_trial, jobs))
+    return results(store)
+
+
+def trial_loss(record):
+    return record.get('loss', min(record['curve']) if record['curve'] else np.nan)
+
+
+def results(store):
+    rows = []
+    for record in store.records():
+        rows.append(dict(record['params'], trial=record['trial'], status=record['status'],
+                         loss=trial_loss(record), epochs=len(record['curve'])))
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values('loss').reset_index(drop=True)
+
+
+def best_params(study, root=None):
+    """
+    Parameters of the best completed trial of a study, None if none completed.
+    """
+    # Records keep the parameters as sampled, whatever search space the study used
+    completed = [record for record in TrialStore(os.path.join(root or DEFAULT_TUNING_DIR, study)).records()
+                 if record['status'] == 'complete' and not np.isnan(trial_loss(record))]
+    if not completed:
+        return None
+    return min(completed, key=trial_loss)['params']
+
+
+if __name__ == "__main__":
+    # Tune the LSTM of StockML on one ticker's closes
+    ticker = sys.argv[1] if len(sys.argv) > 1 else 'AAPL'
+    closes = fetch_prices(ticker, '2015-01-01', '2024-01-01')['Close'].to_numpy(dtype=np.float64)
+    table = search(closes, f"lstm-{ticker.upper()}", n_trials=32, max_epochs=50)
+    print(table.head(10).to_string(index=False))
+    print(table['status'].value_counts())
@@ -0,0 +1,358 @@
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import threading
+import socketserver
+from concurrent.futures import Future
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from predictionModels.ModelRegistry import default_model_registry
+from predictionModels.ModelExport import export_registry_model
+
+DEFAULT_PORT = 8765
+
+
+def _predictor(model):
+    # predict_on_batch skips the per-call data pipeline that makes Keras predict slow on small inputs
+    return getattr(model, 'predict_on_batch', None) or model.predict
+
+
+class _Served:
+    def __init__(self, model, scaler, version):
+        self.model = model
+        self.predict = _predictor(model)
+        self.scaler = scaler
+        self.version = version
+        self.requests = queue.Queue()
+
+
+class InferenceService:
+    """
+    Keeps fitted models loaded and answers prediction requests in micro-batches.
+
+    Requests for a model are queued and served by that model's own thread. When a request
+    arrives the thread waits at most `max_delay` seconds for more, then runs everything
+    queued, up to `max_batch` samples, through the model in one call and hands each
+    request its slice of the output. Under load many concurrent requests thus share one
+    model call, while a lone request waits no longer than the latency budget.
+
+    A model registered with a scaler takes and returns unscaled values: inputs are scaled
+    and outputs inverse-scaled for the whole batch at once.
+
+    A request may name the version of the model it expects, e.g. the registry file it
+    was saved as. When the served version differs, the model is reloaded through
+    `loader`, or the request fails without one.
+
+    Args:
+    max_batch (int): Most samples per model call.
+    max_delay (float): Seconds a request may wait for others to join its batch.
+    loader (callable, optional): loader(name, version) -> (model, scaler), loading a
+        model that is not served yet or not in the requested version.
+    """
+
+    def __init__(self, max_batch=512, max_delay=0.002, loader=None):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.loader = loader
+        self._served = {}
+        self._threads = []
+        # Swaps of a served model and enqueues happen under _lock, so no request lands
+        # on a queue whose thread has stopped; loads run under _load_lock only
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def register(self, name, model, scaler=None, version=None):
+        """
+        Serve a model under a name, e.g. 'lstm/AAPL', replacing any model served under it.
+
+        Args:
+        name (str): Name requests refer to.
+        model: Fitted Keras or sklearn model.
+        scaler (sklearn.preprocessing.MinMaxScaler, optional): Scaler the model's inputs
+            and outputs were fitted with.
+        version (str, optional): Version of the model, checked against requests naming one.
+        """
+        served = _Served(model, scaler, version)
+        thread = threading.Thread(target=self._serve, args=(served,), name=f"inference-{name}", daemon=True)
+        thread.start()
+        with self._lock:
+            previous = self._served.get(name)
+            self._served[name] = served
+            if previous is not None:
+                # The old thread answers what was queued before the swap, then stops
+                previous.requests.put(None)
+            self._threads.append(thread)
+
+    @property
+    def models(self):
+        return list(self._served)
+
+    def version(self, name):
+        """
+        Version of the model served under a name, None if unversioned or not served.
+        """
+        served = self._served.get(name)
+        return None if served is None else served.version
+
+    def _load(self, name, version):
+        with self._load_lock:
+            served = self._served.get(name)
+            if served is not None and (version is None or served.version == version):
+                return
+            if self.loader is None:
+                if served is None:
+                    raise KeyError(f"No model registered as {name!r}")
+                raise KeyError(f"{name!r} is served at version {served.version!r}, not {version!r}")
+            model, scaler = self.loader(name, version)
+            self.register(name, model, scaler, version)
+
+    def submit(self, name, inputs, version=None):
+        """
+        Queue a request and return a Future of its predictions.
+
+        Args:
+        name (str): Registered model name.
+        inputs (numpy.ndarray): (samples, ...) model inputs.
+        version (str, optional): Model version the request expects.
+
+        Returns:
+        concurrent.futures.Future: Resolves to a (samples, ...) numpy.ndarray.
+        """
+        request = (np.asarray(inputs, dtype=np.float32), Future())
+        while True:
+            with self._lock:
+                served = self._served.get(name)
+                if served is not None and (version is None or served.version == version):
+                    served.requests.put(request)
+                    return request[1]
+            self._load(name, version)
+
+    def predict(self, name, inputs, timeout=None, version=None):
+        return self.submit(name, inputs, version).result(timeout)
+
+    def close(self):
+        with self._lock:
+            for served in self._served.values():
+                served.requests.put(None)
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
+
+    def _serve(self, served):
+        while True:
+            request = served.requests.get()
+            if request is None:
+                return
+            batch, samples = [request], len(request[0])
+            deadline = time.perf_counter() + self.max_delay
+            closing = False
+            while samples < self.max_batch:
+                try:
+                    request = served.requests.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                    break
+                batch.append(request)
+                samples += len(request[0])
+            # Requests of different input shapes cannot share a call, nor fail each other
+            groups = {}
+            for request in batch:
+                groups.setdefault(request[0].shape[1:], []).append(request)
+            for group in groups.values():
+                self._run(served, group)
+            if closing:
+                return
+
+    def _run(self, served, batch):
+        try:
+            inputs = np.concatenate([inputs for inputs, _ in batch])
+            if served.scaler is not None:
+                features = served.scaler.n_features_in_
+                inputs = served.scaler.transform(inputs.reshape(-1, features)).reshape(inputs.shape)
+            outputs = np.asarray(served.predict(inputs))
+            if served.scaler is not None:
+                outputs = served.scaler.inverse_transform(outputs.reshape(-1, features)).reshape(outputs.shape)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        start = 0
+        for inputs, future in batch:
+            future.set_result(outputs[start:start + len(inputs)])
+            start += len(inputs)
+
+
+def from_registry(registry=None, names=None, precision=None, **options):
+    """
+    An InferenceService serving the models saved in a ModelRegistry.
+
+    Every entry is served as '<name>/<TICKER>' with its scaler; where several entries share
+    a name and ticker (different hyperparameters), the most recently saved one is served.
+    With a precision, Keras models are served from frozen TFLite exports instead, which
+    are made and parity-checked on first use.
+
+    Args:
+    registry (ModelRegistry, optional): Defaults to the shared registry.
+    names (list, optional): Model names to serve, all when None.
+    precision (str, optional): 'float32', 'float16', 'dynamic' or 'int8' to serve Keras
+        models through TFLite, None to serve them through Keras.
+    **options: max_batch and max_delay of the service.
+
+    Returns:
+    InferenceService: The running service.
+    """
+    registry = registry or default_model_registry()
+
+    def load(meta):
+        if precision is not None and meta['format'] == 'keras':
+            return export_registry_model(meta, None if precision == 'float32' else precision, registry)
+        return registry.load_entry(meta)[1:]
+
+    def loader(key, version):
+        # A request for a model saved after the service started, e.g. after a retraining
+        for meta in reversed(registry.entries()):
+            if f"{meta['name']}/{meta['ticker'].upper()}" == key and version in (None, meta['model_file']):
+                return load(meta)
+        raise KeyError(f"No registry entry {key!r}" + (f" saved as {version!r}" if version else ""))
+
+    latest = {}
+    for meta in registry.entries():
+        if names is None or meta['name'] in names:
+            latest[f"{meta['name']}/{meta['ticker'].upper()}"] = meta
+    service = InferenceService(loader=loader, **options)
+    for key, meta in latest.items():
+        service.register(key, *load(meta), version=meta['model_file'])
+    return service
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # One JSON request per line: {"model": name, "inputs": nested list}, answered with one
+    # line {"predictions": nested list} or {"error": message}
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                predictions = self.server.service.predict(request['model'], request['inputs'],
+                                                          version=request.get('version'))
+                response = {'predictions': predictions.tolist()}
+            except Exception as e:
+                response = {'error': f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(service, host='127.0.0.1', port=DEFAULT_PORT):
+    """
+    Answer requests for a service's models over a local TCP socket until interrupted.
+
+    Every connection is handled on its own thread, so requests from concurrent clients
+    are batched together.
+    """
+    with _Server((host, port), _Handler) as server:
+        server.service = service
+        server.serve_forever()
+
+
+class InferenceClient:
+    """
+    Client of serve(), keeping one connection open across requests.
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, timeout=None):
+        self.address = (host, port)
+        self._socket = socket.create_connection(self.address, timeout)
+        self._socket.settimeout(None)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._socket.makefile('rb')
+
+    def predict(self, name, inputs, version=None):
+        request = {'model': name, 'inputs': np.asarray(inputs).tolist()}
+        if version is not None:
+            request['version'] = version
+        self._socket.sendall(json.dumps(request).encode() + b"\n")
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError(f"Inference service at {self.address[0]}:{self.address[1]} closed the connection")
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return np.array(response['predictions'])
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+_local_service = None
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _client(host, port):
+    # One connection per process to a running service, None when nothing is listening;
+    # the attempt is not repeated, so callers without a service pay one refused connect
+    with _clients_lock:
+        if (host, port) not in _clients:
+            try:
+                _clients[(host, port)] = InferenceClient(host, port, timeout=0.1)
+            except OSError:
+                _clients[(host, port)] = None
+        return _clients[(host, port)]
+
+
+def forecast(name, inputs, model, scaler=None, version=None, host='127.0.0.1', port=DEFAULT_PORT):
+    """
+    Predictions of a model, from the running inference service when there is one.
+
+    The request goes to serve() on host:port when it is listening, where it is batched
+    with every other client's and answered by the already loaded model, reloaded by the
+    service if it holds an older version. Without a service, or when it cannot serve
+    the model, the given model answers through a shared in-process InferenceService, so
+    callers work the same either way.
+
+    Args:
+    name (str): Served name of the model, '<name>/<TICKER>' for registry models.
+    inputs (numpy.ndarray): (samples, ...) unscaled model inputs.
+    model: The fitted model, used in-process when the service cannot answer.
+    scaler (sklearn.preprocessing.MinMaxScaler, optional): Scaler of the model.
+    version (str, optional): Registry model file of the model, so a service holding an
+        older version does not answer.
+
+    Returns:
+    numpy.ndarray: (samples, ...) unscaled predictions.
+    """
+    global _local_service
+    client = _client(host, port)
+    if client is not None:
+        try:
+            return client.predict(name, inputs, version)
+        except RuntimeError:
+            # The service does not have this model
+            pass
+        except OSError:
+            with _clients_lock:
+                _clients.pop((host, port), None)
+    with _clients_lock:
+        if _local_service is None:
+            _local_service = InferenceService()
+        served = _local_service._served.get(name)
+        if served is None or served.model is not model or served.version != version:
+            _local_service.register(name, model, scaler, version)
+        service = _local_service
+    return service.predict(name, inputs, version=version)
+
+
+if __name__ == "__main__":
+    # Serve every model in the registry until interrupted, through TFLite when a precision is given
+    service = from_registry(precision=sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"Serving {len(service.models)} models on 127.0.0.1:{DEFAULT_PORT}: {', '.join(service.models)}")
+    serve(service)
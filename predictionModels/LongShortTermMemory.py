@@ -1,10 +1,16 @@
-import yfinance as yf
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
 from tensorflow import keras
 from keras.models import Sequential
 from keras.layers import LSTM, Dense
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices
+from predictionModels.InferenceService import forecast
+from predictionModels.ModelRegistry import default_model_registry
+from predictionModels.SequenceWindows import WindowedSeries
 
 # Define portfolio
 portfolio = {"ENB": 0.15, "QQQ": 0.15, "SPY": 0.05, "NVDA": 0.1, "MSFT": 0.07, "GOOG": 0.05, "VZ": 0.07, "T": 0.05, "AMZN": 0.07, "C": 0.03, "RY": 0.05, "BNS": 0.03, "BAC": 0.03, "MA": 0.05, "UBER": 0.05}
@@ -15,7 +21,7 @@ end_date = "2023-01-01"
 
 stock_data = {}
 for ticker, weight in portfolio.items():
-    data = yf.download(ticker, start=start_date, end=end_date)
+    data = fetch_prices(ticker, start_date, end_date)
     stock_data[ticker] = {'data': data, 'weight': weight}
 
 # Calculate daily returns for each stock in the portfolio
@@ -27,34 +33,46 @@ for ticker, stock_info in stock_data.items():
 # Drop NaN values
 returns = returns.dropna()
 
-# LSTM input preparation
-scaler = MinMaxScaler()
-scaled_data = scaler.fit_transform(returns.values)
+def train(values):
+    # LSTM input preparation
+    scaler = MinMaxScaler()
+    scaled_data = scaler.fit_transform(values)
 
-# Prepare input data
-X, y = [], []
-for i in range(60, len(scaled_data)):
-    X.append(scaled_data[i-60:i, :])
-    y.append(scaled_data[i, :])
+    # Prepare input data: 60-day windows of every ticker, streamed in shuffled batches
+    windows = WindowedSeries([scaled_data.astype(np.float32)], 60)
+    X, y = windows.arrays()
 
-X, y = np.array(X), np.array(y)
+    # Build LSTM model
+    model = Sequential()
+    model.add(LSTM(units=50, return_sequences=True, input_shape=(X.shape[1], X.shape[2])))
+    model.add(LSTM(units=50, return_sequences=False))
+    model.add(Dense(units=len(portfolio)))
 
-# Build LSTM model
-model = Sequential()
-model.add(LSTM(units=50, return_sequences=True, input_shape=(X.shape[1], X.shape[2])))
-model.add(LSTM(units=50, return_sequences=False))
-model.add(Dense(units=len(portfolio)))
+    model.compile(optimizer='adam', loss='mean_squared_error')
 
-model.compile(optimizer='adam', loss='mean_squared_error')
+    # Train the model
+    model.fit(windows.dataset(batch_size=32, shuffle=True), epochs=10)
+    return model, scaler
 
-# Train the model
-model.fit(X, y, epochs=10, batch_size=32)
+def update(model, scaler, values, held):
+    # Fine-tune on the windows whose targets are new days, keeping the scaler
+    windows = WindowedSeries([scaler.transform(values[held - 60:]).astype(np.float32)], 60)
+    model.fit(windows.dataset(batch_size=32, shuffle=True), epochs=2)
+    return model
 
-# Make predictions
-inputs = scaled_data[-60:, :]
+# Reuse the model saved for these returns and settings, training only when they changed
+hyperparameters = {'portfolio': portfolio, 'lookback': 60, 'epochs': 10, 'batch_size': 32}
+registry = default_model_registry()
+model, scaler, status = registry.fit('lstm-returns', 'portfolio', returns.values, hyperparameters,
+                                     train, update, start_date, end_date)
+print(f"LSTM model: {status}")
+version = registry.entry('lstm-returns', 'portfolio', start_date, hyperparameters)['model_file']
+
+# Make predictions from the last 60 days of unscaled returns, through the inference service
+# when one is running; the model's scaler is applied where the model runs
+inputs = returns.values[-60:, :]
 inputs = np.reshape(inputs, (1, inputs.shape[0], inputs.shape[1]))
-predicted_returns = model.predict(inputs)
-predicted_returns = scaler.inverse_transform(predicted_returns)
+predicted_returns = forecast('lstm-returns/PORTFOLIO', inputs, model, scaler, version)
 
 # Display predicted returns
 predicted_returns_df = pd.DataFrame(predicted_returns, columns=returns.columns)
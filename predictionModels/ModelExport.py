@@ -0,0 +1,241 @@
+import os
+import sys
+import time
+import threading
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from predictionModels.ModelRegistry import default_model_registry
+
+QUANTIZATIONS = [None, 'float16', 'dynamic', 'int8']
+
+
+def _interpreter_class():
+    # The standalone tflite_runtime package is a few MB against TensorFlow's hundreds, use it when present
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def export_tflite(model, path, quantization=None, representative_data=None):
+    """
+    Freeze a Keras model into a TFLite flatbuffer for CPU inference.
+
+    The model is traced once with a free batch dimension, so the recurrent layers are
+    converted to TFLite's fused sequence ops. Ops TFLite lacks fall back to TensorFlow
+    kernels, which the full TensorFlow interpreter runs.
+
+    Args:
+    model (tensorflow.keras.Model): Fitted model.
+    path (str): Output .tflite file.
+    quantization (str, optional): None for float32, 'float16' weights, 'dynamic' int8
+        weights with float activations, or 'int8' weights and activations calibrated on
+        representative_data.
+    representative_data (numpy.ndarray, optional): Model inputs used to calibrate 'int8',
+        typically a few hundred training windows.
+
+    Returns:
+    str: The path written.
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+    if quantization == 'int8' and representative_data is None:
+        raise ValueError("int8 quantization needs representative_data to calibrate activations")
+    import tensorflow as tf
+
+    run = tf.function(lambda x: model(x, training=False))
+    concrete = run.get_concrete_function(tf.TensorSpec([None] + list(model.input_shape[1:]), tf.float32))
+
+    def convert(select_ops):
+        converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], model)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS]
+        if select_ops:
+            converter.target_spec.supported_ops.append(tf.lite.OpsSet.SELECT_TF_OPS)
+        if quantization is not None:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == 'float16':
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == 'int8':
+            samples = np.asarray(representative_data, dtype=np.float32)[:200]
+            converter.representative_dataset = lambda: ([sample[None]] for sample in samples)
+        return converter.convert()
+
+    try:
+        flatbuffer = convert(select_ops=False)
+    except Exception:
+        flatbuffer = convert(select_ops=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(flatbuffer)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+class TFLiteModel:
+    """
+    Loader of an exported model, with the predict interface of the Keras model.
+
+    The interpreter is resized only when the batch size changes, so repeated calls with
+    one batch size run straight through. Calls are serialized, as an interpreter is not
+    thread-safe.
+
+    Args:
+    path (str): .tflite file written by export_tflite.
+    threads (int, optional): CPU threads of the interpreter, None for its default.
+    """
+
+    def __init__(self, path, threads=None):
+        self.path = path
+        self.interpreter = _interpreter_class()(model_path=path, num_threads=threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]['index']
+        self._output = self.interpreter.get_output_details()[0]['index']
+        self._batch = None
+        self._lock = threading.Lock()
+
+    def predict(self, X, **kwargs):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        with self._lock:
+            if self._batch != len(X):
+                self.interpreter.resize_tensor_input(self._input, X.shape)
+                self.interpreter.allocate_tensors()
+                self._batch = len(X)
+            self.interpreter.set_tensor(self._input, X)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output).copy()
+
+    predict_on_batch = predict
+
+
+def parity_check(model, exported, X, tolerance=1e-2):
+    """
+    Compare an exported model's outputs with the original's on the same inputs.
+
+    Args:
+    model (tensorflow.keras.Model): Original model.
+    exported (TFLiteModel): Exported model.
+    X (numpy.ndarray): Inputs to compare on.
+    tolerance (float): Largest absolute difference allowed, in the models' output units
+        (scaled prices for the forecast models, which live in [0, 1]).
+
+    Returns:
+    dict: 'Max Error', 'Mean Error' and whether the export 'Passed'.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    error = np.abs(np.asarray(exported.predict(X)) - np.asarray(model.predict_on_batch(X)))
+    return {'Max Error': float(error.max()), 'Mean Error': float(error.mean()),
+            'Passed': bool(error.max() <= tolerance)}
+
+
+def _latency(predict, X, repeats):
+    predict(X)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict(X)
+    return (time.perf_counter() - start) / repeats * 1e3
+
+
+def compare_latency(model, exported, X, batch_sizes=(1, 32, 256), repeats=50):
+    """
+    Milliseconds per call of Keras predict, Keras predict_on_batch and the exported
+    models, per batch size.
+
+    Args:
+    model (tensorflow.keras.Model): Original model.
+    exported (dict): {label: TFLiteModel}.
+    X (numpy.ndarray): Inputs, batches are taken from the front.
+    batch_sizes (tuple): Batch sizes to time.
+    repeats (int): Timed calls per measurement.
+
+    Returns:
+    pandas.DataFrame: Batch sizes x predictors.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    predictors = {'Keras predict': lambda batch: model.predict(batch, verbose=0),
+                  'Keras predict_on_batch': model.predict_on_batch}
+    predictors.update({label: loaded.predict for label, loaded in exported.items()})
+    rows = {}
+    for size in batch_sizes:
+        batch = X[:size]
+        rows[len(batch)] = {label: _latency(predict, batch, repeats) for label, predict in predictors.items()}
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('Batch Size')
+
+
+def export_checked(model, path, quantization=None, X=None, tolerance=1e-2, threads=None):
+    """
+    export_tflite, then load the artifact and check it against the model.
+
+    Without X, inputs are drawn uniformly from [0, 1], the range of min-max scaled windows.
+    X also calibrates 'int8'.
+
+    Returns:
+    tuple: (TFLiteModel, parity report).
+
+    Raises:
+    ValueError: If the exported outputs differ from the model's by more than tolerance;
+        the artifact is removed.
+    """
+    if X is None:
+        X = np.random.default_rng(0).random((256,) + tuple(model.input_shape[1:]), dtype=np.float32)
+    export_tflite(model, path, quantization, representative_data=X)
+    exported = TFLiteModel(path, threads)
+    report = parity_check(model, exported, X, tolerance)
+    if not report['Passed']:
+        os.remove(path)
+        raise ValueError(f"{os.path.basename(path)} differs from its model by up to {report['Max Error']:.2e}, "
+                         f"above the tolerance of {tolerance:.0e}")
+    return exported, report
+
+
+def export_registry_model(meta, quantization=None, registry=None, tolerance=1e-2, threads=None):
+    """
+    Exported copy of a Keras model saved in a ModelRegistry, exporting it on first use.
+
+    The artifact is saved next to the model file and named after it, so it is exported
+    again exactly when the registry saves a newer model. Once it exists only the scaler
+    is read, so serving needs neither the Keras model nor TensorFlow when tflite_runtime
+    is installed.
+
+    Args:
+    meta (dict): Registry entry, as from ModelRegistry.entries.
+    quantization (str, optional): As for export_tflite.
+    registry (ModelRegistry, optional): Defaults to the shared registry.
+    tolerance (float): Parity tolerance of a new export.
+    threads (int, optional): CPU threads of the interpreter.
+
+    Returns:
+    tuple: (TFLiteModel, scaler) of the entry.
+    """
+    registry = registry or default_model_registry()
+    scaler = registry.load_scaler(meta)
+    path = os.path.join(registry.root, f"{os.path.splitext(meta['model_file'])[0]}.{quantization or 'float32'}.tflite")
+    if os.path.exists(path):
+        return TFLiteModel(path, threads), scaler
+    _, model, _ = registry.load_entry(meta)
+    return export_checked(model, path, quantization, tolerance=tolerance, threads=threads)[0], scaler
+
+
+if __name__ == "__main__":
+    # Export every Keras model in the registry in every precision and compare with Keras
+    registry = default_model_registry()
+    for meta in registry.entries():
+        if meta['format'] != 'keras':
+            continue
+        _, model, scaler = registry.load_entry(meta)
+        X = np.random.default_rng(0).random((256,) + tuple(model.input_shape[1:]), dtype=np.float32)
+        stem = os.path.join(registry.root, os.path.splitext(meta['model_file'])[0])
+        exported, reports = {}, {}
+        for quantization in QUANTIZATIONS:
+            label = f"TFLite {quantization or 'float32'}"
+            try:
+                # Quantized activations cost more accuracy than quantized weights alone
+                tolerance = 5e-2 if quantization == 'int8' else 1e-2
+                exported[label], reports[label] = export_checked(model, f"{stem}.{quantization or 'float32'}.tflite",
+                                                                 quantization, X, tolerance)
+            except ValueError as e:
+                print(e)
+        print(f"\n{meta['name']}/{meta['ticker'].upper()}")
+        print(pd.DataFrame(reports).T)
+        print(compare_latency(model, exported, X).round(3))
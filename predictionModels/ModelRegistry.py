@@ -0,0 +1,198 @@
+import os
+import json
+import hashlib
+import threading
+import joblib
+import numpy as np
+from dataModels.PriceStore import DEFAULT_STORE_DIR
+
+# Fitted models live next to the price cache, override with MODEL_STORE_DIR
+DEFAULT_MODEL_DIR = os.environ.get(
+    "MODEL_STORE_DIR",
+    os.path.join(os.path.dirname(DEFAULT_STORE_DIR), "models")
+)
+
+
+def data_fingerprint(values):
+    """
+    Short hash of an array's values, identifying the exact data a model was fitted on.
+    """
+    return hashlib.sha1(np.ascontiguousarray(values, dtype=np.float64).tobytes()).hexdigest()[:16]
+
+
+def _is_keras(model):
+    return hasattr(model, 'save') and hasattr(model, 'compile')
+
+
+class ModelRegistry:
+    """
+    Fitted models and their scalers on disk, reused while data and hyperparameters hold.
+
+    An entry is identified by a model name, a ticker (or universe name), the start date
+    of its data and its hyperparameters, and records a fingerprint of the data it was
+    fitted on. fit() then returns the saved model untouched when the data is the same,
+    fine-tunes it on the new observations when the data only grew at the end, and
+    trains from scratch when the history was revised or `retrain_after` observations
+    were added since the last full training. Keras models are saved in the .keras
+    format, everything else (sklearn models, scalers) with joblib.
+
+    Args:
+    root (str, optional): Directory of the saved models, defaults to DEFAULT_MODEL_DIR.
+    retrain_after (int): Observations added by fine-tuning after which a model is
+        trained from scratch again.
+    """
+
+    def __init__(self, root=None, retrain_after=252):
+        self.root = root or DEFAULT_MODEL_DIR
+        self.retrain_after = retrain_after
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _stem(self, name, ticker, start_date, hyperparameters):
+        key = json.dumps([name, ticker.upper(), str(start_date), hyperparameters], sort_keys=True, default=str)
+        return os.path.join(self.root, f"{name}-{ticker.upper().replace('/', '_')}-"
+                                       f"{hashlib.sha1(key.encode()).hexdigest()[:12]}")
+
+    def entry(self, name, ticker, start_date, hyperparameters):
+        """
+        Return the saved metadata of an entry without loading its model, None if absent.
+        """
+        stem = self._stem(name, ticker, start_date, hyperparameters)
+        if not os.path.exists(stem + ".json"):
+            return None
+        with open(stem + ".json") as f:
+            return json.load(f)
+
+    def load(self, name, ticker, start_date, hyperparameters):
+        """
+        Return the saved (metadata, model, scaler) of an entry, None if absent.
+        """
+        meta = self.entry(name, ticker, start_date, hyperparameters)
+        return None if meta is None else self.load_entry(meta)
+
+    def entries(self, name=None):
+        """
+        Metadata of every saved entry, optionally of one model name, oldest save first.
+        """
+        paths = [os.path.join(self.root, f) for f in os.listdir(self.root) if f.endswith(".json")]
+        entries = []
+        for path in sorted(paths, key=os.path.getmtime):
+            with open(path) as f:
+                meta = json.load(f)
+            if name is None or meta['name'] == name:
+                entries.append(meta)
+        return entries
+
+    def load_entry(self, meta):
+        """
+        Return the (metadata, model, scaler) of an entry from its metadata.
+        """
+        if meta['format'] == 'keras':
+            import tensorflow as tf
+            model = tf.keras.models.load_model(os.path.join(self.root, meta['model_file']))
+        else:
+            model = joblib.load(os.path.join(self.root, meta['model_file']))
+        return meta, model, self.load_scaler(meta)
+
+    def load_scaler(self, meta):
+        """
+        Return the scaler of an entry from its metadata, None if it has none, without
+        loading the model.
+        """
+        return joblib.load(os.path.join(self.root, meta['scaler_file'])) if meta['scaler_file'] else None
+
+    def save(self, name, ticker, start_date, hyperparameters, model, scaler, meta):
+        """
+        Save a model and its scaler, replacing the entry's previous files.
+        """
+        stem = self._stem(name, ticker, start_date, hyperparameters)
+        version = meta['fingerprint']
+        previous = None
+        if os.path.exists(stem + ".json"):
+            with open(stem + ".json") as f:
+                previous = json.load(f)
+        # Files are versioned by the data fingerprint and the metadata is switched over
+        # last, so a reader never pairs a new model with an old scaler
+        if _is_keras(model):
+            model_path = f"{stem}-{version}.keras"
+            model.save(model_path + ".tmp.keras")
+            os.replace(model_path + ".tmp.keras", model_path)
+            meta['format'] = 'keras'
+        else:
+            model_path = f"{stem}-{version}.joblib"
+            joblib.dump(model, model_path + ".tmp")
+            os.replace(model_path + ".tmp", model_path)
+            meta['format'] = 'joblib'
+        meta['model_file'] = os.path.basename(model_path)
+        meta['scaler_file'] = None
+        if scaler is not None:
+            scaler_path = f"{stem}-{version}.scaler.joblib"
+            joblib.dump(scaler, scaler_path + ".tmp")
+            os.replace(scaler_path + ".tmp", scaler_path)
+            meta['scaler_file'] = os.path.basename(scaler_path)
+        meta.update(name=name, ticker=ticker, start_date=str(start_date), hyperparameters=hyperparameters)
+        with open(stem + ".json.tmp", "w") as f:
+            json.dump(meta, f, default=str)
+        os.replace(stem + ".json.tmp", stem + ".json")
+        if previous is not None:
+            stale = [previous[key] for key in ('model_file', 'scaler_file') if previous[key] and previous[key] != meta[key]]
+            if previous['model_file'] != meta['model_file']:
+                # Artifacts derived from the old model, such as TFLite exports, are named after it
+                prefix = os.path.splitext(previous['model_file'])[0] + "."
+                stale += [f for f in os.listdir(self.root) if f.startswith(prefix) and f.endswith(".tflite")]
+            for stale_file in stale:
+                try:
+                    os.remove(os.path.join(self.root, stale_file))
+                except FileNotFoundError:
+                    pass
+
+    def fit(self, name, ticker, values, hyperparameters, train, update=None, start_date=None, end_date=None):
+        """
+        Return a model fitted on values, training only what the saved entry lacks.
+
+        Args:
+        name (str): Model name, e.g. 'lstm'. Change it when the architecture changes.
+        ticker (str): Ticker or universe the data belongs to.
+        values (numpy.ndarray): Training data, oldest first; rows are observations.
+        hyperparameters (dict): Everything else the fitted model depends on.
+        train (callable): train(values) -> (model, scaler), a full training.
+        update (callable, optional): update(model, scaler, values, held) -> model,
+            fine-tuning on the observations from row `held` on. Without it, new data
+            always means a full training.
+        start_date (str, optional): First day of the data, part of the entry's identity.
+        end_date (str, optional): Last day of the data, recorded for reference.
+
+        Returns:
+        tuple: (model, scaler, status) with status 'cached', 'updated' or 'trained'.
+        """
+        values = np.asarray(values)
+        with self._lock:
+            saved = self.load(name, ticker, start_date, hyperparameters)
+            if saved is not None:
+                meta, model, scaler = saved
+                held = meta['observations']
+                if held <= len(values) and data_fingerprint(values[:held]) == meta['fingerprint']:
+                    if held == len(values):
+                        return model, scaler, 'cached'
+                    if update is not None and len(values) - meta['trained_observations'] <= self.retrain_after:
+                        model = update(model, scaler, values, held)
+                        meta.update(observations=len(values), fingerprint=data_fingerprint(values), end_date=end_date)
+                        self.save(name, ticker, start_date, hyperparameters, model, scaler, meta)
+                        return model, scaler, 'updated'
+            model, scaler = train(values)
+            meta = {'observations': len(values), 'trained_observations': len(values),
+                    'fingerprint': data_fingerprint(values), 'end_date': end_date}
+            self.save(name, ticker, start_date, hyperparameters, model, scaler, meta)
+            return model, scaler, 'trained'
+
+
+_default_model_registry = None
+_default_model_registry_lock = threading.Lock()
+
+
+def default_model_registry():
+    global _default_model_registry
+    with _default_model_registry_lock:
+        if _default_model_registry is None:
+            _default_model_registry = ModelRegistry()
+    return _default_model_registry
@@ -1,11 +1,16 @@
-import yfinance as yf
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices
+from predictionModels.MonteCarloEngine import simulate_gbm, simulate_portfolio_gbm
+from indicatorModels.EstimatorStore import fetch_moments
 
 # Function to get stock data and calculate daily close price percentage
 def get_stock_data(ticker, start_date, end_date):
-    stock_data = yf.download(ticker, start=start_date, end=end_date)
+    stock_data = fetch_prices(ticker, start_date, end_date)
     close_prices = stock_data['Close']
     start_price = close_prices.iloc[0]
     close_prices_percentage = (close_prices / start_price) * 100
@@ -17,22 +22,26 @@ def monte_carlo_simulation_gbm(data, num_simulations, forecast_period, days=252)
     mu = returns.mean()
     sigma = returns.std()
 
-    simulations = np.zeros((forecast_period, num_simulations))
-    simulations[0, :] = data.iloc[-1]
+    drift = (mu - 0.5 * sigma**2) * (days / 252)
+    diffusion = sigma * np.sqrt(days / 252) * np.random.normal(size=(forecast_period - 1, num_simulations))
 
-    for day in range(1, forecast_period):
-        drift = (mu - 0.5 * sigma**2) * (days / 252)
-        diffusion = sigma * np.sqrt(days / 252) * np.random.normal(size=num_simulations)
-        simulations[day, :] = simulations[day - 1, :] * np.exp(drift + diffusion)
+    simulations = np.empty((forecast_period, num_simulations))
+    simulations[0, :] = data.iloc[-1]
+    simulations[1:, :] = data.iloc[-1] * np.exp(np.cumsum(drift + diffusion, axis=0))
 
     return simulations
 
+# Function for chunked Monte Carlo simulation that keeps running statistics instead of every path
+def monte_carlo_gbm_summary(data, num_simulations, forecast_period, days=252, **options):
+    returns = data.pct_change().dropna()
+    return simulate_gbm(data.iloc[-1], returns.mean(), returns.std(), num_simulations, forecast_period, days, **options)
+
 # Function to plot the average of Monte Carlo simulations
 def plot_monte_carlo_average(data, simulations, label):
     plt.plot(data.index, data, label=label + " (Actual)", linewidth=2, color='blue')
     
-    # Calculate and plot the average of simulations
-    average_simulation = np.mean(simulations, axis=1)
+    # Calculate and plot the average of simulations, either full paths or a monte_carlo_gbm_summary result
+    average_simulation = simulations['mean'] if isinstance(simulations, dict) else np.mean(simulations, axis=1)
     plt.plot(data.index[-1] + pd.to_timedelta(np.arange(1, len(average_simulation) + 1), unit='D'), average_simulation, label=label + " (Average Prediction)", linestyle='--', linewidth=2, color='red')
 
 # Define portfolio as a dictionary with tickers and corresponding percentages
@@ -47,29 +56,42 @@ for stock_ticker, weight in portfolio.items():
     close_prices_percentage = get_stock_data(stock_ticker, start_date_portfolio, end_date_portfolio)
 
     if daily_percentage_dict_portfolio is None:
-        daily_percentage_dict_portfolio = pd.DataFrame(close_prices_percentage * weight)
+        daily_percentage_dict_portfolio = pd.DataFrame({stock_ticker: close_prices_percentage})
     else:
-        daily_percentage_dict_portfolio[stock_ticker] = close_prices_percentage * weight
+        daily_percentage_dict_portfolio[stock_ticker] = close_prices_percentage
 
 # Calculate the weighted average close prices across all stocks in the portfolio
-daily_percentage_dict_portfolio['Average'] = daily_percentage_dict_portfolio.sum(axis=1)
+portfolio_weights = pd.Series(portfolio)
+daily_percentage_dict_portfolio['Average'] = (daily_percentage_dict_portfolio[portfolio_weights.index] * portfolio_weights).sum(axis=1)
 
-# Monte Carlo simulation with geometric Brownian motion for the portfolio
+# Correlated Monte Carlo simulation with geometric Brownian motion for every stock in the portfolio
 num_simulations_portfolio = 1000
 forecast_period_portfolio = 66  # Approximately 3 months (assuming 22 business days per month)
-portfolio_simulations = monte_carlo_simulation_gbm(daily_percentage_dict_portfolio['Average'], num_simulations_portfolio, forecast_period_portfolio)
+asset_mean, asset_covariance = fetch_moments(list(portfolio), start_date_portfolio, end_date_portfolio, 'Close', ddof=1)
+asset_simulation = simulate_portfolio_gbm(daily_percentage_dict_portfolio[portfolio_weights.index].iloc[-1], asset_mean, asset_covariance, num_simulations_portfolio, forecast_period_portfolio)
+
+# Project the simulated stock paths onto the portfolio weights
+portfolio_simulations = {'mean': asset_simulation.mean(portfolio)[:, 0]}
+
+# Evaluate rebalancing scenarios against the same simulated paths
+rebalancing_weights = np.random.default_rng().dirichlet(np.ones(len(portfolio)), size=1000)
+rebalancing_ratio = asset_simulation.mean(rebalancing_weights)[-1] / asset_simulation.std(rebalancing_weights)[-1]
+best_weights = pd.Series(rebalancing_weights[np.argmax(rebalancing_ratio)], index=portfolio_weights.index)
+print("Best of 1000 rebalancing scenarios by terminal mean / std:")
+print(best_weights.round(3).to_string())
 
 # Plot the average of Monte Carlo simulations for the portfolio
 plot_monte_carlo_average(daily_percentage_dict_portfolio['Average'], portfolio_simulations, label="Portfolio")
 
 # Get data for ^GSPC
-sp500_data = yf.download('^GSPC', start=start_date_portfolio, end=end_date_portfolio)
+sp500_data = fetch_prices('^GSPC', start_date_portfolio, end_date_portfolio)
 sp500_close_prices_percentage = (sp500_data['Close'] / sp500_data['Open'].iloc[0]) * 100
 
 # Monte Carlo simulation with geometric Brownian motion for ^GSPC
 num_simulations_sp500 = 1000
 forecast_period_sp500 = 66  # Approximately 3 months (assuming 22 business days per month)
-sp500_simulations = monte_carlo_simulation_gbm(sp500_close_prices_percentage, num_simulations_sp500, forecast_period_sp500)
+sp500_simulations = monte_carlo_gbm_summary(sp500_close_prices_percentage, num_simulations_sp500, forecast_period_sp500)
+print(f"S&P 500 simulation: {sp500_simulations['paths_per_second']:,.0f} paths/s")
 
 # Plot the average of Monte Carlo simulations for ^GSPC
 plot_monte_carlo_average(sp500_close_prices_percentage, sp500_simulations, label="S&P 500")
@@ -0,0 +1,689 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from scipy.stats import norm, qmc
+
+# Per-day histograms span this many standard deviations of log price on each side
+HISTOGRAM_SPAN = 8.0
+
+# Ways of drawing the normal increments of the paths
+SAMPLERS = ('pseudo', 'antithetic', 'sobol')
+
+# Independent units estimate_gbm needs before trusting a standard error
+MIN_UNITS = 8
+
+
+def histogram_position(counts, low, width, target):
+    """
+    Value below which `target` of the counts of every histogram row fall, interpolated
+    linearly inside the bin.
+
+    Args:
+    counts (numpy.ndarray): (rows, bins) counts.
+    low (numpy.ndarray): Lower edge of the first bin of every row.
+    width (numpy.ndarray): Bin width of every row.
+    target (float): Count to reach, e.g. q * paths.
+
+    Returns:
+    numpy.ndarray: One value per row.
+    """
+    cumulative = np.cumsum(counts, axis=1)
+    index = np.minimum((cumulative < target).sum(axis=1), counts.shape[1] - 1)
+    rows = np.arange(len(counts))
+    below = np.where(index > 0, cumulative[rows, np.maximum(index - 1, 0)], 0)
+    inside = np.maximum(counts[rows, index], 1)
+    fraction = np.clip((target - below) / inside, 0.0, 1.0)
+    return low + (index + fraction) * width
+
+
+class GBMAccumulator:
+    """
+    Running statistics of simulated GBM price paths, fed one chunk of paths at a time.
+
+    Keeps per-day sums of prices and squared prices for the mean and its standard
+    error, and a fixed-width histogram of log prices per day from which quantiles
+    and the terminal distribution are read. Memory is horizon x bins whatever the
+    number of paths.
+
+    Args:
+    s0 (float): Starting price.
+    drift (float): Per-step drift of log price.
+    vol (float): Per-step standard deviation of log price.
+    horizon (int): Number of days in a path, day 0 being s0.
+    bins (int): Histogram bins per day.
+    """
+
+    def __init__(self, s0, drift, vol, horizon, bins=4096):
+        self.s0 = s0
+        self.horizon = horizon
+        self.bins = bins
+        steps = np.arange(horizon)
+        spread = HISTOGRAM_SPAN * vol * np.sqrt(steps)
+        # Day 0 has no spread, give it a nominal width so the binning stays defined
+        spread[0] = max(HISTOGRAM_SPAN * vol, 1e-12)
+        self.low = np.log(s0) + drift * steps - spread
+        self.width = 2 * spread / bins
+        self.paths = 0
+        self.total = np.zeros(horizon)
+        self.total_sq = np.zeros(horizon)
+        self.counts = np.zeros((horizon, bins), dtype=np.int64)
+
+    def add(self, log_paths):
+        """
+        Fold a (horizon, n) block of log-price paths into the statistics.
+        """
+        sums = self.block_sums(log_paths)
+        self.total += sums[0]
+        self.total_sq += sums[1]
+        self.add_counts(log_paths, self.counts)
+        self.paths += log_paths.shape[1]
+
+    def block_sums(self, log_paths):
+        """
+        Per-day sums of prices and squared prices of one block, as a (2, horizon) array.
+        """
+        prices = np.exp(log_paths)
+        return np.stack([prices.sum(axis=1, dtype=np.float64), np.square(prices, dtype=np.float64).sum(axis=1)])
+
+    def add_counts(self, log_paths, counts):
+        """
+        Add the histogram counts of one block into a (horizon, bins) array.
+        """
+        position = (log_paths - self.low[:, None].astype(log_paths.dtype)) / self.width[:, None].astype(log_paths.dtype)
+        index = np.clip(position.astype(np.int64), 0, self.bins - 1)
+        index += np.arange(self.horizon)[:, None] * self.bins
+        counts += np.bincount(index.ravel(), minlength=self.horizon * self.bins).reshape(self.horizon, self.bins)
+
+    def merge(self, sums, counts, paths):
+        """
+        Fold per-block sums, in block order, and histogram counts computed elsewhere.
+        """
+        for block in sums:
+            self.total += block[0]
+            self.total_sq += block[1]
+        self.counts += counts
+        self.paths += paths
+
+    def mean(self):
+        return self.total / self.paths
+
+    def std(self):
+        mean = self.mean()
+        return np.sqrt(np.maximum(self.total_sq / self.paths - mean * mean, 0.0))
+
+    def standard_error(self):
+        return self.std() / np.sqrt(self.paths)
+
+    def quantile(self, q):
+        """
+        Price quantile per day, interpolated linearly inside the histogram bin.
+        """
+        values = np.exp(histogram_position(self.counts, self.low, self.width, q * self.paths))
+        values[0] = self.s0
+        return values
+
+    def terminal(self):
+        """
+        Histogram of the last day's prices: bin edges in price and path counts.
+        """
+        edges = np.exp(self.low[-1] + np.arange(self.bins + 1) * self.width[-1])
+        return edges, self.counts[-1].copy()
+
+    def summary(self, quantiles):
+        edges, counts = self.terminal()
+        mean, std = self.mean(), self.std()
+        return {
+            'mean': mean,
+            'std': std,
+            'standard_error': std / np.sqrt(self.paths),
+            'quantiles': {q: self.quantile(q) for q in quantiles},
+            'terminal': {'edges': edges, 'counts': counts, 'mean': mean[-1], 'std': std[-1]},
+            'paths': self.paths,
+        }
+
+
+def gbm_parameters(mu, sigma, days=252):
+    """
+    Per-step drift and volatility of log price, as used by monte_carlo_simulation_gbm.
+    """
+    dt = days / 252
+    return (mu - 0.5 * sigma ** 2) * dt, sigma * np.sqrt(dt)
+
+
+def chunk_size(horizon, dtype, memory_budget):
+    # Folding a chunk keeps several (horizon, chunk) temporaries alive next to the log
+    # paths: prices, float64 squares, bin positions and int64 bin indices
+    return max(1, int(memory_budget // (8 * horizon * np.dtype(dtype).itemsize)))
+
+
+def draw_normals(rng, dimensions, n, sampler='pseudo', dtype=np.float64):
+    """
+    Draw a (dimensions, n) block of standard normals.
+
+    'antithetic' returns the first half of the paths followed by their mirror images,
+    so path i and path i + n // 2 form a pair. 'sobol' maps a freshly scrambled Sobol
+    sequence through the normal quantile function, one dimension per day; every call
+    is an independent randomization, so blocks can be averaged like independent runs.
+
+    Args:
+    rng (numpy.random.Generator): Source of randomness, also used to scramble.
+    dimensions (int): Number of increments per path.
+    n (int): Number of paths.
+    sampler (str): One of SAMPLERS.
+    dtype (numpy.dtype): Type of the result.
+
+    Returns:
+    numpy.ndarray: The normals.
+    """
+    if sampler == 'antithetic':
+        half = rng.standard_normal((dimensions, (n + 1) // 2), dtype=dtype)
+        return np.concatenate([half, -half], axis=1)[:, :n]
+    if sampler == 'sobol':
+        # Draw a power of two points, which keeps the balance properties of the sequence
+        points = qmc.Sobol(dimensions, scramble=True, seed=rng).random_base2(max(n - 1, 1).bit_length())[:n]
+        return norm.ppf(np.clip(points, 1e-12, 1 - 1e-12)).T.astype(dtype)
+    if sampler != 'pseudo':
+        raise ValueError(f"Unknown sampler {sampler!r}, expected one of {SAMPLERS}")
+    return rng.standard_normal((dimensions, n), dtype=dtype)
+
+
+def simulate_block(accumulator, log_s0, drift, vol, n, dtype, seed_sequence, sampler='pseudo'):
+    """
+    Simulate one block of log-price paths from its own random stream.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    log_paths = np.empty((accumulator.horizon, n), dtype=dtype)
+    log_paths[0] = log_s0
+    if sampler == 'pseudo':
+        rng.standard_normal((accumulator.horizon - 1, n), dtype=dtype, out=log_paths[1:])
+    else:
+        log_paths[1:] = draw_normals(rng, accumulator.horizon - 1, n, sampler, dtype)
+    log_paths[1:] *= dtype(vol)
+    log_paths[1:] += dtype(drift)
+    np.cumsum(log_paths, axis=0, out=log_paths)
+    return log_paths
+
+
+def _attach(name, shape, dtype):
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _run_blocks(s0, drift, vol, horizon, bins, dtype, sampler, blocks, sums_spec, counts_spec, slot):
+    # Worker side of simulate_gbm: write each block's sums to its own row and add the
+    # histogram counts into this worker's slot, both living in shared memory
+    accumulator = GBMAccumulator(s0, drift, vol, horizon, bins)
+    sums_memory, sums = _attach(*sums_spec)
+    counts_memory, counts = _attach(*counts_spec)
+    try:
+        for index, n, seed_sequence in blocks:
+            log_paths = simulate_block(accumulator, np.log(s0), drift, vol, n, dtype, seed_sequence, sampler)
+            sums[index] = accumulator.block_sums(log_paths)
+            accumulator.add_counts(log_paths, counts[slot])
+    finally:
+        sums = counts = None
+        sums_memory.close()
+        counts_memory.close()
+
+
+def simulate_gbm(s0, mu, sigma, num_paths, horizon, days=252, quantiles=(0.05, 0.5, 0.95),
+                 dtype=np.float32, memory_budget=64 * 2 ** 20, bins=4096, seed=None, workers=1,
+                 sampler='pseudo'):
+    """
+    Monte Carlo simulation of geometric Brownian motion reduced to running statistics.
+
+    Paths are generated in blocks sized to `memory_budget`: normal increments are drawn
+    for the whole block, accumulated with cumsum in log space and folded into a
+    GBMAccumulator, so no more than one block of paths per worker is ever held in memory.
+
+    Every block draws from its own generator spawned from one SeedSequence, and block
+    sums are combined in block order, so for a given seed the result is bit-for-bit
+    the same whatever the number of workers. With workers > 1 the blocks are split
+    across a process pool and the workers hand their statistics back through shared
+    memory instead of pickling arrays. Call it from under `if __name__ == '__main__':`
+    in that case, since the pool may re-import the calling script.
+
+    `sampler` picks how increments are drawn (see draw_normals). With 'sobol' blocks
+    are rounded down to a power of two paths. 'standard_error' is always the figure
+    for independent paths, which overstates the error of the variance-reduced
+    samplers; use estimate_gbm when a statistic is needed to a given precision.
+
+    Args:
+    s0 (float): Starting price.
+    mu (float): Mean daily return.
+    sigma (float): Standard deviation of daily returns.
+    num_paths (int): Number of simulated paths.
+    horizon (int): Number of days in a path, day 0 being s0.
+    days (int): Trading days per step, scaled by 252 as in monte_carlo_simulation_gbm.
+    quantiles (tuple): Price quantiles to report for every day.
+    dtype (numpy.dtype): float32 or float64 for the simulated paths.
+    memory_budget (int): Bytes of path data per block.
+    bins (int): Histogram bins per day used for the quantiles.
+    seed (int, optional): Seed of the random streams, drawn from the OS when omitted.
+    workers (int): Number of processes, None for one per CPU.
+    sampler (str): One of SAMPLERS.
+
+    Returns:
+    dict: 'mean', 'std', 'standard_error' and per-quantile arrays over the horizon, the
+    'terminal' distribution, and 'paths', 'seed', 'workers', 'seconds' and 'paths_per_second'.
+    """
+    dtype = np.dtype(dtype).type
+    drift, vol = gbm_parameters(mu, sigma, days)
+    accumulator = GBMAccumulator(s0, drift, vol, horizon, bins)
+    size = chunk_size(horizon, dtype, memory_budget)
+    if sampler == 'sobol':
+        size = 1 << (size.bit_length() - 1)
+    seed_sequence = np.random.SeedSequence(seed)
+    sizes = [min(size, num_paths - first) for first in range(0, num_paths, size)]
+    blocks = list(zip(range(len(sizes)), sizes, seed_sequence.spawn(len(sizes))))
+    workers = min(workers or os.cpu_count(), len(blocks)) or 1
+    started = time.perf_counter()
+    if workers == 1:
+        sums = np.empty((len(blocks), 2, horizon))
+        counts = np.zeros((horizon, bins), dtype=np.int64)
+        for index, n, block_seed in blocks:
+            log_paths = simulate_block(accumulator, np.log(s0), drift, vol, n, dtype, block_seed, sampler)
+            sums[index] = accumulator.block_sums(log_paths)
+            accumulator.add_counts(log_paths, counts)
+        accumulator.merge(sums, counts, num_paths)
+    else:
+        sums_shape, counts_shape = (len(blocks), 2, horizon), (workers, horizon, bins)
+        sums_memory = shared_memory.SharedMemory(create=True, size=int(np.prod(sums_shape)) * 8)
+        counts_memory = shared_memory.SharedMemory(create=True, size=int(np.prod(counts_shape)) * 8)
+        try:
+            counts = np.ndarray(counts_shape, dtype=np.int64, buffer=counts_memory.buf)
+            counts[:] = 0
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                jobs = [pool.submit(_run_blocks, s0, drift, vol, horizon, bins, dtype, sampler, blocks[slot::workers],
+                                    (sums_memory.name, sums_shape, np.float64),
+                                    (counts_memory.name, counts_shape, np.int64), slot)
+                        for slot in range(workers)]
+                for job in jobs:
+                    job.result()
+            sums = np.ndarray(sums_shape, dtype=np.float64, buffer=sums_memory.buf)
+            accumulator.merge(sums, counts.sum(axis=0), num_paths)
+        finally:
+            # Views into the segments must go before they can be closed
+            sums = counts = None
+            sums_memory.close()
+            sums_memory.unlink()
+            counts_memory.close()
+            counts_memory.unlink()
+    seconds = time.perf_counter() - started
+    result = accumulator.summary(quantiles)
+    result['seed'] = seed_sequence.entropy
+    result['workers'] = workers
+    result['seconds'] = seconds
+    result['paths_per_second'] = num_paths / seconds if seconds > 0 else float('inf')
+    return result
+
+
+def terminal_price(prices):
+    return prices[-1]
+
+
+def average_price(prices):
+    return prices.mean(axis=0)
+
+
+def maximum_price(prices):
+    return prices.max(axis=0)
+
+
+def maximum_drawdown(prices):
+    return 1 - (prices / np.maximum.accumulate(prices, axis=0)).min(axis=0)
+
+
+def loss_probability(prices):
+    return (prices[-1] < prices[0]).astype(np.float64)
+
+
+# Per-path statistics estimate_gbm can average, by name
+STATISTICS = {
+    'terminal': terminal_price,
+    'average': average_price,
+    'maximum': maximum_price,
+    'drawdown': maximum_drawdown,
+    'loss': loss_probability,
+}
+
+
+def control_estimate(moments, units, expected=None):
+    """
+    Estimate and standard error from the running moments kept by estimate_gbm.
+
+    Args:
+    moments (numpy.ndarray): Sums of x, y, x^2, y^2 and x*y over the units, shifted.
+    units (int): Number of independent units summed.
+    expected (float, optional): Known expectation of y, enables the control variate.
+
+    Returns:
+    tuple: Estimate of E[x] before the shift is undone, its standard error, and beta.
+    """
+    mean_x, mean_y = moments[0] / units, moments[1] / units
+    scale = units / max(units - 1, 1)
+    var_x = (moments[2] / units - mean_x ** 2) * scale
+    var_y = (moments[3] / units - mean_y ** 2) * scale
+    cov_xy = (moments[4] / units - mean_x * mean_y) * scale
+    if expected is None or var_y <= 0:
+        return mean_x, np.sqrt(max(var_x, 0.0) / units), 0.0
+    beta = cov_xy / var_y
+    # Fitting beta costs one more degree of freedom
+    residual = max(var_x - beta * cov_xy, 0.0) * (units - 1) / max(units - 2, 1)
+    return mean_x - beta * (mean_y - expected), np.sqrt(residual / units), beta
+
+
+def estimate_gbm(s0, mu, sigma, horizon, statistic='average', days=252, sampler='antithetic',
+                 control_variate=True, tolerance=None, relative=True, batch_paths=4096,
+                 max_paths=2 ** 22, seed=None):
+    """
+    Estimate the expectation of a per-path statistic of GBM paths with variance reduction.
+
+    Paths are simulated in batches of `batch_paths`. With antithetic sampling the
+    independent units are mirrored pairs of paths, with Sobol sampling they are whole
+    batches, each an independent scrambling, and otherwise single paths. At least
+    MIN_UNITS units are simulated before the error is trusted. The control
+    variate is the terminal price, whose expectation s0 * exp(mu * t) is known for GBM;
+    its coefficient is re-estimated from all units after every batch. With a
+    `tolerance`, batches are added only until the standard error of the estimate falls
+    below it.
+
+    Args:
+    s0 (float): Starting price.
+    mu (float): Mean daily return.
+    sigma (float): Standard deviation of daily returns.
+    horizon (int): Number of days in a path, day 0 being s0.
+    statistic (str or callable): Name in STATISTICS, or a function mapping a
+        (horizon, n) array of prices to n per-path values.
+    days (int): Trading days per step, scaled by 252 as in monte_carlo_simulation_gbm.
+    sampler (str): One of SAMPLERS.
+    control_variate (bool): Correct the estimate with the terminal price.
+    tolerance (float, optional): Target standard error, None for exactly max_paths paths.
+    relative (bool): Whether the tolerance is relative to the estimate.
+    batch_paths (int): Paths per batch, rounded up to an even number or, for Sobol, a
+        power of two.
+    max_paths (int): Upper bound on the number of paths.
+    seed (int, optional): Seed of the random streams.
+
+    Returns:
+    dict: 'estimate', 'standard_error', 'converged', 'beta', 'paths', 'units', 'seed',
+    'seconds' and 'paths_per_second'.
+    """
+    function = STATISTICS[statistic] if isinstance(statistic, str) else statistic
+    if sampler == 'sobol':
+        batch_paths = 1 << max(batch_paths - 1, 1).bit_length()
+    else:
+        batch_paths += batch_paths % 2
+    drift, vol = gbm_parameters(mu, sigma, days)
+    expected = s0 * np.exp((drift + 0.5 * vol ** 2) * (horizon - 1)) if control_variate else None
+    seed_sequence = np.random.SeedSequence(seed)
+    moments = np.zeros(5)
+    shift = None
+    paths = units = 0
+    converged = False
+    started = time.perf_counter()
+    while paths < max_paths:
+        rng = np.random.default_rng(seed_sequence.spawn(1)[0])
+        log_paths = np.empty((horizon, batch_paths))
+        log_paths[0] = np.log(s0)
+        log_paths[1:] = draw_normals(rng, horizon - 1, batch_paths, sampler) * vol + drift
+        prices = np.exp(np.cumsum(log_paths, axis=0))
+        x, y = np.asarray(function(prices), dtype=np.float64), prices[-1]
+        if sampler == 'antithetic':
+            half = batch_paths // 2
+            x, y = (x[:half] + x[half:]) / 2, (y[:half] + y[half:]) / 2
+        elif sampler == 'sobol':
+            x, y = x.mean(keepdims=True), y.mean(keepdims=True)
+        if shift is None:
+            # Sums of squares are kept around the first batch means to avoid cancellation
+            shift = (x.mean(), y.mean())
+        x, y = x - shift[0], y - shift[1]
+        moments += [x.sum(), y.sum(), (x * x).sum(), (y * y).sum(), (x * y).sum()]
+        paths += batch_paths
+        units += len(x)
+        estimate, error, beta = control_estimate(moments, units, None if expected is None else expected - shift[1])
+        estimate += shift[0]
+        if tolerance is not None and units >= MIN_UNITS and error <= tolerance * (abs(estimate) if relative else 1.0):
+            converged = True
+            break
+    seconds = time.perf_counter() - started
+    return {
+        'estimate': estimate,
+        'standard_error': error,
+        'converged': converged,
+        'beta': beta,
+        'paths': paths,
+        'units': units,
+        'seed': seed_sequence.entropy,
+        'seconds': seconds,
+        'paths_per_second': paths / seconds if seconds > 0 else float('inf'),
+    }
+
+
+def cholesky_factor(covariance, attempts=14):
+    """
+    Lower Cholesky factor of a return covariance matrix.
+
+    Sample covariances of short or overlapping histories can be singular; a ridge
+    growing tenfold from a tiny fraction of the average variance is added until the
+    factorization succeeds, for at most `attempts` tries.
+
+    Raises:
+    ValueError: If the covariance holds NaN or inf.
+    numpy.linalg.LinAlgError: If no ridge up to the average variance makes it positive definite.
+    """
+    covariance = np.asarray(covariance, dtype=np.float64)
+    if not np.isfinite(covariance).all():
+        raise ValueError("Covariance matrix contains NaN or inf, check the return history for gaps")
+    scale = max(np.trace(covariance) / len(covariance), 0.0) or 1.0
+    ridges = [0.0] + [scale * 10.0 ** power for power in range(-12, -12 + attempts - 1)]
+    for ridge in ridges:
+        try:
+            return np.linalg.cholesky(covariance + ridge * np.eye(len(covariance)))
+        except np.linalg.LinAlgError:
+            pass
+    raise np.linalg.LinAlgError(f"Covariance matrix is not positive definite even with a ridge of {ridges[-1]:.3g}")
+
+
+class PortfolioSimulation:
+    """
+    Correlated GBM paths of several assets, reduced to what portfolio projections need.
+
+    Portfolio value is linear in asset prices, so the per-day mean and covariance of
+    any weighted portfolio follow exactly from the per-day first and second moments of
+    the asset prices. Those moments are accumulated as (horizon, assets) and
+    (horizon, assets, assets) sums, so any number of weight vectors can be evaluated
+    without simulating again.
+
+    Quantiles are not linear, so the terminal values of the `scenarios` weight vectors
+    given up front are binned into a fixed-width histogram per scenario, between
+    `bounds`. Memory thus stays fixed however many paths are simulated. Quantiles of
+    other weight vectors need the terminal asset prices of every path, which are only
+    kept with keep_terminal.
+
+    Args:
+    tickers (list): Asset names, in column order.
+    horizon (int): Number of days in a path, day 0 being the starting prices.
+    scenarios (numpy.ndarray, optional): (scenarios, assets) weight vectors whose
+        terminal value histograms are kept.
+    bounds (tuple, optional): (low, high) arrays of terminal value per scenario spanned
+        by the histograms, values outside land in the end bins.
+    bins (int): Histogram bins per scenario.
+    keep_terminal (bool): Keep the terminal asset prices of every path.
+    num_paths (int, optional): Number of simulated paths, needed with keep_terminal.
+    dtype (numpy.dtype): Storage type of the terminal prices.
+    """
+
+    def __init__(self, tickers, horizon, scenarios=None, bounds=None, bins=4096, keep_terminal=False,
+                 num_paths=None, dtype=np.float32):
+        assets = len(tickers)
+        self.tickers = list(tickers)
+        self.horizon = horizon
+        self.paths = 0
+        self.total = np.zeros((horizon, assets))
+        self.cross = np.zeros((horizon, assets, assets))
+        self.scenarios = None if scenarios is None else self._weights(scenarios)
+        if self.scenarios is not None:
+            self.bins = bins
+            self.low = np.asarray(bounds[0], dtype=np.float64)
+            self.width = np.maximum(np.asarray(bounds[1], dtype=np.float64) - self.low, 1e-12) / bins
+            self.counts = np.zeros((len(self.scenarios), bins), dtype=np.int64)
+        self.terminal_prices = np.empty((num_paths, assets), dtype=dtype) if keep_terminal else None
+
+    def add(self, prices, batch=256):
+        """
+        Fold a (horizon, n, assets) block of price paths into the moments and histograms.
+
+        Scenarios are binned `batch` weight vectors at a time to bound memory.
+        """
+        n = prices.shape[1]
+        wide = prices.astype(np.float64)
+        self.total += wide.sum(axis=1)
+        self.cross += np.matmul(wide.transpose(0, 2, 1), wide)
+        if self.scenarios is not None:
+            for first in range(0, len(self.scenarios), batch):
+                rows = slice(first, first + batch)
+                values = wide[-1] @ self.scenarios[rows].T
+                index = np.clip(((values - self.low[rows]) / self.width[rows]).astype(np.int64), 0, self.bins - 1)
+                index += np.arange(index.shape[1]) * self.bins
+                self.counts[rows] += np.bincount(index.ravel(), minlength=self.counts[rows].size).reshape(-1, self.bins)
+        if self.terminal_prices is not None:
+            self.terminal_prices[self.paths:self.paths + n] = prices[-1]
+        self.paths += n
+
+    def _weights(self, weights):
+        # Accept a dict keyed by ticker, one weight vector, or a (scenarios, assets) matrix
+        if isinstance(weights, dict):
+            weights = [weights.get(ticker, 0.0) for ticker in self.tickers]
+        return np.atleast_2d(np.asarray(weights, dtype=np.float64))
+
+    def mean(self, weights):
+        """
+        Expected portfolio value per day, shaped (horizon, scenarios).
+        """
+        return (self.total / self.paths) @ self._weights(weights).T
+
+    def std(self, weights):
+        """
+        Standard deviation of portfolio value per day, shaped (horizon, scenarios).
+        """
+        weights = self._weights(weights)
+        mean = self.total / self.paths
+        covariance = self.cross / self.paths - mean[:, :, None] * mean[:, None, :]
+        variance = np.einsum('sa,tab,sb->ts', weights, covariance, weights)
+        return np.sqrt(np.maximum(variance, 0.0))
+
+    def standard_error(self, weights):
+        return self.std(weights) / np.sqrt(self.paths)
+
+    def terminal_values(self, weights):
+        """
+        Terminal portfolio value of every path, shaped (paths, scenarios); needs keep_terminal.
+        """
+        if self.terminal_prices is None:
+            raise ValueError("Terminal values of every path are only kept with keep_terminal=True")
+        return self.terminal_prices[:self.paths] @ self._weights(weights).T.astype(self.terminal_prices.dtype)
+
+    def _histogrammed(self, weights):
+        return (self.scenarios is not None and weights.shape == self.scenarios.shape
+                and np.array_equal(weights, self.scenarios))
+
+    def terminal_quantiles(self, weights=None, quantiles=(0.05, 0.5, 0.95), batch=256):
+        """
+        Quantiles of terminal portfolio value, shaped (len(quantiles), scenarios).
+
+        The quantiles of the scenarios given up front, the default, are read from their
+        histograms, interpolated linearly inside a bin. Other weight vectors are
+        projected from the kept terminal prices `batch` at a time to bound memory.
+        """
+        weights = self.scenarios if weights is None else self._weights(weights)
+        if weights is None:
+            raise ValueError("No scenarios were histogrammed, pass weights and simulate with keep_terminal=True")
+        if self._histogrammed(weights):
+            return np.stack([histogram_position(self.counts, self.low, self.width, q * self.paths)
+                             for q in quantiles])
+        if self.terminal_prices is None:
+            raise ValueError("Terminal quantiles of weights other than the simulated scenarios "
+                             "need keep_terminal=True")
+        result = np.empty((len(quantiles), len(weights)))
+        for first in range(0, len(weights), batch):
+            values = self.terminal_values(weights[first:first + batch])
+            result[:, first:first + batch] = np.quantile(values, quantiles, axis=0)
+        return result
+
+    def summary(self, weights, quantiles=(0.05, 0.5, 0.95)):
+        mean, std = self.mean(weights), self.std(weights)
+        result = {
+            'mean': mean,
+            'std': std,
+            'standard_error': std / np.sqrt(self.paths),
+            'paths': self.paths,
+        }
+        if self.terminal_prices is not None or self._histogrammed(self._weights(weights)):
+            result['terminal_quantiles'] = dict(zip(quantiles, self.terminal_quantiles(weights, quantiles)))
+        return result
+
+
+def simulate_portfolio_gbm(s0, mu, covariance, num_paths, horizon, days=252, dtype=np.float32,
+                           memory_budget=64 * 2 ** 20, seed=None, scenarios=None, bins=4096, keep_terminal=False):
+    """
+    Monte Carlo simulation of correlated geometric Brownian motions for several assets.
+
+    Normal increments for a whole block of paths and assets are drawn at once and
+    correlated with one matrix product against the Cholesky factor of the return
+    covariance, then accumulated with cumsum in log space. Blocks are sized to
+    `memory_budget` and draw from streams spawned from one SeedSequence, as in
+    simulate_gbm. Memory stays fixed in num_paths unless keep_terminal is set.
+
+    Args:
+    s0 (pandas.Series): Starting price of every asset, indexed by ticker.
+    mu (pandas.Series): Mean daily return of every asset.
+    covariance (pandas.DataFrame): Covariance of daily returns.
+    num_paths (int): Number of simulated paths.
+    horizon (int): Number of days in a path, day 0 being s0.
+    days (int): Trading days per step, scaled by 252 as in monte_carlo_simulation_gbm.
+    dtype (numpy.dtype): float32 or float64 for the simulated paths.
+    memory_budget (int): Bytes of path data per block.
+    seed (int, optional): Seed of the random streams.
+    scenarios (optional): Weight vectors, as a dict, vector or (scenarios, assets) matrix,
+        whose terminal value quantiles are wanted; histogrammed over HISTOGRAM_SPAN
+        standard deviations of every asset's terminal log price.
+    bins (int): Histogram bins per scenario.
+    keep_terminal (bool): Also keep the terminal prices of every path, num_paths x assets,
+        for quantiles of weight vectors chosen after the simulation.
+
+    Returns:
+    PortfolioSimulation: Moments and histograms to project weight vectors onto.
+    """
+    dtype = np.dtype(dtype).type
+    tickers = list(s0.index)
+    covariance = np.asarray(covariance.loc[tickers, tickers], dtype=np.float64)
+    dt = days / 252
+    drift = (np.asarray(mu[tickers], dtype=np.float64) - 0.5 * np.diag(covariance)) * dt
+    factor = (cholesky_factor(covariance) * np.sqrt(dt)).T.astype(dtype)
+    log_s0 = np.log(np.asarray(s0, dtype=np.float64))
+    bounds = None
+    if scenarios is not None:
+        if isinstance(scenarios, dict):
+            scenarios = [scenarios.get(ticker, 0.0) for ticker in tickers]
+        scenarios = np.atleast_2d(np.asarray(scenarios, dtype=np.float64))
+        spread = HISTOGRAM_SPAN * np.sqrt(np.diag(covariance) * dt * (horizon - 1))
+        low = np.exp(log_s0 + drift * (horizon - 1) - spread)
+        high = np.exp(log_s0 + drift * (horizon - 1) + spread)
+        # Short positions take their lowest value at the assets' highest prices
+        bounds = ((np.minimum(scenarios * low, scenarios * high)).sum(axis=1),
+                  (np.maximum(scenarios * low, scenarios * high)).sum(axis=1))
+    simulation = PortfolioSimulation(tickers, horizon, scenarios, bounds, bins, keep_terminal, num_paths, dtype)
+    size = chunk_size(horizon * len(tickers), dtype, memory_budget)
+    sizes = [min(size, num_paths - first) for first in range(0, num_paths, size)]
+    for n, block_seed in zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))):
+        rng = np.random.default_rng(block_seed)
+        log_paths = np.empty((horizon, n, len(tickers)), dtype=dtype)
+        log_paths[0] = log_s0
+        log_paths[1:] = rng.standard_normal((horizon - 1, n, len(tickers)), dtype=dtype) @ factor
+        log_paths[1:] += drift.astype(dtype)
+        np.cumsum(log_paths, axis=0, out=log_paths)
+        simulation.add(np.exp(log_paths, out=log_paths))
+    return simulation
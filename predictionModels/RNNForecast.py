@@ -1,11 +1,15 @@
-import yfinance as yf
 import numpy as np
 import tensorflow as tf
 from sklearn.preprocessing import MinMaxScaler
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices
+from predictionModels.ModelRegistry import default_model_registry
+from predictionModels.SequenceWindows import WindowedSeries, sliding_windows
 
 def fetch_stock_data(symbol, start_date, end_date):
-    stock_data = yf.download(symbol, start=start_date, end=end_date)
-    return stock_data
+    return fetch_prices(symbol, start_date, end_date)
 
 def preprocess_data(data):
     scaler = MinMaxScaler(feature_range=(0, 1))
@@ -13,11 +17,8 @@ def preprocess_data(data):
     return scaled_data, scaler
 
 def prepare_data(data, time_steps):
-    X, y = [], []
-    for i in range(len(data) - time_steps - 1):
-        X.append(data[i:(i + time_steps)])
-        y.append(data[i + time_steps])
-    return np.array(X), np.array(y)
+    # (samples, time_steps, 1) windows and their next values, as views of data
+    return sliding_windows(data, time_steps)
 
 def build_rnn_model(input_shape):
     model = tf.keras.Sequential([
@@ -37,20 +38,34 @@ def main():
     stock_data = fetch_stock_data(symbol, start_date, end_date)
     close_prices = stock_data['Close'].values
 
-    scaled_data, scaler = preprocess_data(close_prices)
-    X, y = prepare_data(scaled_data, time_steps)
-    input_shape = (X.shape[1], 1)
+    input_shape = (time_steps, 1)
+    epochs = 50
 
-    split_index = int(0.8 * len(X))
-    X_train, X_test = X[:split_index], X[split_index:]
-    y_train, y_test = y[:split_index], y[split_index:]
+    # Train on the first 80% of the windows, keeping the most recent period for testing
+    split_index = int(0.8 * (len(close_prices) - time_steps))
+    train_prices = close_prices[:split_index + time_steps]
 
-    X_train = X_train.reshape((X_train.shape[0], X_train.shape[1], 1))
-    X_test = X_test.reshape((X_test.shape[0], X_test.shape[1], 1))
+    # Stream windows to the model batch by batch instead of materializing them
+    def train(values):
+        scaled_data, scaler = preprocess_data(values)
+        model = build_rnn_model(input_shape)
+        model.fit(WindowedSeries([scaled_data], time_steps).dataset(batch_size=32, shuffle=True, seed=42), epochs=epochs)
+        return model, scaler
 
-    model = build_rnn_model(input_shape)
-    model.fit(X_train, y_train, epochs=50, batch_size=32, validation_data=(X_test, y_test))
-    loss = model.evaluate(X_test, y_test)
+    def update(model, scaler, values, held):
+        scaled_data = scaler.transform(values[held - time_steps:].reshape(-1, 1))
+        model.fit(WindowedSeries([scaled_data], time_steps).dataset(batch_size=32, shuffle=True, seed=42),
+                  epochs=max(1, epochs // 5))
+        return model
+
+    # Reuse the model saved for these prices and settings, fine-tuning it when prices were added
+    hyperparameters = {'time_steps': time_steps, 'epochs': epochs, 'batch_size': 32}
+    model, scaler, status = default_model_registry().fit('rnn', symbol, train_prices, hyperparameters, train, update,
+                                                         start_date)
+    print(f"RNN model: {status}")
+
+    test = WindowedSeries([scaler.transform(close_prices[split_index:].reshape(-1, 1))], time_steps)
+    loss = model.evaluate(test.dataset(batch_size=32))
     print("Test Loss:", loss)
 
 if __name__ == "__main__":
@@ -1,13 +1,19 @@
-import yfinance as yf
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices
+from indicatorModels.FeatureStore import fetch_features
+from predictionModels.InferenceService import forecast
+from predictionModels.ModelRegistry import default_model_registry
+from predictionModels.WalkForward import SklearnModel, walk_forward, walk_forward_splits, summarize
 
 def fetch_stock_data(symbol, start_date, end_date):
     """
-    Fetch historical stock data using yfinance.
+    Fetch historical stock data through the shared price cache.
 
     Args:
     symbol (str): Ticker symbol of the stock.
@@ -17,44 +23,63 @@ def fetch_stock_data(symbol, start_date, end_date):
     Returns:
     pandas.DataFrame: Historical stock data.
     """
-    stock_data = yf.download(symbol, start=start_date, end=end_date)
-    return stock_data
+    return fetch_prices(symbol, start_date, end_date)
 
-def preprocess_data(stock_data):
+def build_model(X_train, y_train):
     """
-    Preprocess historical stock data.
+    Build a machine learning model, fitting its trees on all cores.
 
     Args:
-    stock_data (pandas.DataFrame): Historical stock data.
+    X_train (pandas.DataFrame or numpy.ndarray): Features for training.
+    y_train (pandas.Series or numpy.ndarray): Target variable for training.
 
     Returns:
-    pandas.DataFrame: Preprocessed data.
+    sklearn.ensemble.RandomForestRegressor: Trained Random Forest model.
     """
-    # Feature engineering
-    stock_data['Daily_Return'] = stock_data['Adj Close'].pct_change()
-    stock_data['Volatility'] = stock_data['Daily_Return'].rolling(window=30).std()
-
-    # Drop rows with NaN values
-    stock_data.dropna(inplace=True)
-
-    return stock_data
+    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+    model.fit(X_train, y_train)
+    return model
 
-def build_model(X_train, y_train):
+def update_model(model, X_train, y_train, held):
     """
-    Build a machine learning model.
+    Grow a trained forest for newly arrived rows instead of refitting it.
+
+    The existing trees are kept and new trees are added in proportion to the new rows
+    (one tree per 1% more data), fitted on all of X_train so they see the new days.
 
     Args:
-    X_train (pandas.DataFrame): Features for training.
-    y_train (pandas.Series): Target variable for training.
+    model (sklearn.ensemble.RandomForestRegressor): Forest trained on the first `held` rows.
+    X_train (numpy.ndarray): Features for training, the old rows followed by the new ones.
+    y_train (numpy.ndarray): Target variable for training.
+    held (int): Rows the forest was trained on.
 
     Returns:
-    sklearn.ensemble.RandomForestRegressor: Trained Random Forest model.
+    sklearn.ensemble.RandomForestRegressor: The grown forest.
     """
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    new_trees = max(1, round(model.n_estimators * (len(X_train) - held) / held))
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + new_trees)
     model.fit(X_train, y_train)
     return model
 
-def evaluate_model(model, X_test, y_test):
+def fit_index_model(symbol, X_train, y_train, features, start_date, end_date=None, registry=None):
+    """
+    Train the model, or reuse the one saved for the same data and grow it for new days.
+
+    Returns:
+    tuple: (model, status, version) with status 'cached', 'updated' or 'trained' and
+    version the saved model file, as the inference service knows it.
+    """
+    registry = registry or default_model_registry()
+    values = np.column_stack([X_train, y_train])
+    hyperparameters = {'features': features, 'n_estimators': 100, 'random_state': 42}
+    model, _, status = registry.fit(
+        'random_forest', symbol, values, hyperparameters,
+        train=lambda values: (build_model(values[:, :-1], values[:, -1]), None),
+        update=lambda model, scaler, values, held: update_model(model, values[:, :-1], values[:, -1], held),
+        start_date=start_date, end_date=end_date)
+    return model, status, registry.entry('random_forest', symbol, start_date, hyperparameters)['model_file']
+
+def evaluate_model(model, X_test, y_test, name=None, version=None):
     """
     Evaluate the performance of the machine learning model.
 
@@ -62,33 +87,48 @@ def evaluate_model(model, X_test, y_test):
     model (sklearn.ensemble.RandomForestRegressor): Trained Random Forest model.
     X_test (pandas.DataFrame): Features for testing.
     y_test (pandas.Series): Target variable for testing.
+    name (str, optional): Served name of the model, e.g. 'random_forest/^GSPC', to predict
+        through the inference service when one is running.
+    version (str, optional): Registry model file of the model.
     """
-    predictions = model.predict(X_test)
+    if name is None:
+        predictions = model.predict(X_test)
+    else:
+        predictions = forecast(name, X_test, model, version=version)
     mse = mean_squared_error(y_test, predictions)
     print(f"Mean Squared Error: {mse}")
 
 def main():
-    # Fetch historical data for S&P 500 (^GSPC)
-    sp500_data = fetch_stock_data('^GSPC', '2000-01-01', '2022-12-31')
-
-    # Preprocess data
-    sp500_data = preprocess_data(sp500_data)
+    symbol, start_date, end_date = '^GSPC', '2000-01-01', '2022-12-31'
 
     # Define features and target variable
     features = ['Open', 'High', 'Low', 'Close', 'Volume', 'Volatility']
     target = 'Adj Close'
 
-    X = sp500_data[features]
-    y = sp500_data[target]
+    # Engineered features of S&P 500 (^GSPC) as float32, computed once per new day in the feature store
+    index, data = fetch_features(symbol, features + [target], start_date, end_date)
+    X, y = data[:, :-1], data[:, -1]
+
+    # Walk-forward evaluation: every fold trains on the past and tests on the period after it.
+    # Folds run one after another since each forest already uses every core
+    splits = walk_forward_splits(len(X), initial=len(X) // 2, test_size=len(X) // 10)
+    folds = walk_forward({'Random Forest': SklearnModel(build_model)}, X, y, splits,
+                         reference=np.r_[np.nan, y[:-1]], index=index, workers=1)
+    print(folds[['Fold', 'Test Start', 'Test Finish', 'RMSE', 'MAE', 'Directional Accuracy']].to_string(index=False))
+    print(summarize(folds))
 
-    # Split data into training and testing sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Split data into training and testing sets, keeping the most recent period for testing
+    split_index = int(0.8 * len(X))
+    X_train, X_test = X[:split_index], X[split_index:]
+    y_train, y_test = y[:split_index], y[split_index:]
 
-    # Build and train the model
-    model = build_model(X_train, y_train)
+    # Build and train the model, or grow the saved one when only new days were added
+    model, status, version = fit_index_model(symbol, X_train, y_train, features, start_date,
+                                             str(index[split_index - 1].date()))
+    print(f"Random Forest: {status} ({model.n_estimators} trees)")
 
     # Evaluate the model
-    evaluate_model(model, X_test, y_test)
+    evaluate_model(model, X_test, y_test, f"random_forest/{symbol.upper()}", version)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,117 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(values, window, horizon=1):
+    """
+    Training windows over a series as strided views, without copying the series.
+
+    Sample i is the `window` rows ending at row i + window - 1, and its target is the row
+    `horizon` steps after that. Both outputs share memory with `values`, so they cost
+    nothing however many windows there are; only slicing out a batch copies data.
+
+    Args:
+    values (numpy.ndarray): (time,) or (time, features) series, oldest first.
+    window (int): Rows per window.
+    horizon (int): Steps between the last row of a window and its target.
+
+    Returns:
+    tuple: X (samples, window, features) and y (samples,) for a 1-D series or
+    (samples, features) otherwise, both read-only views.
+    """
+    values = np.asarray(values)
+    flat = values.ndim == 1
+    if flat:
+        values = values[:, None]
+    # sliding_window_view puts the window axis last, move it before the features
+    X = sliding_window_view(values[:len(values) - horizon], window, axis=0).transpose(0, 2, 1)
+    y = values[window + horizon - 1:]
+    return X, y[:, 0] if flat else y
+
+
+class WindowedSeries:
+    """
+    Windows over one or more series (e.g. one per ticker), served in batches.
+
+    Windows never span two series. Batches are gathered from the strided views as they
+    are requested, so memory holds the series plus one batch rather than every window.
+
+    Args:
+    series (list): Series as accepted by sliding_windows, all with the same features.
+    window (int): Rows per window.
+    horizon (int): Steps between the last row of a window and its target.
+    """
+
+    def __init__(self, series, window, horizon=1):
+        self.window = window
+        self.views = [sliding_windows(values, window, horizon) for values in series]
+        self.views = [(X, y) for X, y in self.views if len(X)]
+        self.offsets = np.cumsum([0] + [len(X) for X, _ in self.views])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def gather(self, indices):
+        """
+        Copy out the windows and targets at sample positions across all series.
+
+        Returns:
+        tuple: (X, y) arrays of the requested samples, in the requested order.
+        """
+        indices = np.asarray(indices)
+        owner = np.searchsorted(self.offsets, indices, side='right') - 1
+        X0, y0 = self.views[0]
+        X = np.empty((len(indices),) + X0.shape[1:], dtype=X0.dtype)
+        y = np.empty((len(indices),) + y0.shape[1:], dtype=y0.dtype)
+        for k in np.unique(owner):
+            rows = owner == k
+            X[rows] = self.views[k][0][indices[rows] - self.offsets[k]]
+            y[rows] = self.views[k][1][indices[rows] - self.offsets[k]]
+        return X, y
+
+    def batches(self, batch_size=32, shuffle=False, rng=None):
+        """
+        Yield (X, y) batches covering every sample once, in order or shuffled.
+        """
+        order = np.arange(len(self))
+        if shuffle:
+            (rng or np.random.default_rng()).shuffle(order)
+        for start in range(0, len(order), batch_size):
+            yield self.gather(order[start:start + batch_size])
+
+    def arrays(self):
+        """
+        All windows and targets as (X, y). With a single series these are the views
+        themselves; several series are concatenated, which copies them.
+        """
+        if len(self.views) == 1:
+            return self.views[0]
+        return self.gather(np.arange(len(self)))
+
+    def dataset(self, batch_size=32, shuffle=False, seed=None):
+        """
+        Streaming tf.data pipeline over the windows, for model.fit and model.predict.
+
+        Each pass over the dataset (each epoch) reshuffles when shuffle is set, and the
+        next batches are gathered in the background while the model trains on the
+        current one.
+
+        Args:
+        batch_size (int): Samples per batch.
+        shuffle (bool): Visit the samples in a new random order every epoch.
+        seed (int, optional): Seed of the shuffling.
+
+        Returns:
+        tensorflow.data.Dataset: (X, y) batches.
+        """
+        import tensorflow as tf
+
+        rng = np.random.default_rng(seed)
+        X0, y0 = self.views[0]
+        signature = (
+            tf.TensorSpec((None,) + X0.shape[1:], tf.as_dtype(X0.dtype)),
+            tf.TensorSpec((None,) + y0.shape[1:], tf.as_dtype(y0.dtype)),
+        )
+        dataset = tf.data.Dataset.from_generator(lambda: self.batches(batch_size, shuffle, rng),
+                                                 output_signature=signature)
+        return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,195 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+from dataModels.PriceStore import DEFAULT_STORE_DIR
+from predictionModels.SequenceWindows import WindowedSeries
+
+# Training shards live next to the price cache, override with SHARD_STORE_DIR
+DEFAULT_SHARD_DIR = os.environ.get(
+    "SHARD_STORE_DIR",
+    os.path.join(os.path.dirname(DEFAULT_STORE_DIR), "shards")
+)
+
+
+def write_shards(series, root, shard_rows=1 << 22):
+    """
+    Normalize many series and write them to sharded float32 .npy files.
+
+    Each series is min-max scaled to [0, 1] with its own range, so tickers trading at $5
+    and $500 share one model, and series are packed whole into shards of about
+    `shard_rows` rows. The series are stored rather than their windows, which are taken
+    as views when reading, so the shards are no larger than the data.
+
+    Args:
+    series (dict): {ticker: (time,) or (time, features) values}, oldest first.
+    root (str): Directory of the shards, replaced entirely once the new shards are
+        written, so readers never see a partial set.
+    shard_rows (int): Target rows per shard.
+
+    Returns:
+    dict: The manifest, as saved to root/manifest.json.
+    """
+    root = os.path.abspath(root)
+    os.makedirs(os.path.dirname(root), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=os.path.basename(root) + ".tmp-", dir=os.path.dirname(root))
+    manifest = {'tickers': {}, 'shards': []}
+    pending, rows = [], 0
+
+    def flush():
+        nonlocal pending, rows
+        name = f"shard-{len(manifest['shards']):05d}.npy"
+        np.save(os.path.join(staging, name), np.concatenate([values for _, values in pending]))
+        offset = 0
+        for ticker, values in pending:
+            manifest['tickers'][ticker].update(shard=len(manifest['shards']), offset=offset)
+            offset += len(values)
+        manifest['shards'].append(name)
+        pending, rows = [], 0
+
+    try:
+        for ticker, values in series.items():
+            values = np.asarray(values, dtype=np.float64)
+            values = values[:, None] if values.ndim == 1 else values
+            low, high = values.min(axis=0), values.max(axis=0)
+            scaled = ((values - low) / np.where(high > low, high - low, 1.0)).astype(np.float32)
+            manifest['tickers'][ticker] = {'length': len(scaled), 'low': low.tolist(), 'high': high.tolist()}
+            pending.append((ticker, scaled))
+            rows += len(scaled)
+            if rows >= shard_rows:
+                flush()
+        if pending:
+            flush()
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    # Move the previous shards aside until the new directory takes their place; another
+    # job writing the same root may swap in between, so retry until the rename lands
+    retired = tempfile.mkdtemp(prefix=os.path.basename(root) + ".old-", dir=os.path.dirname(root))
+    while True:
+        try:
+            os.replace(staging, root)
+            break
+        except OSError:
+            try:
+                os.replace(root, os.path.join(retired, str(len(os.listdir(retired)))))
+            except FileNotFoundError:
+                pass
+    shutil.rmtree(retired, ignore_errors=True)
+    return manifest
+
+
+def configure_threads(intra_op_threads=None, inter_op_threads=None):
+    """
+    Set TensorFlow's CPU thread pools; call before any model is built.
+
+    Args:
+    intra_op_threads (int, optional): Threads used inside one op, e.g. a matrix product.
+    inter_op_threads (int, optional): Ops run concurrently. None leaves TensorFlow's
+        default of one per core.
+    """
+    import tensorflow as tf
+
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+class ShardedWindows:
+    """
+    Training windows read from shards written by write_shards.
+
+    Shards are memory-mapped, so only the pages of the batches being gathered are read.
+    Every epoch visits the shards in a new random order, a few at a time, and shuffles
+    the windows of those shards together, which mixes tickers within each batch while
+    keeping the working set to `shards_per_group` shards.
+
+    Args:
+    root (str): Directory of the shards.
+    window (int): Rows per window.
+    horizon (int): Steps between the last row of a window and its target.
+    shards_per_group (int): Shards whose windows are shuffled together.
+    """
+
+    def __init__(self, root, window, horizon=1, shards_per_group=4):
+        self.root = root
+        self.window = window
+        self.horizon = horizon
+        self.shards_per_group = shards_per_group
+        with open(os.path.join(root, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self._shards = {}
+
+    @property
+    def tickers(self):
+        return list(self.manifest['tickers'])
+
+    def __len__(self):
+        return sum(max(0, entry['length'] - self.window - self.horizon + 1)
+                   for entry in self.manifest['tickers'].values())
+
+    def _shard(self, index):
+        if index not in self._shards:
+            self._shards[index] = np.load(os.path.join(self.root, self.manifest['shards'][index]), mmap_mode='r')
+        return self._shards[index]
+
+    def series(self, ticker):
+        """
+        The normalized series of a ticker, as a view of its shard.
+        """
+        entry = self.manifest['tickers'][ticker]
+        return self._shard(entry['shard'])[entry['offset']:entry['offset'] + entry['length']]
+
+    def scale(self, ticker, values):
+        """
+        Normalize values of a ticker with the range its shard series was scaled with.
+        """
+        entry = self.manifest['tickers'][ticker]
+        low, high = np.array(entry['low']), np.array(entry['high'])
+        values = np.asarray(values, dtype=np.float64)
+        values = values[:, None] if values.ndim == 1 else values
+        return ((values - low) / np.where(high > low, high - low, 1.0)).astype(np.float32)
+
+    def unscale(self, ticker, scaled):
+        entry = self.manifest['tickers'][ticker]
+        low, high = np.array(entry['low']), np.array(entry['high'])
+        return np.asarray(scaled).reshape(-1, len(low)) * np.where(high > low, high - low, 1.0) + low
+
+    def batches(self, batch_size=256, shuffle=True, rng=None):
+        """
+        Yield (X, y) batches of every window once, shard group by shard group.
+        """
+        rng = rng or np.random.default_rng()
+        order = np.arange(len(self.manifest['shards']))
+        if shuffle:
+            rng.shuffle(order)
+        for start in range(0, len(order), self.shards_per_group):
+            group = set(order[start:start + self.shards_per_group].tolist())
+            tickers = [ticker for ticker, entry in self.manifest['tickers'].items() if entry['shard'] in group]
+            windows = WindowedSeries([self.series(ticker) for ticker in tickers], self.window, self.horizon)
+            if len(windows):
+                yield from windows.batches(batch_size, shuffle, rng)
+
+    def dataset(self, batch_size=256, shuffle=True, seed=None):
+        """
+        Streaming tf.data pipeline over all windows, prefetching the next batches while
+        the model trains.
+
+        Returns:
+        tensorflow.data.Dataset: (X, y) batches, X (batch, window, features).
+        """
+        import tensorflow as tf
+
+        features = len(next(iter(self.manifest['tickers'].values()))['low'])
+        rng = np.random.default_rng(seed)
+        signature = (
+            tf.TensorSpec((None, self.window, features), tf.float32),
+            tf.TensorSpec((None, features), tf.float32),
+        )
+        dataset = tf.data.Dataset.from_generator(lambda: self.batches(batch_size, shuffle, rng),
+                                                 output_signature=signature)
+        return dataset.prefetch(tf.data.AUTOTUNE)
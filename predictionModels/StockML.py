@@ -1,28 +1,30 @@
-import yfinance as yf
 import numpy as np
+import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.model_selection import train_test_split
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, LSTM
+import os
+import json
+import hashlib
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataModels.PriceStore import fetch_prices, fetch_prices_many
+from predictionModels.InferenceService import forecast
+from predictionModels.ModelRegistry import default_model_registry
+from predictionModels.SequenceWindows import WindowedSeries, sliding_windows
+from predictionModels.ShardedDataset import DEFAULT_SHARD_DIR, ShardedWindows, configure_threads, write_shards
+from predictionModels.WalkForward import KerasModel, walk_forward, walk_forward_splits, summarize
 
 def get_stock_data(ticker, start_date, end_date):
-    stock_data = yf.download(ticker, start=start_date, end=end_date)
-    return stock_data
+    return fetch_prices(ticker, start_date, end_date)
 
 def prepare_data(stock_data, window_size=10):
     # Normalize data
     scaler = MinMaxScaler(feature_range=(0, 1))
     scaled_data = scaler.fit_transform(stock_data['Close'].values.reshape(-1,1))
 
-    # Create sequences
-    X, y = [], []
-    for i in range(window_size, len(scaled_data)):
-        X.append(scaled_data[i-window_size:i, 0])
-        y.append(scaled_data[i, 0])
-    X, y = np.array(X), np.array(y)
-
-    # Reshape data for LSTM input
-    X = np.reshape(X, (X.shape[0], X.shape[1], 1))
+    # Create sequences as (samples, window_size, 1) views of the scaled series, without copying it
+    X, y = sliding_windows(scaled_data[:, 0], window_size)
 
     return X, y, scaler
 
@@ -47,44 +49,203 @@ def build_lstm_model(input_shape):
 def train_model(model, X_train, y_train, epochs=50, batch_size=32):
     model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, verbose=0)
 
-def predict(model, X_test):
-    return model.predict(X_test)
+def predict(model, X_test, name=None, scaler=None, version=None):
+    """
+    Predict with a model, through the inference service when it is given a served name.
+
+    With a name, X_test holds unscaled windows and the predictions come back unscaled:
+    a running service (python predictionModels/InferenceService.py) answers from its
+    loaded copy of the model, otherwise the model answers in-process.
+    """
+    if name is None:
+        return model.predict(X_test)
+    return forecast(name, X_test, model, scaler, version)
+
+def predict_closes(model, scaler, closes, window_size=10, sequence=True, name=None, version=None):
+    """
+    Predict the close after every window of closes with a model and its own scaler.
+
+    Args:
+    model: Fitted model.
+    scaler (sklearn.preprocessing.MinMaxScaler): Scaler the model was trained with.
+    closes (numpy.ndarray): Closing prices, oldest first.
+    window_size (int): Closes per input window.
+    sequence (bool): Feed (samples, window_size, 1) sequences rather than flat windows.
+    name (str, optional): Served name of the model, e.g. 'lstm/AAPL', to predict through
+        the inference service.
+    version (str, optional): Registry model file of the model.
+
+    Returns:
+    numpy.ndarray: Predicted closes, one per window, in price units.
+    """
+    if name is not None:
+        X, _ = sliding_windows(closes, window_size)
+        return predict(model, X if sequence else X.reshape(len(X), -1), name, scaler, version).ravel()
+    X, _ = sliding_windows(scaler.transform(closes.reshape(-1, 1))[:, 0], window_size)
+    predictions = predict(model, X if sequence else X.reshape(len(X), -1))
+    return scaler.inverse_transform(predictions.reshape(-1, 1)).flatten()
+
+def fit_cached_model(name, builder, ticker, closes, window_size=10, epochs=50, batch_size=32, sequence=True,
+                     start_date=None, end_date=None, registry=None):
+    """
+    Train a model on closing prices, or reuse the copy saved by an earlier run.
+
+    With the same closes and settings the saved model and scaler are loaded without any
+    training. When closes were only appended since, the saved model is fine-tuned on
+    the new windows for a fifth of the epochs, keeping its scaler.
+
+    Args:
+    name (str): Registry name of the model, e.g. 'lstm'.
+    builder (callable): build_ffnn_model or build_lstm_model.
+    ticker (str): Ticker symbol of the closes.
+    closes (numpy.ndarray): Closing prices to train on, oldest first.
+    window_size (int): Closes per input window.
+    epochs (int): Training epochs.
+    batch_size (int): Training batch size.
+    sequence (bool): Feed (samples, window_size, 1) sequences rather than flat windows.
+    start_date (str, optional): First day of the closes.
+    end_date (str, optional): Last day of the closes.
+    registry (ModelRegistry, optional): Defaults to the shared registry.
+
+    Returns:
+    tuple: (model, scaler, status, version) with status 'cached', 'updated' or 'trained'
+    and version the saved model file, as the inference service knows it.
+    """
+    registry = registry or default_model_registry()
+    hyperparameters = {'window_size': window_size, 'epochs': epochs, 'batch_size': batch_size, 'sequence': sequence}
+
+    def windows(scaled):
+        X, y = sliding_windows(scaled[:, 0], window_size)
+        return (X if sequence else X.reshape(len(X), -1)), y
+
+    def train(values):
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        X, y = windows(scaler.fit_transform(values.reshape(-1, 1)))
+        model = builder(X.shape[1:])
+        train_model(model, X, y, epochs, batch_size)
+        return model, scaler
+
+    def update(model, scaler, values, held):
+        # Only the windows whose targets are new closes
+        X, y = windows(scaler.transform(values[held - window_size:].reshape(-1, 1)))
+        train_model(model, X, y, max(1, epochs // 5), batch_size)
+        return model
+
+    model, scaler, status = registry.fit(name, ticker, closes, hyperparameters, train, update, start_date, end_date)
+    return model, scaler, status, registry.entry(name, ticker, start_date, hyperparameters)['model_file']
+
+def train_pooled_model(builder, tickers, start_date, end_date, window_size=10, epochs=50, batch_size=256,
+                       sequence=True, root=None, seed=None):
+    """
+    Train one model on the closes of many tickers at once, instead of one model each.
+
+    Each ticker's training closes (its first 80%) are scaled with their own range and
+    written to shards on disk, then streamed to the model in batches that mix tickers.
+    The most recent 20% of every ticker is held out and scored per ticker.
+
+    Args:
+    builder (callable): build_ffnn_model or build_lstm_model.
+    tickers (list): Ticker symbols.
+    start_date (str): Start date in 'YYYY-MM-DD' format.
+    end_date (str): End date in 'YYYY-MM-DD' format.
+    window_size (int): Closes per input window.
+    epochs (int): Training epochs.
+    batch_size (int): Training batch size.
+    sequence (bool): Feed (samples, window_size, 1) sequences rather than flat windows.
+    root (str, optional): Directory of the shards, defaults to a directory under
+        DEFAULT_SHARD_DIR/stockml keyed by the tickers, dates and window size, so
+        concurrent jobs on other data do not replace each other's shards.
+    seed (int, optional): Seed of the shuffling.
+
+    Returns:
+    tuple: The trained model and a pandas.DataFrame of held-out RMSE and MAE per ticker.
+    """
+    frames = fetch_prices_many(tickers, start_date, end_date)
+    closes = {ticker: frame['Close'].to_numpy(dtype=np.float64) for ticker, frame in frames.items()
+              if len(frame) >= 5 * (window_size + 1)}
+    splits = {ticker: int(0.8 * (len(values) - window_size)) for ticker, values in closes.items()}
+    if root is None:
+        key = json.dumps([sorted(closes), start_date, end_date, window_size])
+        root = os.path.join(DEFAULT_SHARD_DIR, 'stockml', hashlib.sha1(key.encode()).hexdigest()[:12])
+    write_shards({ticker: values[:splits[ticker] + window_size] for ticker, values in closes.items()}, root)
+    shards = ShardedWindows(root, window_size)
+
+    dataset = shards.dataset(batch_size, shuffle=True, seed=seed)
+    input_shape = (window_size, 1)
+    if not sequence:
+        dataset = dataset.map(lambda X, y: (X[:, :, 0], y))
+        input_shape = (window_size,)
+    model = builder(input_shape)
+    model.fit(dataset, epochs=epochs, verbose=0)
+
+    # Score every ticker's held-out windows in one pass, scaled with its own training range
+    test = WindowedSeries([shards.scale(ticker, closes[ticker][splits[ticker]:]) for ticker in shards.tickers],
+                          window_size)
+    X, y = test.arrays()
+    predictions = model.predict(X if sequence else X[:, :, 0], batch_size=batch_size, verbose=0).ravel()
+    rows = {}
+    for k, ticker in enumerate(shards.tickers):
+        samples = slice(test.offsets[k], test.offsets[k + 1])
+        error = shards.unscale(ticker, predictions[samples])[:, 0] - shards.unscale(ticker, y[samples])[:, 0]
+        rows[ticker] = {'RMSE': np.sqrt(np.mean(error ** 2)), 'MAE': np.mean(np.abs(error))}
+    return model, pd.DataFrame.from_dict(rows, orient='index')
 
 if __name__ == "__main__":
     # User input for stock ticker
-    ticker = input("Enter a stock ticker symbol (e.g., 'AAPL' for Apple Inc.): ")
-
-    # Fetch historical data
-    stock_data = get_stock_data(ticker, '2020-01-01', '2024-01-01')
-
-    # Prepare data
-    X, y, scaler = prepare_data(stock_data)
-
-    # Split data into training and testing sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    # Build and train feedforward neural network model
-    ffnn_model = build_ffnn_model((X_train.shape[1],))
-    train_model(ffnn_model, X_train, y_train)
-
-    # Build and train LSTM model
-    lstm_model = build_lstm_model((X_train.shape[1], 1))
-    train_model(lstm_model, X_train, y_train)
-
-    # Predict stock prices using both models
-    ffnn_predictions = predict(ffnn_model, X_test)
-    lstm_predictions = predict(lstm_model, X_test)
-
-    # Inverse scaling for predictions
-    ffnn_predictions = scaler.inverse_transform(ffnn_predictions.reshape(-1, 1)).flatten()
-    lstm_predictions = scaler.inverse_transform(lstm_predictions.reshape(-1, 1)).flatten()
-    y_test = scaler.inverse_transform(y_test.reshape(-1, 1)).flatten()
-
-    # Print example predictions
-    print("Feedforward Neural Network Predictions:")
-    for i in range(5):
-        print("Predicted:", ffnn_predictions[i], "Actual:", y_test[i])
-
-    print("\nLSTM Predictions:")
-    for i in range(5):
-        print("Predicted:", lstm_predictions[i], "Actual:", y_test[i])
+    ticker = input("Enter a stock ticker symbol (e.g., 'AAPL' for Apple Inc.), "
+                   "or several separated by commas to train one pooled model: ")
+
+    if ',' in ticker:
+        # Pooled mode: one LSTM for the whole universe, using every core
+        tickers = [symbol.strip().upper() for symbol in ticker.split(',') if symbol.strip()]
+        configure_threads(intra_op_threads=os.cpu_count(), inter_op_threads=2)
+        lstm_model, scores = train_pooled_model(build_lstm_model, tickers, '2020-01-01', '2024-01-01', seed=42)
+        print("Pooled LSTM held-out errors:")
+        print(scores)
+        print(scores.mean())
+    else:
+        # Fetch historical data
+        start_date = '2020-01-01'
+        stock_data = get_stock_data(ticker, start_date, '2024-01-01')
+        closes = stock_data['Close'].to_numpy(dtype=np.float64)
+        window_size = 10
+
+        # Train on the first 80% of the windows, keeping the most recent period for testing
+        split_index = int(0.8 * (len(closes) - window_size))
+        train_closes = closes[:split_index + window_size]
+        train_end = str(stock_data.index[len(train_closes) - 1].date())
+
+        # Build and train both models, or load them if these closes were trained on before
+        ffnn_model, ffnn_scaler, status, ffnn_version = fit_cached_model('ffnn', build_ffnn_model, ticker, train_closes, window_size,
+                                                      sequence=False, start_date=start_date, end_date=train_end)
+        print(f"Feedforward Neural Network: {status}")
+        lstm_model, lstm_scaler, status, lstm_version = fit_cached_model('lstm', build_lstm_model, ticker, train_closes, window_size,
+                                                      start_date=start_date, end_date=train_end)
+        print(f"LSTM: {status}")
+
+        # Each model is fed windows scaled with its own scaler: a fine-tuned model keeps
+        # the scaler of its last full training, so the two can differ. Predictions go
+        # through the inference service when one is running
+        test_closes = closes[split_index:]
+        ffnn_predictions = predict_closes(ffnn_model, ffnn_scaler, test_closes, window_size, sequence=False,
+                                          name=f"ffnn/{ticker.upper()}", version=ffnn_version)
+        lstm_predictions = predict_closes(lstm_model, lstm_scaler, test_closes, window_size,
+                                          name=f"lstm/{ticker.upper()}", version=lstm_version)
+        y_test = test_closes[window_size:]
+
+        # Print example predictions
+        print("Feedforward Neural Network Predictions:")
+        for i in range(5):
+            print("Predicted:", ffnn_predictions[i], "Actual:", y_test[i])
+
+        print("\nLSTM Predictions:")
+        for i in range(5):
+            print("Predicted:", lstm_predictions[i], "Actual:", y_test[i])
+
+        # Walk-forward evaluation on raw closes, each fold scaled with its own training range
+        windows, targets = sliding_windows(closes, 10)
+        splits = walk_forward_splits(len(targets), initial=len(targets) // 2, test_size=len(targets) // 10)
+        folds = walk_forward({'FFNN': KerasModel(build_ffnn_model, sequence=False), 'LSTM': KerasModel(build_lstm_model)},
+                             windows, targets, splits, reference=closes[9:-1], index=stock_data.index[10:])
+        print("\nWalk-forward Evaluation:")
+        print(summarize(folds))
@@ -0,0 +1,189 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from indicatorModels.ARIMAEngine import fit_order
+
+
+def walk_forward_splits(n, initial, test_size, step=None, window=None):
+    """
+    Chronological train/test folds over n samples.
+
+    Every fold trains on samples strictly before its test block, so no fold sees the
+    future. Folds expand from the first sample, or slide when `window` is given.
+
+    Args:
+    n (int): Number of samples.
+    initial (int): Training samples of the first fold.
+    test_size (int): Test samples per fold.
+    step (int, optional): Samples between consecutive folds, defaults to test_size.
+    window (int, optional): Fixed training length of sliding folds.
+
+    Returns:
+    list: (train_start, train_end, test_end) index triples; the test block is
+    [train_end, test_end).
+    """
+    step = step or test_size
+    splits = []
+    for train_end in range(initial, n - test_size + 1, step):
+        train_start = 0 if window is None else max(0, train_end - window)
+        splits.append((train_start, train_end, train_end + test_size))
+    return splits
+
+
+def fold_metrics(actual, predicted, reference=None):
+    """
+    RMSE, MAE and directional accuracy of one fold.
+
+    Directions are the signs of the values themselves, or of their change from
+    `reference` (the last known value before each target) when predicting levels. A
+    forecast of no change calls no direction and counts as a miss.
+    """
+    actual, predicted = np.ravel(actual), np.ravel(predicted)
+    error = predicted - actual
+    if reference is not None:
+        reference = np.ravel(reference)
+        actual, predicted = actual - reference, predicted - reference
+    return {
+        'RMSE': float(np.sqrt(np.mean(error ** 2))),
+        'MAE': float(np.mean(np.abs(error))),
+        'Directional Accuracy': float(np.mean(np.sign(predicted) == np.sign(actual))),
+    }
+
+
+# Adapters implement fit_predict(X_train, y_train, X_test, y_test). y_test is there for
+# models that condition on the targets observed before each test sample, such as
+# one-step-ahead ARIMA; no adapter may use a target to predict that same target.
+
+class SklearnModel:
+    """
+    Walk-forward adapter for builders that fit and return a model, like build_model.
+    """
+
+    def __init__(self, builder):
+        self.builder = builder
+
+    def fit_predict(self, X_train, y_train, X_test, y_test):
+        return self.builder(X_train, y_train).predict(X_test)
+
+
+class KerasModel:
+    """
+    Walk-forward adapter for Keras builders taking an input shape, like build_lstm_model.
+
+    Windows of past values are min-max scaled with the training fold's range only, so
+    the test fold does not leak into the scaling.
+
+    Args:
+    builder (callable): Returns a compiled model for an input shape.
+    sequence (bool): Feed (samples, steps, 1) sequences rather than flat vectors.
+    epochs (int): Training epochs per fold.
+    batch_size (int): Training batch size.
+    """
+
+    def __init__(self, builder, sequence=True, epochs=50, batch_size=32):
+        self.builder = builder
+        self.sequence = sequence
+        self.epochs = epochs
+        self.batch_size = batch_size
+
+    def fit_predict(self, X_train, y_train, X_test, y_test):
+        low = min(X_train.min(), y_train.min())
+        scale = max(X_train.max(), y_train.max()) - low or 1.0
+        X_train, X_test = (X_train - low) / scale, (X_test - low) / scale
+        if self.sequence:
+            X_train = X_train.reshape(len(X_train), -1, 1)
+            X_test = X_test.reshape(len(X_test), -1, 1)
+        else:
+            X_train = X_train.reshape(len(X_train), -1)
+            X_test = X_test.reshape(len(X_test), -1)
+        model = self.builder(X_train.shape[1:])
+        model.fit(X_train, (y_train - low) / scale, epochs=self.epochs, batch_size=self.batch_size, verbose=0)
+        return model.predict(X_test, verbose=0).ravel() * scale + low
+
+
+class ARIMAModel:
+    """
+    Walk-forward adapter for ARIMA on the target series itself; features are ignored.
+
+    Coefficients are estimated on the training fold, then one-step-ahead forecasts are
+    made across the test fold with those coefficients held fixed.
+
+    Args:
+    specification (dict): 'order' and 'with_intercept', as from ForecastService.orders.
+    """
+
+    def __init__(self, specification):
+        self.specification = specification
+
+    def fit_predict(self, X_train, y_train, X_test, y_test):
+        model = fit_order(np.asarray(y_train, dtype=np.float64), self.specification)
+        # Appending without refitting filters the test targets through the fixed model, so
+        # each prediction only uses the targets before it
+        results = model.arima_res_.append(np.asarray(y_test, dtype=np.float64), refit=False)
+        return np.asarray(results.predict(start=len(y_train), end=len(y_train) + len(X_test) - 1))
+
+
+_worker = {}
+
+
+def _init_worker(models, X, y, reference):
+    _worker.update(models=models, X=X, y=y, reference=reference)
+
+
+def _run_fold(job):
+    name, fold, (train_start, train_end, test_end) = job
+    model, X, y, reference = _worker['models'][name], _worker['X'], _worker['y'], _worker['reference']
+    predicted = model.fit_predict(X[train_start:train_end], y[train_start:train_end],
+                                  X[train_end:test_end], y[train_end:test_end])
+    metrics = fold_metrics(y[train_end:test_end], predicted,
+                           None if reference is None else reference[train_end:test_end])
+    return dict(Model=name, Fold=fold, **{'Train Start': train_start, 'Train End': train_end, 'Test End': test_end}, **metrics)
+
+
+def walk_forward(models, X, y, splits, reference=None, index=None, workers=None):
+    """
+    Evaluate models over walk-forward folds, folds running in parallel processes.
+
+    The data is sent to each worker once when it starts; jobs only carry fold
+    boundaries. Workers are spawned rather than forked, which keeps TensorFlow
+    safe to use in them, so call this from under `if __name__ == '__main__':`.
+
+    Args:
+    models (dict): {name: adapter} with a fit_predict(X_train, y_train, X_test, y_test) method,
+        e.g. SklearnModel(build_model), KerasModel(build_lstm_model) or ARIMAModel(...).
+    X (numpy.ndarray): Samples x features, in time order.
+    y (numpy.ndarray): Targets, in time order.
+    splits (list): Folds from walk_forward_splits.
+    reference (numpy.ndarray, optional): Last known value before each target, for the
+        directional accuracy of level forecasts.
+    index (pandas.Index, optional): Dates of the samples, used to label the folds.
+    workers (int, optional): Worker processes, None for one per CPU.
+
+    Returns:
+    pandas.DataFrame: One row per model and fold with RMSE, MAE and Directional Accuracy.
+    """
+    X, y = np.asarray(X), np.asarray(y)
+    reference = None if reference is None else np.asarray(reference)
+    jobs = [(name, fold, split) for name in models for fold, split in enumerate(splits)]
+    if workers == 1:
+        _init_worker(models, X, y, reference)
+        rows = list(map(_run_fold, jobs))
+    else:
+        workers = min(workers or os.cpu_count(), len(jobs))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(models, X, y, reference)) as pool:
+            rows = list(pool.map(_run_fold, jobs))
+    results = pd.DataFrame(rows)
+    if index is not None:
+        results['Test Start'] = index[results['Train End']]
+        results['Test Finish'] = index[results['Test End'] - 1]
+    return results
+
+
+def summarize(results):
+    """
+    Mean and standard deviation of every metric per model, across folds.
+    """
+    return results.groupby('Model')[['RMSE', 'MAE', 'Directional Accuracy']].agg(['mean', 'std'])
@@ -0,0 +1,33 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indicatorModels.IndicatorEngine import INDICATORS, compute_indicators, stack_tails
+
+
+def bars(rows, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, rows)))
+    open = close * (1 + rng.normal(0, 0.005, rows))
+    high = np.maximum(open, close) * 1.005
+    low = np.minimum(open, close) * 0.995
+    volume = rng.uniform(1e5, 1e6, rows)
+    return pd.DataFrame({'Open': open, 'High': high, 'Low': low, 'Close': close, 'Volume': volume})
+
+
+def test_blocks_match_one_pass_with_a_gap_at_a_block_boundary():
+    frames = {ticker: bars(1000, seed) for seed, ticker in enumerate(['A', 'B', 'C'])}
+    # 768 values over 3 tickers make 256-row blocks, so row 511 is the last of the second
+    frames['B'].iloc[511, frames['B'].columns.get_loc('Close')] = np.nan
+    panel = stack_tails(frames)
+    blocked = compute_indicators(panel, block_elements=768)
+    whole = compute_indicators(panel, block_elements=1 << 30)
+    for name in INDICATORS:
+        np.testing.assert_allclose(blocked[name], whole[name], rtol=1e-8, atol=1e-6, equal_nan=True, err_msg=name)
+
+
+def test_history_shorter_than_the_windows_is_all_nan():
+    result = compute_indicators(stack_tails({'A': bars(10, 0)}), ['%K', '%D', 'MA_20'])
+    for name, values in result.items():
+        assert np.isnan(values).all(), name
@@ -0,0 +1,71 @@
+import os
+import socket
+import sys
+import threading
+import numpy as np
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from predictionModels.InferenceService import InferenceClient, InferenceService
+
+
+class Scale:
+    def __init__(self, factor):
+        self.factor = factor
+
+    def predict(self, X):
+        return X * self.factor
+
+
+def test_register_while_submitting_resolves_every_request():
+    # Requests racing a model swap must be answered by the old or the new model, never dropped
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    service = InferenceService(max_delay=0.0005)
+    service.register('m', Scale(1.0))
+    stop = threading.Event()
+    futures, errors = [], []
+
+    def swap():
+        while not stop.is_set():
+            service.register('m', Scale(1.0))
+
+    def client():
+        try:
+            for _ in range(2000):
+                futures.append(service.submit('m', np.ones((1, 2))))
+        except Exception as e:
+            errors.append(e)
+
+    swapper = threading.Thread(target=swap)
+    clients = [threading.Thread(target=client) for _ in range(8)]
+    swapper.start()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    stop.set()
+    swapper.join()
+    sys.setswitchinterval(switch)
+    assert not errors
+    for future in futures:
+        np.testing.assert_array_equal(future.result(timeout=10), np.ones((1, 2)))
+    service.close()
+
+
+def test_submit_reloads_a_newer_version():
+    service = InferenceService(loader=lambda name, version: (Scale(float(version)), None))
+    service.register('m', Scale(2.0), version='2')
+    np.testing.assert_array_equal(service.predict('m', [[1.0]], timeout=10, version='3'), [[3.0]])
+    assert service.version('m') == '3'
+    service.close()
+
+
+def test_client_raises_when_the_service_closes_the_connection():
+    listener = socket.create_server(('127.0.0.1', 0))
+    client = InferenceClient('127.0.0.1', listener.getsockname()[1])
+    connection, _ = listener.accept()
+    connection.close()
+    with pytest.raises(ConnectionError):
+        client.predict('m', [[1.0]])
+    client.close()
+    listener.close()